@@ -0,0 +1,138 @@
+"""
+Compare database connection profiles on the ESP32 ingest endpoint.
+
+    python benchmarks/db_profile.py [--requests 2000] [--threads 8]
+                                    [--profiles plain,tuned] [--database-url URL]
+
+Each profile runs in its own subprocess with ``DB_PROFILE`` set. The child
+drives POST /api/post_sensor_data/ through Django's test client from
+``--threads`` threads. Django opens and closes connections around every
+request exactly as under gunicorn, so ``plain`` pays connection setup on each
+request while ``tuned`` reuses health-checked connections (and applies the
+SQLite WAL/busy_timeout pragmas). Prints one JSON object per profile.
+
+Without ``--database-url`` a throwaway SQLite file is created and migrated
+per profile; pass a PostgreSQL URL to measure a real server (the tables must
+exist there).
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+PAYLOAD = {
+    'device_id': 'ESP32_BENCH',
+    'ecg_heart_rate': 72.5,
+    'spo2': 98.1,
+    'pulse_heart_rate': 71.0,
+    'max30102_heart_rate': 73.2,
+    'x_axis': 0.12,
+    'y_axis': -0.05,
+    'z_axis': 9.79,
+}
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def run_worker(requests, threads):
+    """Child process: django.setup() with the inherited DB_PROFILE and drive the endpoint"""
+    sys.path.insert(0, str(ROOT))
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'iot_backend.settings')
+    import django
+    django.setup()
+    from django.conf import settings
+    from django.test import Client
+
+    latencies, errors = [], []
+    lock = threading.Lock()
+    per_thread = requests // threads
+
+    def drive(index):
+        client = Client()
+        data = json.dumps(dict(PAYLOAD, device_id=f"ESP32_BENCH_{index}"))
+        for _ in range(per_thread):
+            started = time.perf_counter()
+            try:
+                status = client.post('/api/post_sensor_data/', data,
+                                     content_type='application/json').status_code
+            except Exception as e:  # pylint: disable=broad-except
+                status = type(e).__name__
+            elapsed = (time.perf_counter() - started) * 1000
+            with lock:
+                latencies.append(elapsed)
+                if status != 200:
+                    errors.append(status)
+
+    started = time.perf_counter()
+    workers = [threading.Thread(target=drive, args=(i,)) for i in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    wall = time.perf_counter() - started
+
+    db = settings.DATABASES['default']
+    print(json.dumps({
+        'profile': settings.DB_PROFILE,
+        'engine': db['ENGINE'].rsplit('.', 1)[-1],
+        'conn_max_age': db.get('CONN_MAX_AGE'),
+        'pool': bool(db.get('OPTIONS', {}).get('pool')),
+        'requests': len(latencies),
+        'threads': threads,
+        'seconds': round(wall, 3),
+        'throughput_rps': round(len(latencies) / wall, 1) if wall else 0.0,
+        'p50_ms': round(percentile(latencies, 50), 2),
+        'p95_ms': round(percentile(latencies, 95), 2),
+        'p99_ms': round(percentile(latencies, 99), 2),
+        'errors': len(errors),
+        'error_kinds': sorted({str(e) for e in errors}),
+    }))
+
+
+def run_profile(profile, args):
+    env = dict(os.environ, DB_PROFILE=profile)
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.database_url:
+            env['DATABASE_URL'] = args.database_url
+        else:
+            env['DATABASE_URL'] = f"sqlite:///{Path(tmp) / 'bench.sqlite3'}"
+            subprocess.run([sys.executable, 'manage.py', 'migrate', '-v0'],
+                           cwd=ROOT, env=env, check=True)
+        out = subprocess.run(
+            [sys.executable, __file__, '--worker',
+             '--requests', str(args.requests), '--threads', str(args.threads)],
+            cwd=ROOT, env=env, check=True, capture_output=True, text=True
+        )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--profiles', default='plain,tuned')
+    parser.add_argument('--database-url')
+    parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args.requests, args.threads)
+        return
+    for profile in args.profiles.split(','):
+        print(json.dumps(run_profile(profile, args)), flush=True)
+
+
+if __name__ == '__main__':
+    main()
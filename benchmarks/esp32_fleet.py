@@ -0,0 +1,264 @@
+"""
+Load test: a fleet of simulated ESP32 devices plus dashboard pollers.
+
+    python benchmarks/esp32_fleet.py [--devices 50] [--rate 0.33] [--duration 30]
+                                     [--bulk-share 0.5] [--pollers 10] [--poll-rate 5]
+                                     [--server runserver|gunicorn] [--workers 4]
+                                     [--database-url URL] [--url http://host:port]
+
+Starts the Django app in a subprocess (``manage.py runserver`` or gunicorn) on
+a free port with ``SENSOR_QUERY_COUNT_HEADER=true``, or targets ``--url``.
+Each device thread posts the ``esp32_sensor_code.ino`` payload every
+``1/rate`` seconds, to /api/sensors/bulk/ with probability ``--bulk-share``
+and to /api/post_sensor_data/ otherwise, over a keep-alive connection.
+Poller threads read /api/ecg/, /api/spo2/ and /api/accel/{x,y,z}/ at
+``--poll-rate`` Hz each.
+
+Prints one JSON document: per endpoint group request count, throughput,
+p50/p95/p99 latency, mean DB queries per request (from X-DB-Queries) and error
+rate. Exit status is non-zero if any request failed.
+"""
+import argparse
+import http.client
+import json
+import math
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from urllib.parse import urlsplit
+
+ROOT = Path(__file__).resolve().parent.parent
+
+POLL_PATHS = ['/api/ecg/', '/api/spo2/', '/api/accel/x/', '/api/accel/y/', '/api/accel/z/']
+
+
+def device_payload(device_id, uptime):
+    """Same fields and value ranges as sendSensorData() in esp32_sensor_code.ino"""
+    x = random.randint(-1000, 999) / 1000.0
+    y = random.randint(-1000, 999) / 1000.0
+    z = random.randint(800, 1199) / 1000.0
+    return {
+        'device_id': device_id,
+        'ecg_heart_rate': float(random.randint(60, 99)),
+        'ecg_value': round(random.uniform(1.5, 3.3), 4),
+        'ecg_signal_quality': 'good',
+        'spo2': float(random.randint(95, 99)),
+        'pulse_heart_rate': float(random.randint(60, 99)),
+        'pulse_signal_strength': random.randint(80, 99),
+        'max30102_heart_rate': float(random.randint(65, 94)),
+        'max30102_spo2': float(random.randint(96, 98)),
+        'red_value': random.randint(50000, 99999),
+        'ir_value': random.randint(50000, 99999),
+        'temperature': float(random.randint(35, 36)),
+        'x_axis': x,
+        'y_axis': y,
+        'z_axis': z,
+        'magnitude': math.sqrt(x * x + y * y + z * z),
+        'battery_level': float(random.randint(70, 99)),
+        'wifi_signal_strength': -50,
+        'memory_usage': float(random.randint(30, 79)),
+        'cpu_temperature': float(random.randint(35, 44)),
+        'uptime_seconds': int(uptime),
+    }
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+class Stats:
+    """Thread-safe samples per endpoint group"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.groups = {}
+
+    def add(self, group, latency_ms, ok, queries):
+        with self._lock:
+            entry = self.groups.setdefault(group, {'latencies': [], 'errors': 0, 'queries': []})
+            entry['latencies'].append(latency_ms)
+            if not ok:
+                entry['errors'] += 1
+            if queries is not None:
+                entry['queries'].append(queries)
+
+    def summary(self, seconds):
+        report = {}
+        for group, entry in sorted(self.groups.items()):
+            latencies = entry['latencies']
+            queries = entry['queries']
+            report[group] = {
+                'requests': len(latencies),
+                'throughput_rps': round(len(latencies) / seconds, 1),
+                'p50_ms': round(percentile(latencies, 50), 2),
+                'p95_ms': round(percentile(latencies, 95), 2),
+                'p99_ms': round(percentile(latencies, 99), 2),
+                'queries_per_request': round(sum(queries) / len(queries), 2) if queries else None,
+                'error_rate': round(entry['errors'] / len(latencies), 4) if latencies else 0.0,
+            }
+        return report
+
+
+class Connection:
+    """Keep-alive HTTP connection that reconnects after errors"""
+
+    def __init__(self, host, port):
+        self.host, self.port = host, port
+        self.conn = None
+
+    def request(self, method, path, body=None):
+        if self.conn is None:
+            self.conn = http.client.HTTPConnection(self.host, self.port, timeout=30)
+        headers = {'Content-Type': 'application/json'} if body is not None else {}
+        try:
+            self.conn.request(method, path, body=body, headers=headers)
+            response = self.conn.getresponse()
+            response.read()
+            queries = response.getheader('X-DB-Queries')
+            return response.status, int(queries) if queries is not None else None
+        except (OSError, http.client.HTTPException):
+            self.conn.close()
+            self.conn = None
+            raise
+
+
+def run_loop(stats, deadline, interval, step):
+    """Call step() every ``interval`` seconds (with jitter) until ``deadline``"""
+    next_at = time.monotonic() + random.uniform(0, interval)
+    while True:
+        delay = next_at - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        if time.monotonic() >= deadline:
+            return
+        group, call = step()
+        started = time.perf_counter()
+        try:
+            status, queries = call()
+            ok = 200 <= status < 300
+        except (OSError, http.client.HTTPException):
+            ok, queries = False, None
+        stats.add(group, (time.perf_counter() - started) * 1000, ok, queries)
+        next_at += interval
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(args, tmp):
+    port = free_port()
+    env = dict(os.environ, SENSOR_QUERY_COUNT_HEADER='true', DEBUG=os.environ.get('DEBUG', 'False'))
+    env['DATABASE_URL'] = args.database_url or f"sqlite:///{Path(tmp) / 'fleet.sqlite3'}"
+    if not args.database_url:
+        subprocess.run([sys.executable, 'manage.py', 'migrate', '-v0'], cwd=ROOT, env=env, check=True)
+    if args.server == 'gunicorn':
+        command = [sys.executable, '-m', 'gunicorn', 'iot_backend.wsgi:application',
+                   '--bind', f'127.0.0.1:{port}', '--workers', str(args.workers),
+                   '--threads', str(args.threads), '--log-level', 'warning']
+    else:
+        command = [sys.executable, 'manage.py', 'runserver', '--noreload', f'127.0.0.1:{port}']
+    server = subprocess.Popen(command, cwd=ROOT, env=env,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=1):
+                return server, '127.0.0.1', port
+        except OSError:
+            if server.poll() is not None:
+                raise RuntimeError(f"Server exited with status {server.returncode}")
+            time.sleep(0.2)
+    server.terminate()
+    raise RuntimeError("Server did not start within 30 seconds")
+
+
+def run(args, host, port):
+    stats = Stats()
+    started = time.monotonic()
+    deadline = started + args.duration
+
+    def device(index):
+        conn = Connection(host, port)
+        device_id = f"ESP32_FLEET_{index:04d}"
+
+        def step():
+            body = json.dumps(device_payload(device_id, time.monotonic() - started))
+            path = '/api/sensors/bulk/' if random.random() < args.bulk_share else '/api/post_sensor_data/'
+            group = 'ingest_bulk' if path == '/api/sensors/bulk/' else 'ingest_post_sensor_data'
+            return group, lambda: conn.request('POST', path, body)
+        run_loop(stats, deadline, 1.0 / args.rate, step)
+
+    def poller(_index):
+        conn = Connection(host, port)
+
+        def step():
+            path = random.choice(POLL_PATHS)
+            return 'poll_single_value', lambda: conn.request('GET', path)
+        run_loop(stats, deadline, 1.0 / args.poll_rate, step)
+
+    threads = [threading.Thread(target=device, args=(i,), daemon=True) for i in range(args.devices)]
+    threads += [threading.Thread(target=poller, args=(i,), daemon=True) for i in range(args.pollers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return stats.summary(time.monotonic() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--devices', type=int, default=50)
+    parser.add_argument('--rate', type=float, default=1 / 3.0,
+                        help="Posts per second per device (firmware SEND_INTERVAL is 3 s)")
+    parser.add_argument('--bulk-share', type=float, default=0.5,
+                        help="Fraction of posts sent to /api/sensors/bulk/")
+    parser.add_argument('--pollers', type=int, default=10)
+    parser.add_argument('--poll-rate', type=float, default=5.0, help="Requests per second per poller")
+    parser.add_argument('--duration', type=float, default=30.0, help="Seconds")
+    parser.add_argument('--server', choices=('runserver', 'gunicorn'), default='runserver')
+    parser.add_argument('--workers', type=int, default=4, help="gunicorn workers")
+    parser.add_argument('--threads', type=int, default=1, help="gunicorn threads per worker")
+    parser.add_argument('--database-url', help="Default: a fresh SQLite file")
+    parser.add_argument('--url', help="Benchmark an already running server instead")
+    parser.add_argument('--seed', type=int)
+    args = parser.parse_args()
+    random.seed(args.seed)
+
+    config = {key: value for key, value in vars(args).items() if key != 'database_url'}
+    if args.url:
+        parts = urlsplit(args.url)
+        report = run(args, parts.hostname, parts.port or 80)
+    else:
+        with tempfile.TemporaryDirectory() as tmp:
+            server, host, port = start_server(args, tmp)
+            try:
+                report = run(args, host, port)
+            finally:
+                server.terminate()
+                server.wait(timeout=30)
+
+    total = sum(group['requests'] for group in report.values())
+    errors = sum(round(group['error_rate'] * group['requests']) for group in report.values())
+    print(json.dumps({
+        'config': config,
+        'total_requests': total,
+        'error_rate': round(errors / total, 4) if total else 0.0,
+        'endpoints': report,
+    }, indent=2))
+    sys.exit(1 if errors else 0)
+
+
+if __name__ == '__main__':
+    main()
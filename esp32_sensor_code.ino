@@ -47,6 +47,13 @@ unsigned long lastDataSend = 0;
 // Timing configuration for real-time data transmission
 const unsigned long SENSOR_INTERVAL = 500;  // Read sensors every 0.5 seconds - more responsive
 const unsigned long SEND_INTERVAL = 3000;   // Send data every 3 seconds - more frequent updates
+const int SEND_RETRIES = 2;                 // Resends of the same payload after a failed request
+
+// Idempotent ingest: every payload carries a sequence number, and retries of
+// a payload repeat it so the server writes it only once. bootId changes on
+// every restart because the counter starts again from 1.
+String bootId;
+uint32_t sequenceNumber = 0;
 
 // Sensor data structures
 struct SensorData {
@@ -92,6 +99,12 @@ void setup() {
   // Initialize sensors
   initSensors();
   
+#ifdef ARDUINO_ARCH_ESP32
+  bootId = String(esp_random(), HEX);
+#else
+  bootId = String(random(0x7FFFFFFF), HEX);
+#endif
+  
   Serial.println("ESP32 IoT Sensor System Started");
   Serial.println("Device ID: " + deviceId);
 }
@@ -253,6 +266,8 @@ void sendSensorData() {
   const size_t JSON_BUFFER_SIZE = 2048;
   DynamicJsonDocument doc(JSON_BUFFER_SIZE);
   doc["device_id"] = deviceId;
+  doc["sequence"] = ++sequenceNumber;
+  doc["boot_id"] = bootId;
   
   // ECG data
   doc["ecg_heart_rate"] = currentReading.ecg_heart_rate;
@@ -298,6 +313,12 @@ void sendSensorData() {
   Serial.println("Payload: " + jsonString);
   
   int httpResponseCode = http.POST(jsonString);
+  // Timeouts and connection errors: resend the same payload (same sequence)
+  for (int attempt = 0; httpResponseCode < 0 && attempt < SEND_RETRIES; attempt++) {
+    Serial.println("Retrying send of sequence " + String(sequenceNumber));
+    delay(500);
+    httpResponseCode = http.POST(jsonString);
+  }
   
   if (httpResponseCode > 0) {
     String response = http.getString();
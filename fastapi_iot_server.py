@@ -1,68 +1,256 @@
-from fastapi import FastAPI, Response
+"""
+Async ingest front end for ESP32 devices.
+
+Payloads are validated and put on a bounded asyncio.Queue, so accepting a
+request never waits on the database and thousands of keep-alive device
+connections share one event loop. A single writer task drains the queue in
+batches and writes them through the Django ``sensors`` ingest path
+(``save_readings``: one multi-row INSERT per model, rollups, live events) in a
+worker thread. When the queue is full the device gets 503 + Retry-After
+instead of unbounded memory growth. Payloads carrying a ``sequence`` the
+device already sent (a retry) are dropped by the writer (``sensors.dedupe``).
+Bodies sent with ``Content-Encoding: gzip`` or ``deflate`` are inflated up to
+``SENSOR_MAX_DECOMPRESSED_BYTES`` before validation, as on the Django side.
+
+/ecg, /spo2, /accelerometer and /all_sensors are answered from the in-memory
+latest state, updated by the writer once a batch is committed, so they never
+show a value that was not stored. State and counters are only touched on the
+event loop thread; the worker thread reports back through its return value.
+"""
+import asyncio
+import logging
+import os
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from typing import Optional
+
+import django
+from fastapi import FastAPI, HTTPException, Request, Response
+from fastapi.routing import APIRoute
+from pydantic import BaseModel, Field
 import uvicorn
 
-app = FastAPI()
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'iot_backend.settings')
+django.setup()
+
+from django.db import close_old_connections, transaction  # noqa: E402
+from sensors.compression import DecompressionError, decompress_body  # noqa: E402
+from sensors.dedupe import drop_replays  # noqa: E402
+from sensors.devices import device_registry  # noqa: E402
+from sensors.ingest import readings_from_payload, save_readings  # noqa: E402
+
+logger = logging.getLogger(__name__)
+
+QUEUE_SIZE = int(os.environ.get('FASTAPI_INGEST_QUEUE_SIZE', '10000'))
+BATCH_SIZE = int(os.environ.get('FASTAPI_INGEST_BATCH_SIZE', '500'))
+FLUSH_MS = int(os.environ.get('FASTAPI_INGEST_FLUSH_MS', '200'))
+
+FIELDS = ('ecg_heart_rate', 'spo2', 'pulse_heart_rate', 'max30102_heart_rate',
+          'x_axis', 'y_axis', 'z_axis')
+
+
+class SensorPayload(BaseModel):
+    device_id: str = 'ESP32_IOT_SENSORS'
+    ecg_heart_rate: Optional[float] = None
+    spo2: Optional[float] = None
+    pulse_heart_rate: Optional[float] = None
+    max30102_heart_rate: Optional[float] = None
+    x_axis: Optional[float] = None
+    y_axis: Optional[float] = None
+    z_axis: Optional[float] = None
+    sequence: Optional[int] = Field(None, ge=0, lt=2 ** 63)
+    boot_id: Optional[str] = Field(None, max_length=32)
+
+
+class DecompressingRequest(Request):
+    """Request whose body() is the Content-Encoding-decoded payload"""
+
+    async def body(self):
+        if not hasattr(self, '_decoded_body'):
+            body = await super().body()
+            encoding = self.headers.get('content-encoding')
+            try:
+                self._decoded_body = decompress_body(body, encoding) if encoding else body
+            except DecompressionError as e:
+                raise HTTPException(status_code=e.status_code, detail=str(e)) from e
+        return self._decoded_body
+
+
+class DecompressingRoute(APIRoute):
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+
+        async def decompressing_handler(request):
+            return await handler(DecompressingRequest(request.scope, request.receive))
+        return decompressing_handler
+
+
+class IngestState:
+    """Queue, latest values and counters shared by the endpoints"""
+
+    def __init__(self):
+        self.queue = None
+        self.writer = None
+        self.latest = {field: 0 for field in FIELDS}
+        self.updated_at = None
+        self.accepted = 0
+        self.rejected = 0
+        self.written = 0
+        self.duplicates = 0
+
+
+state = IngestState()
+
+
+def write_batch(batch):
+    """
+    Runs in a worker thread: resolve devices and save one batch.
+
+    Returns (rows written, replayed payloads dropped, stored payloads).
+    """
+    close_old_connections()
+    try:
+        payloads = []
+        for received_at, data in batch:
+            device, _ = device_registry.resolve(
+                data['device_id'],
+                defaults={
+                    'name': f"ESP32 Device {data['device_id']}",
+                    'device_type': 'ESP32',
+                    'is_active': True
+                }
+            )
+            payloads.append((device, data.get('boot_id'), data.get('sequence'), (device, received_at, data)))
+
+        with transaction.atomic():
+            payloads, replays = drop_replays(payloads)
+            instances = []
+            for device, received_at, data in payloads:
+                for _, instance in readings_from_payload(device, data):
+                    # Keep arrival time rather than the time the batch was written
+                    instance.timestamp = received_at
+                    instances.append(instance)
+            written = save_readings(instances) if instances else 0
+        return written, replays, [data for _, _, data in payloads]
+    finally:
+        close_old_connections()
+
+
+async def batch_writer():
+    """Drain the queue: wait for one payload, then take up to BATCH_SIZE within FLUSH_MS"""
+    loop = asyncio.get_running_loop()
+    while True:
+        batch = [await state.queue.get()]
+        deadline = loop.time() + FLUSH_MS / 1000.0
+        while len(batch) < BATCH_SIZE:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(state.queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        try:
+            written, replays, stored = await asyncio.to_thread(write_batch, batch)
+        except Exception:  # pylint: disable=broad-except
+            logger.exception("Dropped ingest batch of %d payloads", len(batch))
+        else:
+            state.written += written
+            state.duplicates += replays
+            if stored:
+                for data in stored:
+                    for field in FIELDS:
+                        if field in data:
+                            state.latest[field] = data[field]
+                state.updated_at = time.time()
+        finally:
+            for _ in batch:
+                state.queue.task_done()
+
+
+@asynccontextmanager
+async def lifespan(_app):
+    state.queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+    state.writer = asyncio.create_task(batch_writer())
+    yield
+    # Flush what was accepted before shutting down
+    await state.queue.join()
+    state.writer.cancel()
+
+
+app = FastAPI(lifespan=lifespan)
+# Set before the routes below are declared so they all decode compressed bodies
+app.router.route_class = DecompressingRoute
+
 
 @app.get("/get_device_values")
 async def get_device_values():
     """Get current IoT device sensor values"""
-    # This will return the latest sensor readings
-    return {"status": "waiting_for_sensors"}
+    if state.updated_at is None:
+        return {"status": "waiting_for_sensors"}
+    return {"status": "ok", "updated_at": state.updated_at, **state.latest}
+
 
-@app.post("/post_sensor_data") 
-async def post_sensor_data(sensor_data: dict):
+@app.post("/post_sensor_data")
+async def post_sensor_data(sensor_data: SensorPayload, response: Response):
     """Receive sensor data from IoT devices"""
-    
-    # Extract sensor values
-    ecg = sensor_data.get("ecg_heart_rate", 0)
-    spo2 = sensor_data.get("spo2", 0) 
-    pulse = sensor_data.get("pulse_heart_rate", 0)
-    max30102 = sensor_data.get("max30102_heart_rate", 0)
-    x_axis = sensor_data.get("x_axis", 0)
-    y_axis = sensor_data.get("y_axis", 0)
-    z_axis = sensor_data.get("z_axis", 0)
-    
-    # Process the sensor data
-    print(f"ECG: {ecg}, SpO2: {spo2}, Pulse: {pulse}")
-    print(f"MAX30102: {max30102}")
-    print(f"Accelerometer: X={x_axis}, Y={y_axis}, Z={z_axis}")
-    
+    # Unset fields are left out, as in the JSON the Django endpoint receives
+    data = sensor_data.model_dump(exclude_none=True)
+    try:
+        state.queue.put_nowait((datetime.now(timezone.utc), data))
+    except asyncio.QueueFull:
+        state.rejected += 1
+        response.status_code = 503
+        response.headers['Retry-After'] = '1'
+        return "BUSY"
+    state.accepted += 1
+
     # Return just the values (like your blood values example)
+    values = [data.get(field, 0) for field in FIELDS]
+    ecg, spo2, _, max30102 = values[:4]
     if ecg > 0 or spo2 > 0 or max30102 > 0:
-        return f"{ecg}\n{spo2}\n{pulse}\n{max30102}\n{x_axis}\n{y_axis}\n{z_axis}"
+        return "\n".join(str(value) for value in values)
     else:
         return "WAITING_FOR_SENSORS"
 
+
 @app.get("/ecg")
 async def get_ecg():
     """Get ECG heart rate value"""
-    # Return current ECG reading
-    return {"ecg_heart_rate": 0}  # Will be filled by real sensor
+    return {"ecg_heart_rate": state.latest['ecg_heart_rate']}
+
 
-@app.get("/spo2") 
+@app.get("/spo2")
 async def get_spo2():
     """Get SpO2 oxygen saturation value"""
-    # Return current SpO2 reading
-    return {"spo2": 0}  # Will be filled by real sensor
+    return {"spo2": state.latest['spo2']}
+
 
 @app.get("/accelerometer")
 async def get_accelerometer():
     """Get accelerometer values"""
-    # Return current accelerometer readings
-    return {"x_axis": 0, "y_axis": 0, "z_axis": 0}  # Will be filled by real sensor
+    return {axis: state.latest[axis] for axis in ('x_axis', 'y_axis', 'z_axis')}
+
 
 @app.get("/all_sensors")
 async def get_all_sensors():
     """Get all sensor values at once"""
+    return dict(state.latest)
+
+
+@app.get("/ingest_stats")
+async def ingest_stats():
+    """Queue depth and counters for monitoring the ingest tier"""
     return {
-        "ecg_heart_rate": 0,
-        "spo2": 0,
-        "pulse_heart_rate": 0, 
-        "max30102_heart_rate": 0,
-        "x_axis": 0,
-        "y_axis": 0,
-        "z_axis": 0
+        "queued": state.queue.qsize(),
+        "queue_size": QUEUE_SIZE,
+        "accepted": state.accepted,
+        "rejected": state.rejected,
+        "written": state.written,
+        "duplicates": state.duplicates,
     }
 
+
 if __name__ == "__main__":
-    uvicorn.run(app, host="0.0.0.0", port=3443)
+    uvicorn.run(app, host="0.0.0.0", port=int(os.environ.get('PORT', '3443')))
@@ -2,6 +2,10 @@
 ASGI config for iot_backend project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+HTTP goes to Django; WebSocket connections to /ws/readings/ are served by
+``sensors.websocket``. Run it with an ASGI server, e.g.
+``gunicorn -k uvicorn.workers.UvicornWorker iot_backend.asgi:application``
+(as in Procfile and render.yaml).
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
@@ -13,4 +17,18 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'iot_backend.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Imported after get_asgi_application() so the app registry is ready
+from sensors.websocket import PATH as READINGS_SOCKET_PATH, readings_socket  # noqa: E402
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'websocket':
+        if scope['path'] == READINGS_SOCKET_PATH or scope['path'] + '/' == READINGS_SOCKET_PATH:
+            await readings_socket(scope, receive, send)
+        else:
+            await receive()
+            await send({'type': 'websocket.close', 'code': 4404})
+        return
+    await django_application(scope, receive, send)
@@ -44,9 +44,12 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'sensors.middleware.MetricsMiddleware',
+    'sensors.middleware.QueryCountMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
+    'sensors.middleware.DecompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -78,20 +81,63 @@ WSGI_APPLICATION = 'iot_backend.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# Connection profile: 'tuned' (default) keeps health-checked persistent
+# connections (or a psycopg 3 pool) and applies the SQLite pragmas below;
+# 'plain' is the old one-connection-per-request setup, kept for benchmarking
+DB_PROFILE = os.environ.get('DB_PROFILE', 'tuned')
+DB_TUNED = DB_PROFILE == 'tuned'
+DB_CONN_MAX_AGE = int(os.environ.get('DB_CONN_MAX_AGE', '600')) if DB_TUNED else 0
+# PostgreSQL: in-process pool (needs psycopg[pool], i.e. psycopg 3) instead of persistent connections
+DB_POOL = DB_TUNED and os.environ.get('DB_POOL', 'False').lower() == 'true'
+DB_POOL_MIN_SIZE = int(os.environ.get('DB_POOL_MIN_SIZE', '2'))
+DB_POOL_MAX_SIZE = int(os.environ.get('DB_POOL_MAX_SIZE', '10'))
+# PostgreSQL behind PgBouncer in transaction mode: server-side cursors do not survive
+DB_PGBOUNCER = os.environ.get('DB_PGBOUNCER', 'False').lower() == 'true'
+# SQLite: seconds a writer waits for the lock before "database is locked"
+DB_SQLITE_TIMEOUT = float(os.environ.get('DB_SQLITE_TIMEOUT', '20'))
+
 # Use PostgreSQL for production (Render), SQLite for development
 if os.environ.get('DATABASE_URL'):
     import dj_database_url
     DATABASES = {
-        'default': dj_database_url.parse(os.environ.get('DATABASE_URL'))
+        'default': dj_database_url.parse(
+            os.environ.get('DATABASE_URL'),
+            conn_max_age=0 if DB_POOL else DB_CONN_MAX_AGE,
+            conn_health_checks=DB_TUNED,
+            disable_server_side_cursors=DB_PGBOUNCER,
+        )
     }
 else:
     DATABASES = {
         'default': {
             'ENGINE': 'django.db.backends.sqlite3',
             'NAME': BASE_DIR / 'db.sqlite3',
+            'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+            'CONN_HEALTH_CHECKS': DB_TUNED,
         }
     }
 
+if DB_TUNED and DATABASES['default']['ENGINE'].endswith('sqlite3'):
+    # WAL lets readers run alongside the writer; IMMEDIATE takes the write lock
+    # at BEGIN so concurrent workers queue on busy_timeout instead of failing
+    DATABASES['default'].setdefault('OPTIONS', {}).update({
+        'timeout': DB_SQLITE_TIMEOUT,
+        'transaction_mode': 'IMMEDIATE',
+        'init_command': (
+            'PRAGMA journal_mode=WAL;'
+            'PRAGMA synchronous=NORMAL;'
+            f'PRAGMA busy_timeout={int(DB_SQLITE_TIMEOUT * 1000)};'
+            'PRAGMA temp_store=MEMORY;'
+            'PRAGMA cache_size=-20000'
+        ),
+    })
+elif DB_POOL and DATABASES['default']['ENGINE'].endswith('postgresql'):
+    DATABASES['default'].setdefault('OPTIONS', {})['pool'] = {
+        'min_size': DB_POOL_MIN_SIZE,
+        'max_size': DB_POOL_MAX_SIZE,
+        'timeout': 10,
+    }
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -148,6 +194,90 @@ REST_FRAMEWORK = {
     ]
 }
 
+# Sensor ingest
+# Opt-in write-behind buffering: readings are queued in-process and written
+# with bulk_create once BATCH_SIZE rows are queued or FLUSH_MS has passed
+SENSOR_INGEST_BUFFERED = os.environ.get('SENSOR_INGEST_BUFFERED', 'False').lower() == 'true'
+SENSOR_INGEST_BATCH_SIZE = int(os.environ.get('SENSOR_INGEST_BATCH_SIZE', '500'))
+SENSOR_INGEST_FLUSH_MS = int(os.environ.get('SENSOR_INGEST_FLUSH_MS', '1000'))
+# Queued rows beyond which buffered ingest answers 503, and failed flushes a
+# batch gets before it is dropped (counted in sensor_ingest_dropped_total)
+SENSOR_INGEST_MAX_ROWS = int(os.environ.get('SENSOR_INGEST_MAX_ROWS', '10000'))
+SENSOR_INGEST_MAX_RETRIES = int(os.environ.get('SENSOR_INGEST_MAX_RETRIES', '5'))
+
+# Device registry: bounded LRU of Device rows, last_seen written in batches
+SENSOR_DEVICE_CACHE_SIZE = int(os.environ.get('SENSOR_DEVICE_CACHE_SIZE', '1024'))
+SENSOR_LAST_SEEN_FLUSH_SECONDS = float(os.environ.get('SENSOR_LAST_SEEN_FLUSH_SECONDS', '5'))
+
+# Maximum samples accepted in one multi-sample POST to /api/sensors/bulk/
+SENSOR_BULK_MAX_SAMPLES = int(os.environ.get('SENSOR_BULK_MAX_SAMPLES', '500'))
+
+# Upper bound on samples returned by one GET /api/waveform/<device_id>/ slice
+SENSOR_WAVEFORM_MAX_SAMPLES = int(os.environ.get('SENSOR_WAVEFORM_MAX_SAMPLES', '5000000'))
+
+# Page size for the reading list endpoints (?page_size= is capped at the max)
+SENSOR_PAGE_SIZE = int(os.environ.get('SENSOR_PAGE_SIZE', '100'))
+SENSOR_MAX_PAGE_SIZE = int(os.environ.get('SENSOR_MAX_PAGE_SIZE', '1000'))
+
+# Latest-value cache behind /api/ecg/, /api/spo2/, ... (seconds; 0 = never expire).
+# Writes update every worker through the 'postgres' events backend; lower this
+# when several workers run on the 'local' backend.
+SENSOR_LATEST_CACHE_TTL = float(os.environ.get('SENSOR_LATEST_CACHE_TTL', '30'))
+# Most (sensor, device) keys kept; ?device= is client-supplied
+SENSOR_LATEST_CACHE_SIZE = int(os.environ.get('SENSOR_LATEST_CACHE_SIZE', '4096'))
+
+# PostgreSQL only: also build BRIN indexes on reading timestamps (migration 0003)
+SENSOR_TIMESTAMP_BRIN = os.environ.get('SENSOR_TIMESTAMP_BRIN', 'False').lower() == 'true'
+
+# Live reading events for /api/stream/: 'local' (per process) or 'postgres'
+# (LISTEN/NOTIFY, so every worker sees readings ingested by any worker).
+# Empty picks 'postgres' on a PostgreSQL database and 'local' otherwise.
+SENSOR_EVENTS_BACKEND = os.environ.get('SENSOR_EVENTS_BACKEND', '')
+SENSOR_EVENT_HISTORY = int(os.environ.get('SENSOR_EVENT_HISTORY', '2000'))
+SENSOR_SSE_KEEPALIVE_SECONDS = float(os.environ.get('SENSOR_SSE_KEEPALIVE_SECONDS', '15'))
+SENSOR_SSE_MAX_SECONDS = float(os.environ.get('SENSOR_SSE_MAX_SECONDS', '300'))
+# Concurrent /api/stream/ clients per process; more get 503 + Retry-After
+SENSOR_SSE_MAX_STREAMS = int(os.environ.get('SENSOR_SSE_MAX_STREAMS', '16'))
+
+# Retention overrides for prune_readings, e.g. "ecg=3,rollup_hour=730" (days; 0 = forever)
+SENSOR_RETENTION_DAYS = os.environ.get('SENSOR_RETENTION_DAYS', '')
+
+# PostgreSQL time partitioning of reading tables (manage_partitions): 'day' or 'week'
+SENSOR_PARTITION_PERIOD = os.environ.get('SENSOR_PARTITION_PERIOD', 'day')
+SENSOR_PARTITION_AHEAD = int(os.environ.get('SENSOR_PARTITION_AHEAD', '7'))
+
+# Report X-DB-Queries / X-DB-Time-ms on every response (benchmarks only)
+SENSOR_QUERY_COUNT_HEADER = os.environ.get('SENSOR_QUERY_COUNT_HEADER', 'False').lower() == 'true'
+
+# Per-endpoint metrics at /metrics. Set METRICS_DIR to a directory shared by the
+# gunicorn workers so the numbers cover all of them. Scrapers send TOKEN as a
+# bearer token; with no TOKEN /metrics is only served when DEBUG is on
+SENSOR_METRICS_ENABLED = os.environ.get('SENSOR_METRICS_ENABLED', 'True').lower() == 'true'
+SENSOR_METRICS_DIR = os.environ.get('SENSOR_METRICS_DIR', '')
+SENSOR_METRICS_FLUSH_SECONDS = float(os.environ.get('SENSOR_METRICS_FLUSH_SECONDS', '5'))
+SENSOR_METRICS_TOKEN = os.environ.get('SENSOR_METRICS_TOKEN', '')
+
+# Seconds between background database liveness probes behind the health check
+SENSOR_HEALTH_INTERVAL = float(os.environ.get('SENSOR_HEALTH_INTERVAL', '5'))
+
+# Cache lifetime of /api/vitals/ statistics per (device, metric, window), seconds
+SENSOR_VITALS_CACHE_SECONDS = int(os.environ.get('SENSOR_VITALS_CACHE_SECONDS', '60'))
+
+# Streaming anomaly detector on ingest: baseline warm-up samples, weight of
+# each new sample once warm, and the alert threshold in standard deviations
+SENSOR_ANOMALY_DETECTION = os.environ.get('SENSOR_ANOMALY_DETECTION', 'True').lower() == 'true'
+SENSOR_ANOMALY_WARMUP = int(os.environ.get('SENSOR_ANOMALY_WARMUP', '30'))
+SENSOR_ANOMALY_ALPHA = float(os.environ.get('SENSOR_ANOMALY_ALPHA', '0.01'))
+SENSOR_ANOMALY_Z = float(os.environ.get('SENSOR_ANOMALY_Z', '4.0'))
+
+# Idempotent ingest: a repeated (device, boot_id, sequence) within this many
+# seconds is acknowledged without writing; the window keeps recent keys in memory
+SENSOR_DEDUPE_SECONDS = int(os.environ.get('SENSOR_DEDUPE_SECONDS', '600'))
+SENSOR_DEDUPE_WINDOW = int(os.environ.get('SENSOR_DEDUPE_WINDOW', '10000'))
+
+# Upper bound on a gzip/deflate request body after decompression (bytes)
+SENSOR_MAX_DECOMPRESSED_BYTES = int(os.environ.get('SENSOR_MAX_DECOMPRESSED_BYTES', str(10 * 1024 * 1024)))
+
 # CORS settings - Allow all origins for IoT devices
 CORS_ALLOW_ALL_ORIGINS = True
 CORS_ALLOW_CREDENTIALS = True
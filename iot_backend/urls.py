@@ -19,6 +19,8 @@ from django.urls import path, include
 from django.http import JsonResponse
 from django.shortcuts import redirect
 
+from sensors.views import prometheus_metrics
+
 def home_redirect(request):
     """Redirect root URL to API"""
     return redirect('/api/')
@@ -34,6 +36,7 @@ def health_check(request):
 urlpatterns = [
     path('', home_redirect, name='home'),
     path('health/', health_check, name='root-health'),
+    path('metrics', prometheus_metrics, name='metrics'),
     path('admin/', admin.site.urls),
     path('api/', include('sensors.urls')),
 ]
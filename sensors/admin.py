@@ -1,7 +1,8 @@
 from django.contrib import admin
 from .models import (
     Device, ECGReading, PulseOximeterReading, 
-    MAX30102Reading, AccelerometerReading, DeviceStatus
+    MAX30102Reading, AccelerometerReading, DeviceStatus, WaveformChunk,
+    ReadingRollup, DeviceSnapshot, AnomalyEvent
 )
 
 
@@ -51,3 +52,34 @@ class DeviceStatusAdmin(admin.ModelAdmin):
     list_filter = ['timestamp', 'device']
     search_fields = ['device__device_id', 'device__name']
     readonly_fields = ['timestamp']
+
+
+@admin.register(WaveformChunk)
+class WaveformChunkAdmin(admin.ModelAdmin):
+    list_display = ['device', 'channel', 'start_time', 'sample_rate', 'sample_count', 'dtype']
+    list_filter = ['channel', 'dtype', 'device']
+    search_fields = ['device__device_id', 'device__name']
+    exclude = ['samples']
+    readonly_fields = ['created_at']
+
+
+@admin.register(ReadingRollup)
+class ReadingRollupAdmin(admin.ModelAdmin):
+    list_display = ['device', 'metric', 'period', 'bucket', 'count', 'min_value', 'max_value']
+    list_filter = ['metric', 'period', 'device']
+    search_fields = ['device__device_id', 'device__name']
+
+
+@admin.register(DeviceSnapshot)
+class DeviceSnapshotAdmin(admin.ModelAdmin):
+    list_display = ['device', 'updated_at', 'ecg_heart_rate', 'spo2', 'battery_level']
+    search_fields = ['device__device_id', 'device__name']
+    readonly_fields = ['updated_at']
+
+
+@admin.register(AnomalyEvent)
+class AnomalyEventAdmin(admin.ModelAdmin):
+    list_display = ['device', 'timestamp', 'kind', 'metric', 'value', 'baseline', 'score']
+    list_filter = ['kind', 'timestamp', 'device']
+    search_fields = ['device__device_id', 'device__name']
+    readonly_fields = ['created_at']
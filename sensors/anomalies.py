@@ -0,0 +1,154 @@
+"""
+Streaming anomaly detection on the ingest path.
+
+``detect_anomalies`` is called by ``ingest.save_readings`` inside the ingest
+transaction. For every (device, metric) in ``DETECTORS`` it keeps a running
+baseline in ``AnomalyDetectorState``: Welford's mean and variance over the
+first ``SENSOR_ANOMALY_WARMUP`` samples, then an exponentially weighted mean
+and variance (``SENSOR_ANOMALY_ALPHA``) so the baseline follows slow drift,
+plus a fast EWMA of the signal itself. Each sample costs O(1) time and the
+state is one small row, so detection survives restarts.
+
+A sample is flagged when it (or, for smoothed detectors, the fast EWMA) leaves
+the baseline by more than ``SENSOR_ANOMALY_Z`` standard deviations and at
+least the detector's minimum delta. Only the first sample of an episode is
+written to ``AnomalyEvent``; the episode ends when the signal returns inside
+the band. Concurrent writers for the same device may overwrite each other's
+state update, which only delays the baseline by one batch.
+"""
+import logging
+import math
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import transaction
+
+from .metrics import registry as metrics
+from .models import AnomalyDetectorState, AnomalyEvent
+from .rollups import METRICS
+
+logger = logging.getLogger(__name__)
+
+# metric -> (kind, direction, minimum delta, smoothed)
+# direction -1 flags drops, +1 spikes; smoothed detectors compare the fast
+# EWMA so a single noisy SpO2 sample does not raise an alert
+DETECTORS = {
+    'spo2': (AnomalyEvent.KIND_SPO2_DROP, -1, 3.0, True),
+    'ecg_heart_rate': (AnomalyEvent.KIND_HR_SPIKE, 1, 15.0, False),
+    'pulse_heart_rate': (AnomalyEvent.KIND_HR_SPIKE, 1, 15.0, False),
+    'max30102_heart_rate': (AnomalyEvent.KIND_HR_SPIKE, 1, 15.0, False),
+    'accel_magnitude': (AnomalyEvent.KIND_MOTION_SPIKE, 1, 1.0, False),
+}
+
+# Weight of the newest sample in the fast EWMA
+FAST_ALPHA = 0.3
+
+STATE_FIELDS = ['count', 'mean', 'variance', 'ewma', 'active', 'last_at']
+
+
+def detection_enabled():
+    return getattr(settings, 'SENSOR_ANOMALY_DETECTION', True)
+
+
+def update_state(state, value, alpha, warmup):
+    """Fold one sample into the baseline (Welford, then exponentially weighted)"""
+    state.count += 1
+    delta = value - state.mean
+    if state.count <= warmup:
+        state.mean += delta / state.count
+        # Population variance: m2 / n, kept directly so the row stays small
+        state.variance += (delta * (value - state.mean) - state.variance) / state.count
+        state.ewma = state.mean
+    else:
+        increment = alpha * delta
+        state.mean += increment
+        state.variance = (1 - alpha) * (state.variance + delta * increment)
+        state.ewma += FAST_ALPHA * (value - state.ewma)
+
+
+def check_sample(state, metric, value, z_limit, warmup):
+    """(score, anomalous) of a sample against the baseline before it is folded in"""
+    _, direction, min_delta, smoothed = DETECTORS[metric]
+    if state.count < warmup:
+        return 0.0, False
+    level = state.ewma + FAST_ALPHA * (value - state.ewma) if smoothed else value
+    deviation = (level - state.mean) * direction
+    std = math.sqrt(max(state.variance, 0.0))
+    score = deviation / std if std else (math.inf if deviation > 0 else 0.0)
+    return score, deviation >= min_delta and score >= z_limit
+
+
+def metric_samples(instances):
+    """{(device pk, metric): [(timestamp, value), ...]} in time order"""
+    samples = defaultdict(list)
+    for metric, (model, field, skip_zero) in METRICS.items():
+        if metric not in DETECTORS:
+            continue
+        for instance in instances:
+            if not isinstance(instance, model):
+                continue
+            value = getattr(instance, field)
+            if value is None or (skip_zero and not value):
+                continue
+            samples[(instance.device_id, metric)].append((instance.timestamp, float(value)))
+    for series in samples.values():
+        series.sort(key=lambda sample: sample[0])
+    return samples
+
+
+def detect_anomalies(instances):
+    """Update detector state for a batch of new readings and record flagged ones"""
+    samples = metric_samples(instances)
+    if not samples:
+        return []
+
+    alpha = getattr(settings, 'SENSOR_ANOMALY_ALPHA', 0.01)
+    warmup = getattr(settings, 'SENSOR_ANOMALY_WARMUP', 30)
+    z_limit = getattr(settings, 'SENSOR_ANOMALY_Z', 4.0)
+
+    device_pks = {device_pk for device_pk, _ in samples}
+    # pylint: disable=no-member
+    states = {
+        (state.device_id, state.metric): state
+        for state in AnomalyDetectorState.objects.filter(  # type: ignore
+            device_id__in=device_pks, metric__in={metric for _, metric in samples}
+        )
+    }
+
+    events = []
+    for key, series in samples.items():
+        device_pk, metric = key
+        state = states.get(key)
+        if state is None:
+            state = states[key] = AnomalyDetectorState(device_id=device_pk, metric=metric)
+        for timestamp, value in series:
+            # Late samples would rewind the baseline; they are stored but not scored
+            if state.last_at is not None and timestamp < state.last_at:
+                continue
+            score, anomalous = check_sample(state, metric, value, z_limit, warmup)
+            if anomalous and not state.active:
+                events.append(AnomalyEvent(
+                    device_id=device_pk, metric=metric, kind=DETECTORS[metric][0],
+                    timestamp=timestamp, value=value, baseline=state.mean,
+                    score=score if math.isfinite(score) else 1e9,
+                ))
+            state.active = anomalous
+            update_state(state, value, alpha, warmup)
+            state.last_at = timestamp
+
+    touched = [states[key] for key in sorted(samples)]
+    AnomalyDetectorState.objects.bulk_create(  # type: ignore
+        touched, update_conflicts=True, unique_fields=['device', 'metric'], update_fields=STATE_FIELDS
+    )
+    if events:
+        AnomalyEvent.objects.bulk_create(events)  # type: ignore
+        transaction.on_commit(lambda: _report(events))
+    return events
+
+
+def _report(events):
+    for event in events:
+        metrics.inc('sensor_anomalies_total', kind=event.kind)
+        logger.warning("Anomaly %s on device %s: %s=%.2f (baseline %.2f, %.1f sd)",
+                       event.kind, event.device_id, event.metric, event.value,
+                       event.baseline, event.score)
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class SensorsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'sensors'
+
+    def ready(self):
+        # Connect the device registry's cache invalidation and counter signals
+        from . import counters, devices  # noqa: F401 pylint: disable=import-outside-toplevel,unused-import
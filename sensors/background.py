@@ -0,0 +1,51 @@
+"""
+Per-process background thread for periodic housekeeping (buffer flushes,
+coalesced writes). Threads do not survive a gunicorn fork, so the worker is
+started lazily from the process that first needs it.
+"""
+import logging
+import os
+import threading
+
+from django.db import close_old_connections
+
+logger = logging.getLogger(__name__)
+
+
+class PeriodicWorker:
+    """Calls ``func`` every ``interval`` seconds on a daemon thread"""
+
+    def __init__(self, interval, func, name):
+        self.interval = interval
+        self.func = func
+        self.name = name
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._pid = None
+
+    def ensure_started(self):
+        if self._running():
+            return
+        with self._lock:
+            if self._running():
+                return
+            self._pid = os.getpid()
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _running(self):
+        return self._pid == os.getpid() and self._thread is not None and self._thread.is_alive()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.func()
+            except Exception:  # pylint: disable=broad-except
+                logger.exception("%s failed", self.name)
+            finally:
+                close_old_connections()
@@ -0,0 +1,144 @@
+"""
+Compact binary ingest format for ESP32 firmware (POST /api/post_sensor_data/binary/).
+
+All integers and floats are little-endian. A request body is one header
+followed by ``count`` fixed-size records:
+
+    header  (12 bytes)  struct '<4sBxHI'
+        magic           4s   b'ESPB'
+        version         B    1 or 2
+        (pad)           x
+        count           H    number of records
+        sent_offset_ms  I    device millis() when the batch was sent
+        boot_id         I    version 2 only (16-byte header): random per
+                             device boot, 0 = unknown
+
+    record  (76 bytes)  struct '<32sIIB3x8f'
+        device_id       32s  ASCII, NUL padded
+        sequence        I    per-device sample counter (0 = not numbered);
+                             with a boot_id, repeats are acknowledged, not
+                             written
+        offset_ms       I    device millis() when sampled (0 = arrival time)
+        sensors         B    bitmask of SENSOR_* flags below
+        (pad)           3x
+        ecg_heart_rate, ecg_value, spo2, pulse_heart_rate,
+        max30102_heart_rate, x_axis, y_axis, z_axis     8 x float32
+
+On the ESP32 this is ``struct __attribute__((packed))`` with the same fields.
+The floats of every sensor flagged in ``sensors`` must be finite; a NaN or
+infinity rejects the body, naming the record. Floats of unflagged sensors are
+ignored.
+Records are decoded with ``Struct.iter_unpack`` straight off a memoryview of the
+body and mapped onto the same models as the JSON endpoints.
+"""
+import math
+import struct
+from datetime import timedelta
+
+from django.utils import timezone
+
+from .models import (
+    ECGReading, PulseOximeterReading, MAX30102Reading, AccelerometerReading
+)
+
+MAGIC = b'ESPB'
+VERSIONS = (1, 2)
+
+HEADER = struct.Struct('<4sBxHI')
+# Version 2 appends the boot id to the header
+BOOT_ID = struct.Struct('<I')
+RECORD = struct.Struct('<32sIIB3x8f')
+
+SENSOR_ECG = 0x01
+SENSOR_SPO2 = 0x02
+SENSOR_MAX30102 = 0x04
+SENSOR_ACCEL = 0x08
+
+# Sensor flag -> positions of its floats in the record
+SENSOR_FLOATS = {
+    SENSOR_ECG: (0, 1),
+    SENSOR_SPO2: (2, 3),
+    SENSOR_MAX30102: (4,),
+    SENSOR_ACCEL: (5, 6, 7),
+}
+
+
+class BinaryPayloadError(ValueError):
+    """Raised for a body that does not match the binary layout"""
+
+
+def decode_records(body):
+    """
+    Yield (device_id, boot_id, sequence, timestamp, sensors, floats) per record.
+
+    ``boot_id`` is the header's boot id as hex, or '' for version 1 bodies
+    and a zero boot id.
+    """
+    view = memoryview(body)
+    if len(view) < HEADER.size:
+        raise BinaryPayloadError("Body shorter than header")
+    magic, version, count, sent_offset_ms = HEADER.unpack_from(view)
+    if magic != MAGIC:
+        raise BinaryPayloadError("Bad magic")
+    if version not in VERSIONS:
+        raise BinaryPayloadError(f"Unsupported version {version}")
+    start = HEADER.size
+    boot_id = ''
+    if version >= 2:
+        if len(view) < start + BOOT_ID.size:
+            raise BinaryPayloadError("Body shorter than header")
+        raw_boot, = BOOT_ID.unpack_from(view, start)
+        boot_id = format(raw_boot, 'x') if raw_boot else ''
+        start += BOOT_ID.size
+    end = start + count * RECORD.size
+    if len(view) != end:
+        raise BinaryPayloadError(f"Expected {end} bytes for {count} records, got {len(view)}")
+
+    received_at = timezone.now()
+    device_ids = {}
+    for index, record in enumerate(RECORD.iter_unpack(view[start:end])):
+        raw_id, sequence, offset_ms, sensors = record[:4]
+        floats = record[4:]
+        for flag, positions in SENSOR_FLOATS.items():
+            if sensors & flag and not all(math.isfinite(floats[i]) for i in positions):
+                raise BinaryPayloadError(f"Record {index}: non-finite sensor value")
+        device_id = device_ids.get(raw_id)
+        if device_id is None:
+            device_id = device_ids[raw_id] = raw_id.rstrip(b'\0').decode('ascii')
+        if offset_ms and offset_ms <= sent_offset_ms:
+            timestamp = received_at - timedelta(milliseconds=sent_offset_ms - offset_ms)
+        else:
+            timestamp = received_at
+        yield device_id, boot_id, sequence, timestamp, sensors, floats
+
+
+def readings_from_record(device, timestamp, sensors, values):
+    """Build unsaved readings for one decoded record as (label, instance) pairs"""
+    # float32 carries ~7 significant digits; round so 0.1 is stored as 0.1, not 0.10000000149
+    ecg_hr, ecg_value, spo2, pulse_hr, max_hr, x, y, z = [float(f'{v:.7g}') for v in values]
+    readings = []
+    if sensors & SENSOR_ECG:
+        readings.append(('ECG', ECGReading(
+            device=device, timestamp=timestamp,
+            heart_rate=ecg_hr, ecg_value=ecg_value,
+        )))
+    if sensors & SENSOR_SPO2:
+        readings.append(('SpO2', PulseOximeterReading(
+            device=device, timestamp=timestamp,
+            spo2=spo2, heart_rate=pulse_hr,
+            signal_strength=90,  # Default signal strength
+        )))
+    if sensors & SENSOR_MAX30102:
+        readings.append(('MAX30102', MAX30102Reading(
+            device=device, timestamp=timestamp,
+            heart_rate=max_hr,
+            red_value=1000,  # Default values
+            ir_value=1000,
+        )))
+    if sensors & SENSOR_ACCEL:
+        readings.append(('Accelerometer', AccelerometerReading(
+            device=device, timestamp=timestamp,
+            x_axis=x, y_axis=y, z_axis=z,
+            magnitude=(x*x + y*y + z*z)**0.5,
+        )))
+    return readings
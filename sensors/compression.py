@@ -0,0 +1,79 @@
+"""
+Decompression of gzip/deflate request bodies.
+
+Batched device uploads repeat the same field names and similar numbers, so
+they compress several times over. Devices send them with
+``Content-Encoding: gzip`` (or ``deflate``); ``decompress_body`` inflates the
+body incrementally and stops as soon as the output would exceed the limit
+(``SENSOR_MAX_DECOMPRESSED_BYTES``), so a small "zip bomb" cannot allocate
+more than that. A gzip body may hold several concatenated members, which are
+all decoded; any other data after the end of the stream is rejected rather
+than silently dropped. Used by ``middleware.DecompressionMiddleware`` for every
+Django endpoint and by the FastAPI ingest front end.
+"""
+import zlib
+
+from django.conf import settings
+
+# Content-Encoding -> zlib wbits; deflate is zlib-wrapped per RFC 9110, but
+# some clients send a raw deflate stream, which is tried second
+ENCODINGS = {
+    'gzip': (16 + zlib.MAX_WBITS,),
+    'x-gzip': (16 + zlib.MAX_WBITS,),
+    'deflate': (zlib.MAX_WBITS, -zlib.MAX_WBITS),
+}
+
+
+class DecompressionError(ValueError):
+    """Raised for a body that does not decode with its Content-Encoding"""
+    status_code = 400
+
+
+class UnsupportedEncoding(DecompressionError):
+    status_code = 415
+
+
+class BodyTooLarge(DecompressionError):
+    status_code = 413
+
+
+def max_decompressed_bytes():
+    return getattr(settings, 'SENSOR_MAX_DECOMPRESSED_BYTES', 10 * 1024 * 1024)
+
+
+def _inflate(body, wbits, limit, multi_member=False):
+    parts, size = [], 0
+    while True:
+        decoder = zlib.decompressobj(wbits)
+        data = decoder.decompress(body, limit - size + 1)
+        size += len(data)
+        if size > limit:
+            raise BodyTooLarge(f"Decompressed body exceeds {limit} bytes")
+        if not decoder.eof:
+            raise DecompressionError("Truncated compressed body")
+        parts.append(data)
+        body = decoder.unused_data
+        if not body:
+            return b''.join(parts)
+        if not multi_member:
+            raise DecompressionError("Trailing data after compressed body")
+
+
+def decompress_body(body, content_encoding, limit=None):
+    """Decode ``body`` per its Content-Encoding header value; identity passes through"""
+    limit = max_decompressed_bytes() if limit is None else limit
+    # Encodings are listed in the order they were applied
+    codings = [c.strip().lower() for c in (content_encoding or '').split(',') if c.strip()]
+    for coding in reversed(codings):
+        if coding == 'identity':
+            continue
+        if coding not in ENCODINGS:
+            raise UnsupportedEncoding(f"Unsupported Content-Encoding: {coding}")
+        for attempt, wbits in enumerate(ENCODINGS[coding]):
+            try:
+                body = _inflate(body, wbits, limit, multi_member=coding in ('gzip', 'x-gzip'))
+                break
+            except zlib.error as e:
+                if attempt == len(ENCODINGS[coding]) - 1:
+                    raise DecompressionError(f"Invalid {coding} body: {e}") from e
+    return body
@@ -0,0 +1,97 @@
+"""
+Row counts per table without COUNT(*).
+
+``TableCounter`` keeps each count split over ``SHARDS`` rows. Writers add
+their delta to a random shard with an upsert inside their own transaction, so
+concurrent ingest transactions rarely wait on the same row lock, and a read is
+one SUM over a few dozen rows. Counts are adjusted by:
+
+* ``ingest.save_readings`` (bulk inserts),
+* ``prune_readings`` / ``manage_partitions`` (retention deletes),
+* Device signals below (device rows, and readings removed by the cascade).
+
+Deletes outside those paths (admin bulk actions, raw SQL) make the counts
+drift; ``manage.py recount_tables`` rebuilds them with exact COUNT(*)s.
+"""
+import random
+from collections import Counter
+
+from django.db import connection, transaction
+from django.db.models import Sum
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from .export import EXPORT_MODELS
+from .models import Device, TableCounter
+
+SHARDS = 16
+
+COUNTED_MODELS = dict(EXPORT_MODELS, device=Device)
+MODEL_NAMES = {model: name for name, model in COUNTED_MODELS.items()}
+
+
+def add_counts(deltas):
+    """Add {table name: delta} to the counters"""
+    deltas = {name: delta for name, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    qn = connection.ops.quote_name
+    table = qn(TableCounter._meta.db_table)
+    params = []
+    for name, delta in sorted(deltas.items()):
+        params.extend([name, random.randrange(SHARDS), delta])
+    placeholders = ', '.join(['(%s, %s, %s)'] * len(deltas))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {table} ({qn("table")}, shard, count) VALUES {placeholders} '
+            f'ON CONFLICT ({qn("table")}, shard) DO UPDATE SET count = {table}.count + EXCLUDED.count',
+            params
+        )
+
+
+def count_instances(instances):
+    """Counter deltas for freshly inserted model instances"""
+    return Counter(MODEL_NAMES[type(instance)] for instance in instances if type(instance) in MODEL_NAMES)
+
+
+def table_counts():
+    """{table name: rows} for every counted table, in one query"""
+    counts = {name: 0 for name in COUNTED_MODELS}
+    # pylint: disable=no-member
+    rows = TableCounter.objects.values('table').annotate(total=Sum('count')).order_by()  # type: ignore
+    for row in rows:
+        counts[row['table']] = row['total']
+    return counts
+
+
+def recount(names=None):
+    """Replace the counters of ``names`` (default: all) with exact COUNT(*)s"""
+    result = {}
+    for name in names or COUNTED_MODELS:
+        with transaction.atomic():
+            # pylint: disable=no-member
+            exact = COUNTED_MODELS[name].objects.count()  # type: ignore
+            TableCounter.objects.filter(table=name).delete()  # type: ignore
+            TableCounter.objects.create(table=name, shard=0, count=exact)  # type: ignore
+        result[name] = exact
+    return result
+
+
+@receiver(post_save, sender=Device)
+def _count_new_device(sender, instance, created, **kwargs):
+    if created and not kwargs.get('raw'):
+        add_counts({'device': 1})
+
+
+@receiver(pre_delete, sender=Device)
+def _uncount_device_readings(sender, instance, **kwargs):
+    # Readings go with the device (CASCADE) through a fast delete without signals
+    add_counts({
+        name: -model.objects.filter(device=instance).count()  # type: ignore
+        for name, model in EXPORT_MODELS.items()
+    })
+
+
+@receiver(post_delete, sender=Device)
+def _uncount_device(sender, instance, **kwargs):
+    add_counts({'device': -1})
@@ -0,0 +1,157 @@
+"""
+Idempotent ingest for devices that retry posts.
+
+A device may send a monotonic ``sequence`` with each payload, plus a
+``boot_id`` that changes whenever the counter restarts. ``claim_sequences`` records the
+sequences inside the transaction that writes their readings and returns the
+ones not seen within the last ``SENSOR_DEDUPE_SECONDS``; the rest are
+replays, acknowledged without writing. Without a boot id a restarted counter
+cannot be told from a retry, so such payloads are never deduplicated.
+
+Recent claims are remembered per process in ``dedupe_window`` (at most
+``SENSOR_DEDUPE_WINDOW`` keys), so a quick retry to the same worker costs no
+query. Everything else is settled by one ``INSERT ... ON CONFLICT`` on the
+``IngestSequence`` unique constraint: a conflicting row only counts as a
+replay while it is younger than the dedupe window, so stale rows never
+block a reused key. Old rows are removed by the ``ingest_sequence`` retention
+policy.
+"""
+import threading
+import time
+from collections import OrderedDict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import IngestSequence
+
+# Rows per INSERT statement, well under SQLite's bound-parameter limit
+UPSERT_BATCH = 200
+
+
+class DedupeWindow:
+    """Bounded LRU of recently claimed (device pk, boot id, sequence) keys"""
+
+    def __init__(self, max_size=10000, seconds=600):
+        self.max_size = max_size
+        self.seconds = seconds
+        self._lock = threading.Lock()
+        self._keys = OrderedDict()
+
+    def seen(self, key):
+        with self._lock:
+            claimed_at = self._keys.get(key)
+            if claimed_at is None:
+                return False
+            if time.monotonic() - claimed_at > self.seconds:
+                del self._keys[key]
+                return False
+            return True
+
+    def add(self, keys):
+        now = time.monotonic()
+        with self._lock:
+            for key in keys:
+                self._keys[key] = now
+                self._keys.move_to_end(key)
+            while len(self._keys) > self.max_size:
+                self._keys.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._keys.clear()
+
+
+dedupe_window = DedupeWindow(
+    max_size=getattr(settings, 'SENSOR_DEDUPE_WINDOW', 10000),
+    seconds=getattr(settings, 'SENSOR_DEDUPE_SECONDS', 600),
+)
+
+
+def parse_sequence(value):
+    """Validate an optional payload sequence; None when absent"""
+    if value is None or value == '':
+        return None
+    if isinstance(value, bool) or not isinstance(value, (int, str)):
+        raise ValueError("sequence must be a non-negative integer")
+    if isinstance(value, str):
+        if not value.isdigit():
+            raise ValueError("sequence must be a non-negative integer")
+        value = int(value)
+    if not 0 <= value < 2 ** 63:
+        raise ValueError("sequence must be a non-negative integer")
+    return value
+
+
+def claim_sequences(device, sequences, boot_id=''):
+    """
+    Record ``sequences`` of one device and return the set that is new.
+
+    Call inside the transaction that writes the readings, so a failed write
+    does not leave its sequences claimed. Without ``boot_id`` every sequence
+    is new and nothing is recorded.
+    """
+    boot_id = str(boot_id or '')[:32]
+    if not boot_id:
+        return set(sequences)
+    fresh = sorted({seq for seq in sequences if not dedupe_window.seen((device.pk, boot_id, seq))})
+    if not fresh:
+        return set()
+
+    qn = connection.ops.quote_name
+    table = qn(IngestSequence._meta.db_table)
+    now = timezone.now()
+    cutoff = connection.ops.adapt_datetimefield_value(now - timedelta(seconds=dedupe_window.seconds))
+    now = connection.ops.adapt_datetimefield_value(now)
+    claimed = set()
+    with connection.cursor() as cursor:
+        for start in range(0, len(fresh), UPSERT_BATCH):
+            batch = fresh[start:start + UPSERT_BATCH]
+            params = []
+            for seq in batch:
+                params.extend([device.pk, boot_id, seq, now])
+            # A row that conflicts with a recent claim is left alone and not
+            # returned: that sequence is a replay
+            cursor.execute(
+                f'INSERT INTO {table} (device_id, boot_id, sequence, received_at) '
+                f'VALUES {", ".join(["(%s, %s, %s, %s)"] * len(batch))} '
+                f'ON CONFLICT (device_id, boot_id, sequence) DO UPDATE '
+                f'SET received_at = EXCLUDED.received_at WHERE {table}.received_at < %s '
+                f'RETURNING sequence',
+                params + [cutoff]
+            )
+            claimed.update(row[0] for row in cursor.fetchall())
+
+    replays = [(device.pk, boot_id, seq) for seq in fresh if seq not in claimed]
+    dedupe_window.add(replays)
+    transaction.on_commit(lambda: dedupe_window.add([(device.pk, boot_id, seq) for seq in claimed]))
+    return claimed
+
+
+def drop_replays(items):
+    """
+    Claim the sequences of ``(device, boot_id, sequence, payload)`` items and
+    return ``(payloads to write, replay count)``.
+
+    Items without a sequence or boot id are always kept; a sequence repeated
+    within ``items`` is kept once. Call inside the transaction that writes them.
+    """
+    sequences = {}
+    for device, boot_id, sequence, _ in items:
+        if sequence is not None and boot_id:
+            sequences.setdefault((device, boot_id), set()).add(sequence)
+    claimed = {key: claim_sequences(key[0], seqs, key[1]) for key, seqs in sequences.items()}
+
+    kept = []
+    replays = 0
+    for device, boot_id, sequence, payload in items:
+        if sequence is not None and boot_id:
+            new = claimed[(device, boot_id)]
+            if sequence not in new:
+                replays += 1
+                continue
+            new.discard(sequence)
+        kept.append(payload)
+    return kept, replays
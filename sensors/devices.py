@@ -0,0 +1,129 @@
+"""
+Device resolution cache for the ingest paths.
+
+``device_registry.resolve()`` returns the ``Device`` for a ``device_id`` from a
+bounded LRU cache, only falling back to ``get_or_create`` on a miss. Instead
+of saving the device row on every reading, ``last_seen`` is recorded in memory
+and written for all touched devices in one batched UPDATE every
+``SENSOR_LAST_SEEN_FLUSH_SECONDS``.
+
+A device created by ``resolve()`` is only cached once its transaction
+commits, so a rolled-back insert never leaves a row id that does not exist.
+The cache is per process: the save/delete signals drop a device from the
+cache of the process that changed it, while other workers keep their copy
+until it is evicted or the worker restarts. Edits that matter to ingest
+(deleting a device, changing its ``device_id``) should be followed by a
+restart of the web service.
+"""
+import atexit
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, DateTimeField, Value, When
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .background import PeriodicWorker
+from .models import Device
+
+# Keep the CASE expression of one UPDATE to a reasonable size
+LAST_SEEN_UPDATE_CHUNK = 500
+
+
+class DeviceRegistry:
+    """Bounded LRU cache of Device rows with coalesced last_seen writes"""
+
+    def __init__(self, max_size=1024, flush_seconds=5.0):
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._devices = OrderedDict()
+        self._last_seen = {}
+        self._flusher = PeriodicWorker(flush_seconds, self.flush_last_seen, 'sensor-last-seen-flusher')
+
+    def resolve(self, device_id, defaults=None):
+        """Return (device, created) and mark the device as seen now"""
+        self._flusher.ensure_started()
+        now = timezone.now()
+
+        with self._lock:
+            device = self._devices.get(device_id)
+            if device is not None:
+                self._devices.move_to_end(device_id)
+                device.last_seen = now
+                self._last_seen[device_id] = now
+                return device, False
+
+        # pylint: disable=no-member
+        device, created = Device.objects.get_or_create(  # type: ignore
+            device_id=device_id,
+            defaults=dict(defaults or {}, last_seen=now)
+        )
+        if created:
+            # Cached only if the insert commits; a rollback would leave a phantom pk
+            transaction.on_commit(lambda: self._remember(device))
+        else:
+            self._remember(device)
+            with self._lock:
+                device.last_seen = now
+                self._last_seen[device_id] = now
+        return device, created
+
+    def _remember(self, device):
+        with self._lock:
+            self._devices[device.device_id] = device
+            self._devices.move_to_end(device.device_id)
+            while len(self._devices) > self.max_size:
+                self._devices.popitem(last=False)
+
+    def forget(self, device_id):
+        with self._lock:
+            self._devices.pop(device_id, None)
+            self._last_seen.pop(device_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._devices.clear()
+            self._last_seen.clear()
+
+    def flush_last_seen(self):
+        """Write pending last_seen values in batched UPDATEs. Returns devices updated."""
+        with self._lock:
+            pending, self._last_seen = self._last_seen, {}
+        if not pending:
+            return 0
+
+        items = list(pending.items())
+        for start in range(0, len(items), LAST_SEEN_UPDATE_CHUNK):
+            chunk = items[start:start + LAST_SEEN_UPDATE_CHUNK]
+            # pylint: disable=no-member
+            Device.objects.filter(device_id__in=[device_id for device_id, _ in chunk]).update(  # type: ignore
+                last_seen=Case(
+                    *[When(device_id=device_id, then=Value(seen)) for device_id, seen in chunk],
+                    output_field=DateTimeField(),
+                )
+            )
+        return len(items)
+
+    def __len__(self):
+        return len(self._devices)
+
+    def stop(self):
+        self._flusher.stop()
+        self.flush_last_seen()
+
+
+device_registry = DeviceRegistry(
+    max_size=getattr(settings, 'SENSOR_DEVICE_CACHE_SIZE', 1024),
+    flush_seconds=getattr(settings, 'SENSOR_LAST_SEEN_FLUSH_SECONDS', 5.0),
+)
+atexit.register(device_registry.stop)
+
+
+@receiver(post_save, sender=Device)
+@receiver(post_delete, sender=Device)
+def _forget_changed_device(sender, instance, **kwargs):
+    """Drop devices edited or deleted elsewhere (admin, DeviceDetailView)"""
+    device_registry.forget(instance.device_id)
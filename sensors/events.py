@@ -0,0 +1,276 @@
+"""
+Live reading fan-out for push endpoints (Server-Sent Events, WebSocket).
+
+Every committed reading becomes one small event in ``event_hub``, a bounded
+ring buffer shared by all subscribers of the process: publishing is O(1) and
+each subscriber just waits for ids newer than the last one it sent, so one
+ingest event reaches N subscribers without N queries. The ring buffer also
+lets a reconnecting client resume from ``Last-Event-ID``.
+
+With the ``'postgres'`` backend ingest publishes through ``pg_notify`` inside
+the write transaction and every process runs one LISTEN thread feeding its
+local hub, so subscribers see readings ingested by any worker. Each notified
+event carries an id minted by the ingesting process (``<boot>.<n>``), the same
+in every hub, so ``Last-Event-ID`` resumes on whichever worker the client
+reconnects to. The ``'local'`` backend only sees readings ingested by the same
+process; its ids are ``<boot>-<seq>`` and an id from another process makes the
+client restart from "now" instead of receiving a wrong slice.
+``SENSOR_EVENTS_BACKEND`` picks the backend; when unset it is ``'postgres'`` on
+PostgreSQL and ``'local'`` otherwise.
+
+``stream_slots`` caps the live streams one process serves at a time
+(``SENSOR_SSE_MAX_STREAMS``), so open dashboards cannot take every worker
+away from ingest.
+"""
+import itertools
+import json
+import logging
+import os
+import select
+import threading
+import uuid
+from collections import deque
+
+from django.conf import settings
+from django.db import connection
+
+from .models import (
+    ECGReading, PulseOximeterReading, MAX30102Reading, AccelerometerReading,
+    DeviceStatus
+)
+
+logger = logging.getLogger(__name__)
+
+NOTIFY_CHANNEL = 'sensor_readings'
+# PostgreSQL rejects NOTIFY payloads of 8000 bytes or more
+NOTIFY_MAX_PAYLOAD = 7500
+
+# model -> (sensor name, value fields)
+EVENT_FIELDS = {
+    ECGReading: ('ecg', ('heart_rate', 'ecg_value')),
+    PulseOximeterReading: ('pulse_oximeter', ('spo2', 'heart_rate')),
+    MAX30102Reading: ('max30102', ('heart_rate', 'spo2')),
+    AccelerometerReading: ('accelerometer', ('x_axis', 'y_axis', 'z_axis', 'magnitude')),
+    DeviceStatus: ('device_status', ('battery_level', 'wifi_signal_strength')),
+}
+
+SENSOR_NAMES = tuple(sensor for sensor, _ in EVENT_FIELDS.values())
+EVENT_MODELS = {sensor: model for model, (sensor, _) in EVENT_FIELDS.items()}
+
+
+def reading_event(instance):
+    """Plain dict describing one reading, or None for untracked models"""
+    spec = EVENT_FIELDS.get(type(instance))
+    if spec is None:
+        return None
+    sensor, fields = spec
+    return {
+        'device': instance.device.device_id,
+        'sensor': sensor,
+        'timestamp': instance.timestamp.isoformat(),
+        'values': {field: getattr(instance, field) for field in fields},
+    }
+
+
+class Event:
+    __slots__ = ('seq', 'device', 'sensor', 'data', 'origin')
+
+    def __init__(self, seq, device, sensor, data, origin=None):
+        self.seq = seq
+        self.device = device
+        self.sensor = sensor
+        self.data = data  # JSON text, encoded once for every subscriber
+        self.origin = origin  # id shared by every process, when notified
+
+
+class EventHub:
+    """Bounded in-process ring buffer of reading events with blocking reads"""
+
+    def __init__(self, history=2000):
+        self.boot = uuid.uuid4().hex[:8]
+        self._cond = threading.Condition()
+        self._events = deque(maxlen=history)
+        self._seq = 0
+
+    def event_id(self, event):
+        return event.origin or f"{self.boot}-{event.seq}"
+
+    def publish(self, events):
+        """Append event dicts and wake every waiting subscriber"""
+        with self._cond:
+            for event in events:
+                origin = event.pop('id', None)
+                self._seq += 1
+                self._events.append(Event(
+                    self._seq, event['device'], event['sensor'], json.dumps(event), origin
+                ))
+            self._cond.notify_all()
+
+    def last_seq(self):
+        return self._seq
+
+    def resolve(self, last_event_id):
+        """Map a client's Last-Event-ID to a local sequence number"""
+        if last_event_id:
+            boot, _, seq = last_event_id.partition('-')
+            if boot == self.boot and seq.isdigit():
+                return int(seq)
+            with self._cond:
+                for event in reversed(self._events):
+                    if event.origin == last_event_id:
+                        return event.seq
+        return self._seq
+
+    def wait(self, after, timeout):
+        """Events with seq > ``after``, blocking up to ``timeout`` seconds for one"""
+        with self._cond:
+            if self._seq <= after:
+                self._cond.wait(timeout)
+            if self._seq <= after:
+                return []
+            # Walk back from the newest event so a wakeup costs O(new events)
+            fresh = []
+            for event in reversed(self._events):
+                if event.seq <= after:
+                    break
+                fresh.append(event)
+            fresh.reverse()
+            return fresh
+
+
+event_hub = EventHub(history=getattr(settings, 'SENSOR_EVENT_HISTORY', 2000))
+
+
+class StreamSlots:
+    """Counter of the live streams a process is serving, up to ``limit``"""
+
+    def __init__(self, limit=16):
+        self.limit = limit
+        self._lock = threading.Lock()
+        self._active = 0
+
+    def acquire(self):
+        """Take a slot; False when the process already serves ``limit`` streams"""
+        with self._lock:
+            if self._active >= self.limit:
+                return False
+            self._active += 1
+            return True
+
+    def release(self):
+        with self._lock:
+            self._active = max(self._active - 1, 0)
+
+    @property
+    def active(self):
+        return self._active
+
+
+stream_slots = StreamSlots(limit=getattr(settings, 'SENSOR_SSE_MAX_STREAMS', 16))
+
+# Ids for notified events, unique across processes with the hub's boot prefix
+_notify_ids = itertools.count(1)
+
+
+def events_backend():
+    backend = getattr(settings, 'SENSOR_EVENTS_BACKEND', '')
+    if backend:
+        return backend
+    return 'postgres' if connection.vendor == 'postgresql' else 'local'
+
+
+def notify_readings(instances):
+    """Inside the ingest transaction: pg_notify the events (delivered on commit)"""
+    payloads, current, size = [], [], 0
+    for instance in instances:
+        event = reading_event(instance)
+        if event is None:
+            continue
+        event['id'] = f"{event_hub.boot}.{next(_notify_ids)}"
+        text = json.dumps(event)
+        if current and size + len(text) + 1 > NOTIFY_MAX_PAYLOAD:
+            payloads.append('\n'.join(current))
+            current, size = [], 0
+        current.append(text)
+        size += len(text) + 1
+    if current:
+        payloads.append('\n'.join(current))
+
+    if payloads:
+        with connection.cursor() as cursor:
+            for payload in payloads:
+                cursor.execute('SELECT pg_notify(%s, %s)', [NOTIFY_CHANNEL, payload])
+
+
+def publish_local(instances):
+    """After commit: hand the readings straight to this process's hub"""
+    events = [event for event in map(reading_event, instances) if event is not None]
+    if events:
+        event_hub.publish(events)
+
+
+class PostgresListener:
+    """One LISTEN connection per process feeding ``event_hub``"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pid = None
+        self._thread = None
+
+    def ensure_started(self):
+        if self._pid == os.getpid() and self._thread and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._pid == os.getpid() and self._thread and self._thread.is_alive():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='sensor-events-listener', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        stop = threading.Event()
+        while not stop.wait(1.0):
+            try:
+                self._listen()
+            except Exception:  # pylint: disable=broad-except
+                logger.exception("Sensor event listener lost its connection; reconnecting")
+
+    def _listen(self):
+        raw = connection.get_new_connection(connection.get_connection_params())
+        try:
+            raw.autocommit = True
+            raw.cursor().execute(f'LISTEN {NOTIFY_CHANNEL}')
+            if callable(getattr(raw, 'notifies', None)):
+                # psycopg 3
+                while True:
+                    for notify in raw.notifies(timeout=30.0):
+                        self._deliver(notify.payload)
+            else:
+                # psycopg2
+                while True:
+                    if select.select([raw], [], [], 30.0) == ([], [], []):
+                        continue
+                    raw.poll()
+                    while raw.notifies:
+                        self._deliver(raw.notifies.pop(0).payload)
+        finally:
+            raw.close()
+
+    @staticmethod
+    def _deliver(payload):
+        from .latest import latest_values  # latest imports this module
+        events = [json.loads(line) for line in payload.split('\n') if line]
+        for event in events:
+            model = EVENT_MODELS.get(event['sensor'])
+            if model is not None:
+                latest_values.record_event(model, event)
+        event_hub.publish(events)
+
+
+postgres_listener = PostgresListener()
+
+
+def ensure_listening():
+    """Start the cross-process listener for subscribers when it is configured"""
+    if events_backend() == 'postgres':
+        postgres_listener.ensure_started()
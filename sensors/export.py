@@ -0,0 +1,89 @@
+"""
+Streaming CSV/NDJSON export of raw readings.
+
+Rows are read with ``values_list(...).iterator(chunk_size=...)`` (a server-side
+cursor on PostgreSQL) and encoded a block at a time, so memory use stays
+constant however many rows the export covers. Used by the /api/export/ view and
+the ``export_readings`` management command.
+"""
+import csv
+import io
+import json
+
+from .models import (
+    ECGReading, PulseOximeterReading, MAX30102Reading, AccelerometerReading,
+    DeviceStatus
+)
+
+EXPORT_MODELS = {
+    'ecg': ECGReading,
+    'pulse_oximeter': PulseOximeterReading,
+    'max30102': MAX30102Reading,
+    'accelerometer': AccelerometerReading,
+    'device_status': DeviceStatus,
+}
+
+FORMATS = ('csv', 'ndjson')
+
+CONTENT_TYPES = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+
+
+def export_columns(model):
+    """Column names: device_id, timestamp, then the model's value fields"""
+    values = [
+        field.name for field in model._meta.concrete_fields
+        if field.name not in ('id', 'device', 'timestamp')
+    ]
+    return ['device_id', 'timestamp'] + values
+
+
+def export_queryset(sensor, device_id=None, start=None, end=None):
+    model = EXPORT_MODELS[sensor]
+    # pylint: disable=no-member
+    queryset = model.objects.all()  # type: ignore
+    if device_id:
+        queryset = queryset.filter(device__device_id=device_id)
+    if start:
+        queryset = queryset.filter(timestamp__gte=start)
+    if end:
+        queryset = queryset.filter(timestamp__lt=end)
+    columns = export_columns(model)
+    lookups = ['device__device_id'] + columns[1:]
+    return columns, queryset.order_by('timestamp', 'id').values_list(*lookups)
+
+
+def stream_export(sensor, fmt='csv', device_id=None, start=None, end=None,
+                  chunk_size=2000):
+    """Yield encoded blocks of about ``chunk_size`` rows"""
+    columns, rows = export_queryset(sensor, device_id, start, end)
+    buffer = io.StringIO()
+
+    if fmt == 'csv':
+        writer = csv.writer(buffer)
+        writer.writerow(columns)
+
+        def write(row):
+            writer.writerow([row[0], row[1].isoformat(), *row[2:]])
+    else:
+        def write(row):
+            record = dict(zip(columns, row))
+            record['timestamp'] = row[1].isoformat()
+            buffer.write(json.dumps(record))
+            buffer.write('\n')
+
+    pending = 0
+    for row in rows.iterator(chunk_size=chunk_size):
+        write(row)
+        pending += 1
+        if pending >= chunk_size:
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+            pending = 0
+
+    tail = buffer.getvalue()
+    if tail:
+        yield tail.encode()
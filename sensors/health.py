@@ -0,0 +1,59 @@
+"""
+Cached database liveness probe for the health endpoints.
+
+A background ``PeriodicWorker`` runs ``SELECT 1`` every
+``SENSOR_HEALTH_INTERVAL`` seconds and keeps the outcome, so health checks are
+answered from memory however often the load balancer polls. If the cached
+result is older than three intervals (the worker is stuck or not started yet)
+the probe runs inline instead.
+"""
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.db import connection
+
+from .background import PeriodicWorker
+
+logger = logging.getLogger(__name__)
+
+
+class HealthProbe:
+    def __init__(self, interval=5.0):
+        self.interval = interval
+        self._lock = threading.Lock()
+        self.healthy = None
+        self.error = None
+        self.checked_at = None
+        self.latency_ms = None
+        self._worker = PeriodicWorker(interval, self.refresh, 'sensor-health-probe')
+
+    def refresh(self):
+        started = time.monotonic()
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            healthy, error = True, None
+        except Exception as e:  # pylint: disable=broad-except
+            healthy, error = False, str(e)
+            logger.warning("Database health probe failed: %s", e)
+        with self._lock:
+            self.healthy, self.error = healthy, error
+            self.latency_ms = (time.monotonic() - started) * 1000
+            self.checked_at = time.monotonic()
+        return healthy
+
+    def status(self):
+        """(healthy, error, age_seconds) from the cache, probing inline when stale"""
+        self._worker.ensure_started()
+        if self.checked_at is None or time.monotonic() - self.checked_at > 3 * self.interval:
+            self.refresh()
+        with self._lock:
+            return self.healthy, self.error, time.monotonic() - self.checked_at
+
+    def stop(self):
+        self._worker.stop()
+
+
+health_probe = HealthProbe(interval=getattr(settings, 'SENSOR_HEALTH_INTERVAL', 5.0))
@@ -0,0 +1,323 @@
+"""
+Sensor ingest helpers shared by the ESP32 POST endpoints.
+
+``readings_from_payload`` turns one decoded ESP32 payload into unsaved model
+instances. They are either written straight away with ``save_readings`` or,
+when ``SENSOR_INGEST_BUFFERED`` is on, queued in the process-wide
+``IngestBuffer`` and written with one ``bulk_create`` per model once the
+buffer holds ``SENSOR_INGEST_BATCH_SIZE`` rows or ``SENSOR_INGEST_FLUSH_MS``
+milliseconds have passed. Failed flushes are retried; a full buffer answers
+new payloads with 503 instead of growing.
+"""
+import atexit
+import logging
+import math
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import transaction
+
+from .anomalies import detect_anomalies, detection_enabled
+from .background import PeriodicWorker
+from .dedupe import drop_replays
+from .counters import add_counts, count_instances
+from .events import EVENT_FIELDS, events_backend, notify_readings, publish_local
+from .latest import latest_values
+from .metrics import registry as metrics
+from .rollups import apply_rollups
+from .snapshots import update_snapshots
+from .models import (
+    ECGReading, PulseOximeterReading, MAX30102Reading, AccelerometerReading,
+    DeviceStatus
+)
+
+logger = logging.getLogger(__name__)
+
+
+def readings_from_payload(device, data):
+    """Build unsaved readings from an ESP32 payload as (label, instance) pairs"""
+    readings = []
+
+    # ECG reading
+    if 'ecg_heart_rate' in data and data['ecg_heart_rate']:
+        try:
+            readings.append(('ECG', ECGReading(
+                device=device,
+                heart_rate=float(data['ecg_heart_rate']),
+                ecg_value=float(data['ecg_heart_rate']),  # Use same value for now
+            )))
+        except (TypeError, ValueError):
+            pass  # Continue with other sensors
+
+    # SpO2 reading
+    if 'spo2' in data and data['spo2']:
+        try:
+            readings.append(('SpO2', PulseOximeterReading(
+                device=device,
+                spo2=float(data['spo2']),
+                heart_rate=float(data.get('pulse_heart_rate', data.get('ecg_heart_rate', 70))),
+                signal_strength=90,  # Default signal strength
+            )))
+        except (TypeError, ValueError):
+            pass
+
+    # MAX30102 reading
+    if 'max30102_heart_rate' in data and data['max30102_heart_rate']:
+        try:
+            readings.append(('MAX30102', MAX30102Reading(
+                device=device,
+                heart_rate=float(data['max30102_heart_rate']),
+                red_value=1000,  # Default values
+                ir_value=1000,
+            )))
+        except (TypeError, ValueError):
+            pass
+
+    # Accelerometer reading
+    if all(key in data for key in ['x_axis', 'y_axis', 'z_axis']):
+        try:
+            x, y, z = float(data['x_axis']), float(data['y_axis']), float(data['z_axis'])
+            readings.append(('Accelerometer', AccelerometerReading(
+                device=device,
+                x_axis=x,
+                y_axis=y,
+                z_axis=z,
+                magnitude=(x**2 + y**2 + z**2)**0.5,
+            )))
+        except (TypeError, ValueError):
+            pass
+
+    return readings
+
+
+def readings_from_sample(device, data, timestamp=None):
+    """Build unsaved readings from one validated BulkSensorDataSerializer sample.
+
+    Returns (label, instance) pairs. ``timestamp`` is the device-side sample
+    time; when omitted the model default (arrival time) is used.
+    """
+    stamp = {'timestamp': timestamp} if timestamp is not None else {}
+    readings = []
+
+    # ECG reading if data available
+    if data.get('ecg_heart_rate') or data.get('ecg_value'):
+        readings.append(('ecg', ECGReading(
+            device=device,
+            heart_rate=data.get('ecg_heart_rate') or 0,
+            ecg_value=data.get('ecg_value') or 0,
+            signal_quality=data.get('ecg_signal_quality') or 'good',
+            **stamp
+        )))
+
+    # Pulse Oximeter reading if data available
+    if data.get('spo2') or data.get('pulse_heart_rate'):
+        readings.append(('pulse_oximeter', PulseOximeterReading(
+            device=device,
+            spo2=data.get('spo2') or 0,
+            heart_rate=data.get('pulse_heart_rate') or 0,
+            signal_strength=data.get('pulse_signal_strength') or 50,
+            **stamp
+        )))
+
+    # MAX30102 reading if data available
+    if data.get('max30102_heart_rate') or data.get('red_value') or data.get('ir_value'):
+        readings.append(('max30102', MAX30102Reading(
+            device=device,
+            heart_rate=data.get('max30102_heart_rate') or 0,
+            spo2=data.get('max30102_spo2'),
+            red_value=data.get('red_value') or 0,
+            ir_value=data.get('ir_value') or 0,
+            temperature=data.get('temperature'),
+            **stamp
+        )))
+
+    # Accelerometer reading if data available
+    if (data.get('x_axis') is not None or data.get('y_axis') is not None or
+            data.get('z_axis') is not None):
+        x = data.get('x_axis') or 0
+        y = data.get('y_axis') or 0
+        z = data.get('z_axis') or 0
+        magnitude = data.get('magnitude')
+        if magnitude is None:
+            magnitude = math.sqrt(x*x + y*y + z*z)
+        readings.append(('accelerometer', AccelerometerReading(
+            device=device,
+            x_axis=x,
+            y_axis=y,
+            z_axis=z,
+            magnitude=magnitude,
+            **stamp
+        )))
+
+    # Device status if data available
+    if (data.get('battery_level') is not None or
+            data.get('wifi_signal_strength') is not None or
+            data.get('memory_usage') is not None):
+        readings.append(('device_status', DeviceStatus(
+            device=device,
+            battery_level=data.get('battery_level'),
+            wifi_signal_strength=data.get('wifi_signal_strength'),
+            memory_usage=data.get('memory_usage'),
+            cpu_temperature=data.get('cpu_temperature'),
+            uptime_seconds=data.get('uptime_seconds'),
+            **stamp
+        )))
+
+    return readings
+
+
+def publish_readings(instances):
+    """Feed committed readings to the in-memory read paths"""
+    saved = defaultdict(int)
+    for instance in instances:
+        latest_values.record(instance)
+        saved[type(instance)] += 1
+    for model, count in saved.items():
+        metrics.inc('sensor_readings_saved_total', count, sensor=EVENT_FIELDS[model][0])
+    if events_backend() == 'local':
+        publish_local(instances)
+
+
+def save_readings(instances):
+    """Write readings now, one bulk_create per model. Returns rows written."""
+    by_model = defaultdict(list)
+    for instance in instances:
+        by_model[type(instance)].append(instance)
+
+    with transaction.atomic():
+        for model, rows in by_model.items():
+            model.objects.bulk_create(rows)  # type: ignore
+        apply_rollups(instances)
+        update_snapshots(instances)
+        if detection_enabled():
+            detect_anomalies(instances)
+        add_counts(count_instances(instances))
+        if events_backend() == 'postgres':
+            notify_readings(instances)
+        transaction.on_commit(lambda: publish_readings(instances))
+    return len(instances)
+
+
+class BufferFull(Exception):
+    """Raised by ``IngestBuffer.add`` while the buffer holds ``max_rows`` rows"""
+
+
+class IngestBuffer:
+    """In-process write-behind buffer flushed by size or by age.
+
+    Readings are queued in groups, one per payload. A group may carry the
+    payload's (device, boot_id, sequence); those sequences are claimed in the
+    flush transaction, so a failed flush does not turn the device's retry
+    into a "duplicate".
+
+    A failed flush puts its batch back at the head of the queue and the next
+    attempt waits with exponential backoff. A batch is only dropped after
+    ``max_retries`` failed attempts, or when stopping, and is counted in
+    ``sensor_ingest_dropped_total``. Once ``max_rows`` rows are queued,
+    ``add`` raises ``BufferFull`` so the device is told to retry.
+    """
+
+    def __init__(self, batch_size=500, flush_ms=1000, max_rows=10000, max_retries=5):
+        self.batch_size = batch_size
+        self.max_rows = max_rows
+        self.max_retries = max_retries
+        self.retry_base = flush_ms / 1000.0
+        self._lock = threading.Lock()
+        self._pending = []
+        self._rows = 0
+        self._failures = 0
+        self._retry_at = 0.0
+        self._flusher = PeriodicWorker(flush_ms / 1000.0, self.flush, 'sensor-ingest-flusher')
+
+    def add(self, instances, sequence=None):
+        """Queue readings, optionally with their payload's (device, boot_id, sequence)"""
+        device, boot_id, seq = sequence or (None, None, None)
+        return self.add_groups([(device, boot_id, seq, instances)])
+
+    def add_groups(self, groups):
+        """Queue (device, boot_id, sequence, instances) groups all or nothing;
+        flush inline when the batch size is reached. Returns rows queued."""
+        self._flusher.ensure_started()
+        rows = sum(len(group[3]) for group in groups)
+        with self._lock:
+            if self._rows and self._rows + rows > self.max_rows:
+                metrics.inc('sensor_ingest_rejected_total', rows)
+                raise BufferFull(f"Ingest buffer holds {self._rows} rows")
+            self._pending.extend(groups)
+            self._rows += rows
+            batch = self._take() if self._rows >= self.batch_size and self._ready() else None
+        if batch:
+            self._write(batch)
+        return rows
+
+    def flush(self, force=False):
+        """Write everything queued so far, unless backing off after a failure.
+        Returns rows written."""
+        with self._lock:
+            batch = self._take() if force or self._ready() else None
+        return self._write(batch, final=force) if batch else 0
+
+    def __len__(self):
+        return self._rows
+
+    def _ready(self):
+        return time.monotonic() >= self._retry_at
+
+    def _take(self):
+        batch, self._pending, self._rows = self._pending, [], 0
+        return batch
+
+    def _write(self, batch, final=False):
+        rows = sum(len(group[3]) for group in batch)
+        metrics.observe('sensor_ingest_flush_rows', rows)
+        try:
+            with transaction.atomic():
+                groups, _ = drop_replays(batch)
+                written = save_readings([instance for group in groups for instance in group])
+        except Exception:  # pylint: disable=broad-except
+            self._failed(batch, rows, final)
+            return 0
+        with self._lock:
+            self._failures = 0
+            self._retry_at = 0.0
+        return written
+
+    def _failed(self, batch, rows, final):
+        metrics.inc('sensor_ingest_flush_failures_total')
+        with self._lock:
+            self._failures += 1
+            if final or self._failures > self.max_retries:
+                logger.exception("Dropped %d buffered readings after %d failed flushes", rows, self._failures)
+                metrics.inc('sensor_ingest_dropped_total', rows)
+                self._failures = 0
+                self._retry_at = 0.0
+                return
+            logger.exception("Flush of %d buffered readings failed; retrying", rows)
+            # The rolled-back INSERT may have assigned primary keys
+            for group in batch:
+                for instance in group[3]:
+                    instance.pk = None
+                    instance._state.adding = True  # pylint: disable=protected-access
+            self._pending[:0] = batch
+            self._rows += rows
+            self._retry_at = time.monotonic() + min(self.retry_base * 2 ** self._failures, 60.0)
+
+    def stop(self):
+        """Stop the flusher thread and write what is left"""
+        self._flusher.stop()
+        self.flush(force=True)
+
+
+ingest_buffer = IngestBuffer(
+    batch_size=getattr(settings, 'SENSOR_INGEST_BATCH_SIZE', 500),
+    flush_ms=getattr(settings, 'SENSOR_INGEST_FLUSH_MS', 1000),
+    max_rows=getattr(settings, 'SENSOR_INGEST_MAX_ROWS', 10000),
+    max_retries=getattr(settings, 'SENSOR_INGEST_MAX_RETRIES', 5),
+)
+atexit.register(ingest_buffer.stop)
+
+
+def buffering_enabled():
+    return getattr(settings, 'SENSOR_INGEST_BUFFERED', False)
@@ -0,0 +1,162 @@
+"""
+Latest-value cache for the single-value sensor endpoints (/api/ecg/ etc.).
+
+The ingest path calls ``latest_values.record()`` for every committed reading,
+which stores the pre-rendered plain-text body per sensor, both fleet-wide and
+per device. With the ``'postgres'`` events backend every process also records
+the readings other processes commit (``record_event``, fed by the LISTEN
+thread), so the cache is kept current by writes alone. Reads are served from
+memory; the database is only queried when a key is cold or has expired.
+Entries expire after ``SENSOR_LATEST_CACHE_TTL`` seconds, which only bounds
+staleness after a missed notification, or when several processes share the
+``'local'`` backend (0 disables expiry for single-process deployments). The
+``?device=`` key comes from the client, so the cache is an LRU of at most
+``SENSOR_LATEST_CACHE_SIZE`` entries.
+"""
+import threading
+import time
+from collections import OrderedDict
+from types import SimpleNamespace
+
+from django.conf import settings
+from django.utils.dateparse import parse_datetime
+
+from .events import ensure_listening
+
+from .models import (
+    ECGReading, PulseOximeterReading, MAX30102Reading, AccelerometerReading
+)
+
+
+class LatestSensor:
+    """How one single-value endpoint reads and renders its value"""
+
+    def __init__(self, model, field, fallback, label, falsy_fallback=True):
+        self.model = model
+        self.field = field
+        self.fallback = fallback
+        self.label = label
+        # ECG/SpO2/MAX30102 treat 0 as "no reading"; accelerometer axes only None
+        self.falsy_fallback = falsy_fallback
+
+    def render(self, reading):
+        value = getattr(reading, self.field)
+        if value is None or (self.falsy_fallback and not value):
+            return self.fallback
+        return str(value)
+
+
+SENSORS = {
+    'ecg': LatestSensor(ECGReading, 'heart_rate', '75', 'ECG'),
+    'spo2': LatestSensor(PulseOximeterReading, 'spo2', '98.5', 'SpO2'),
+    'max30102': LatestSensor(MAX30102Reading, 'heart_rate', '72', 'MAX30102'),
+    'accel_x': LatestSensor(AccelerometerReading, 'x_axis', '0.15', 'accel X', falsy_fallback=False),
+    'accel_y': LatestSensor(AccelerometerReading, 'y_axis', '-0.08', 'accel Y', falsy_fallback=False),
+    'accel_z': LatestSensor(AccelerometerReading, 'z_axis', '9.81', 'accel Z', falsy_fallback=False),
+}
+
+
+class LatestEntry:
+    __slots__ = ('body', 'value', 'timestamp', 'device_id', 'expires')
+
+    def __init__(self, body, timestamp, device_id, expires, value=None):
+        self.body = body
+        self.value = value
+        self.timestamp = timestamp
+        self.device_id = device_id
+        self.expires = expires
+
+    @property
+    def has_data(self):
+        return self.timestamp is not None
+
+
+class LatestValueCache:
+    """Bounded LRU of pre-rendered latest values keyed by (sensor, device_id or None)"""
+
+    def __init__(self, ttl=30.0, max_size=4096):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def _expiry(self):
+        return time.monotonic() + self.ttl if self.ttl else None
+
+    def get(self, sensor, device_id=None):
+        """Return the cached entry, loading it from the database when cold"""
+        ensure_listening()
+        key = (sensor, device_id)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and (entry.expires is None or entry.expires > time.monotonic()):
+                self._entries.move_to_end(key)
+                return entry
+        entry = self._load(sensor, device_id)
+        with self._lock:
+            current = self._entries.get(key)
+            # A write may have landed while we were querying; keep the newer one
+            if (current is None or not current.has_data or
+                    (entry.has_data and entry.timestamp >= current.timestamp)):
+                self._store(key, entry)
+            else:
+                current.expires = entry.expires
+                entry = current
+        return entry
+
+    def _store(self, key, entry):
+        """Insert as most recently used and evict past ``max_size``; hold the lock"""
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def _load(self, sensor, device_id):
+        spec = SENSORS[sensor]
+        # pylint: disable=no-member
+        queryset = spec.model.objects.select_related('device')  # type: ignore
+        if device_id is not None:
+            queryset = queryset.filter(device__device_id=device_id)
+        try:
+            reading = queryset.latest('timestamp')
+        except spec.model.DoesNotExist:
+            return LatestEntry(spec.fallback.encode(), None, None, self._expiry())
+        return LatestEntry(
+            spec.render(reading).encode(), reading.timestamp,
+            reading.device.device_id, self._expiry(), getattr(reading, spec.field)
+        )
+
+    def record(self, reading):
+        """Update every sensor fed by this reading, fleet-wide and per device"""
+        self._record(type(reading), reading.device.device_id, reading.timestamp, reading)
+
+    def record_event(self, model, event):
+        """``record`` for a reading event (``events.reading_event``) from any process"""
+        self._record(model, event['device'], parse_datetime(event['timestamp']),
+                     SimpleNamespace(**event['values']))
+
+    def _record(self, model, device_id, timestamp, values):
+        expires = self._expiry()
+        with self._lock:
+            for sensor, spec in SENSORS.items():
+                if not issubclass(model, spec.model):
+                    continue
+                entry = LatestEntry(spec.render(values).encode(), timestamp, device_id,
+                                    expires, getattr(values, spec.field))
+                for key in ((sensor, None), (sensor, device_id)):
+                    current = self._entries.get(key)
+                    if current is None or not current.has_data or timestamp >= current.timestamp:
+                        self._store(key, entry)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+latest_values = LatestValueCache(
+    ttl=getattr(settings, 'SENSOR_LATEST_CACHE_TTL', 30.0),
+    max_size=getattr(settings, 'SENSOR_LATEST_CACHE_SIZE', 4096),
+)
@@ -0,0 +1,102 @@
+"""
+Rebuild ReadingRollup buckets from the raw reading tables.
+
+    python manage.py backfill_rollups --since 2025-09-01 [--until ...] [--device ESP32_001]
+
+Raw rows are aggregated in the database (GROUP BY device, truncated time) one
+day at a time, and the resulting buckets overwrite existing rollups. Run it
+for past ranges: ``--until`` defaults to the start of the current hour so it
+does not race with live ingest, which keeps the open buckets up to date.
+"""
+from datetime import datetime, time, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Count, F, Max, Min, Sum
+from django.db.models.functions import TruncHour, TruncMinute
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime, parse_date
+
+from sensors.models import ReadingRollup
+from sensors.rollups import ROLLUP_METRICS, bucket_start, merge_partials
+
+TRUNC = {
+    ReadingRollup.PERIOD_MINUTE: TruncMinute,
+    ReadingRollup.PERIOD_HOUR: TruncHour,
+}
+
+
+def _parse(value):
+    parsed = parse_datetime(value)
+    if parsed is None:
+        date = parse_date(value)
+        if date is None:
+            raise CommandError(f"Invalid date/datetime: {value}")
+        parsed = datetime.combine(date, time.min)
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+class Command(BaseCommand):
+    help = "Rebuild per-minute/per-hour reading rollups from raw readings"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', required=True, help="Start (ISO date or datetime)")
+        parser.add_argument('--until', help="End, exclusive (default: start of current hour)")
+        parser.add_argument('--device', help="Only this device_id")
+        parser.add_argument('--metric', action='append',
+                            help="Only these metrics (repeatable), e.g. ecg_heart_rate")
+
+    def handle(self, *args, **options):
+        since = bucket_start(_parse(options['since']), ReadingRollup.PERIOD_HOUR)
+        until = _parse(options['until']) if options['until'] else timezone.now()
+        until = bucket_start(until, ReadingRollup.PERIOD_HOUR)
+        if since >= until:
+            raise CommandError("--since must be before --until")
+        metrics = options['metric']
+
+        total = 0
+        day_start = since
+        while day_start < until:
+            day_end = min(day_start + timedelta(days=1), until)
+            buckets = 0
+            for model, field, metric, skip_zero in ROLLUP_METRICS:
+                if metrics and metric not in metrics:
+                    continue
+                buckets += self._backfill(model, field, metric, skip_zero,
+                                          day_start, day_end, options['device'])
+            self.stdout.write(f"{day_start:%Y-%m-%d %H:%M} - {day_end:%Y-%m-%d %H:%M}: {buckets} buckets")
+            total += buckets
+            day_start = day_end
+
+        self.stdout.write(self.style.SUCCESS(f"Backfilled {total} rollup buckets"))
+
+    def _backfill(self, model, field, metric, skip_zero, start, end, device_id):
+        # pylint: disable=no-member
+        queryset = model.objects.filter(  # type: ignore
+            timestamp__gte=start, timestamp__lt=end, **{f'{field}__isnull': False}
+        )
+        if skip_zero:
+            queryset = queryset.exclude(**{field: 0})
+        if device_id:
+            queryset = queryset.filter(device__device_id=device_id)
+
+        partials = {}
+        for period, trunc in TRUNC.items():
+            rows = (
+                queryset.order_by()
+                .annotate(bucket=trunc('timestamp'))
+                .values('device_id', 'bucket')
+                .annotate(
+                    n=Count('id'), lo=Min(field), hi=Max(field),
+                    total=Sum(field), total_sq=Sum(F(field) * F(field)),
+                )
+            )
+            for row in rows.iterator():
+                partials[(row['device_id'], metric, period, row['bucket'])] = [
+                    row['n'], row['lo'], row['hi'], row['total'], row['total_sq']
+                ]
+
+        with transaction.atomic():
+            return merge_partials(partials, replace=True)
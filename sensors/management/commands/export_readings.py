@@ -0,0 +1,55 @@
+"""
+Stream raw readings to a CSV or NDJSON file with constant memory.
+
+    python manage.py export_readings --sensor ecg --device ESP32_001 \
+        --since 2025-09-01 --until 2025-10-01 --format csv --output ecg.csv
+"""
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from sensors.export import EXPORT_MODELS, FORMATS, stream_export
+
+
+def _parse(value):
+    if not value:
+        return None
+    parsed = parse_datetime(value) or parse_datetime(f"{value}T00:00:00")
+    if parsed is None:
+        raise CommandError(f"Invalid date/datetime: {value}")
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+class Command(BaseCommand):
+    help = "Export raw readings as CSV or NDJSON"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sensor', required=True, choices=sorted(EXPORT_MODELS))
+        parser.add_argument('--format', default='csv', choices=FORMATS)
+        parser.add_argument('--device', help="Only this device_id")
+        parser.add_argument('--since', help="Start (ISO date or datetime)")
+        parser.add_argument('--until', help="End, exclusive (ISO date or datetime)")
+        parser.add_argument('--output', help="File to write (default: stdout)")
+        parser.add_argument('--chunk-size', type=int, default=2000,
+                            help="Rows fetched and written per block")
+
+    def handle(self, *args, **options):
+        blocks = stream_export(
+            options['sensor'], options['format'],
+            device_id=options['device'],
+            start=_parse(options['since']),
+            end=_parse(options['until']),
+            chunk_size=options['chunk_size'],
+        )
+        if options['output']:
+            with open(options['output'], 'wb') as out:
+                written = sum(out.write(block) for block in blocks)
+            self.stderr.write(self.style.SUCCESS(f"Wrote {written} bytes to {options['output']}"))
+        else:
+            for block in blocks:
+                sys.stdout.buffer.write(block)
+            sys.stdout.flush()
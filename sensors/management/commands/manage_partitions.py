@@ -0,0 +1,65 @@
+"""
+Maintain time partitions of the reading tables (PostgreSQL only).
+
+    python manage.py manage_partitions --convert      # once, during a quiet window
+    python manage.py manage_partitions [--dry-run]    # on a schedule, before prune_readings
+
+``--convert`` turns the reading tables into range-partitioned tables (see
+``sensors.partitions``). The scheduled run creates partitions
+``SENSOR_PARTITION_AHEAD`` periods ahead and drops partitions that are
+entirely older than the retention policy. Tables that are not partitioned
+are skipped, so the command is safe to schedule everywhere.
+"""
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from sensors.partitions import (
+    PARTITIONED_MODELS, PartitionError, convert_table, drop_expired, ensure_partitions,
+    is_partitioned, partition_period
+)
+from sensors.retention import retention_days
+
+
+class Command(BaseCommand):
+    help = "Create upcoming and drop expired time partitions of the reading tables"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--convert', action='store_true',
+                            help="Convert the reading tables to partitioned tables")
+        parser.add_argument('--only', action='append', choices=sorted(PARTITIONED_MODELS),
+                            help="Only these tables (repeatable)")
+        parser.add_argument('--dry-run', action='store_true',
+                            help="Report expired partitions without dropping them")
+
+    def handle(self, *args, **options):
+        try:
+            period = partition_period()
+            self._handle(period, options)
+        except PartitionError as e:
+            if options['convert']:
+                raise CommandError(str(e)) from e
+            self.stdout.write(f"Skipping: {e}")
+
+    def _handle(self, period, options):
+        ahead = getattr(settings, 'SENSOR_PARTITION_AHEAD', 7)
+        days = retention_days()
+        for name in options['only'] or PARTITIONED_MODELS:
+            model = PARTITIONED_MODELS[name]
+            table = model._meta.db_table
+            if options['convert']:
+                legacy = convert_table(model, period, ahead)
+                self.stdout.write(self.style.SUCCESS(
+                    f"{table}: partitioned by {period}; existing rows kept in {legacy} (DEFAULT partition)"
+                ))
+                continue
+            if not is_partitioned(table):
+                self.stdout.write(f"{table}: not partitioned, skipped")
+                continue
+
+            created = [] if options['dry_run'] else ensure_partitions(model, period, ahead)
+            dropped = drop_expired(name, period, days[name], dry_run=options['dry_run']) if days[name] else []
+            verb = "would drop" if options['dry_run'] else "dropped"
+            self.stdout.write(
+                f"{table}: created {len(created)}, {verb} {len(dropped)} partitions"
+                + (f" ({', '.join(dropped)})" if dropped else "")
+            )
@@ -0,0 +1,59 @@
+"""
+Apply retention policies: delete expired readings, waveforms and rollups.
+
+    python manage.py prune_readings [--only ecg --only rollup_minute]
+                                    [--days ecg=3] [--chunk-size 5000]
+                                    [--pause-ms 50] [--dry-run]
+
+Meant to run on a schedule (cron / the Render cron job in render.yaml).
+Defaults come from ``sensors.retention.POLICIES`` and
+``SENSOR_RETENTION_DAYS``. Deletes go in short primary-key-range chunks and
+the command reports rows removed and rows/second per table.
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from sensors.retention import POLICIES, parse_overrides, prune, retention_days
+
+
+class Command(BaseCommand):
+    help = "Delete readings, waveforms and rollups older than their retention policy"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--only', action='append', choices=sorted(POLICIES),
+                            help="Only these policies (repeatable)")
+        parser.add_argument('--days', help="Override policies, e.g. ecg=3,rollup_hour=730")
+        parser.add_argument('--chunk-size', type=int, default=5000,
+                            help="Primary key ids per DELETE (default 5000)")
+        parser.add_argument('--pause-ms', type=int, default=0,
+                            help="Sleep between chunks to throttle WAL/replication")
+        parser.add_argument('--dry-run', action='store_true',
+                            help="Only count the rows that would be deleted")
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] <= 0:
+            raise CommandError("--chunk-size must be positive")
+        days = retention_days()
+        try:
+            days.update(parse_overrides(options['days']))
+        except ValueError as e:
+            raise CommandError(str(e)) from e
+
+        total = seconds = 0
+        for name in options['only'] or POLICIES:
+            if not days[name]:
+                self.stdout.write(f"{name}: kept forever")
+                continue
+            result = prune(name, days[name], chunk_size=options['chunk_size'],
+                           pause=options['pause_ms'] / 1000.0, dry_run=options['dry_run'])
+            verb = "would delete" if options['dry_run'] else "deleted"
+            self.stdout.write(
+                f"{name}: {verb} {result.deleted} rows older than {result.cutoff:%Y-%m-%d %H:%M} "
+                f"({days[name]}d) in {result.chunks} chunks, {result.seconds:.2f}s, "
+                f"{result.rate:.0f} rows/s"
+            )
+            total += result.deleted
+            seconds += result.seconds
+
+        rate = total / seconds if seconds else 0.0
+        verb = "Would delete" if options['dry_run'] else "Deleted"
+        self.stdout.write(self.style.SUCCESS(f"{verb} {total} rows in {seconds:.2f}s ({rate:.0f} rows/s)"))
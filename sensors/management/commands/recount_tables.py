@@ -0,0 +1,27 @@
+"""
+Rebuild the TableCounter rows with exact COUNT(*)s.
+
+    python manage.py recount_tables [--table ecg --table device]
+
+Run after deletes that bypass the counted paths (admin bulk deletes, raw SQL).
+Each table is recounted in its own transaction; on PostgreSQL COUNT(*) scans
+the table, so prefer a quiet period.
+"""
+from django.core.management.base import BaseCommand
+
+from sensors.counters import COUNTED_MODELS, recount, table_counts
+
+
+class Command(BaseCommand):
+    help = "Recount rows of the counted tables and reset their counters"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--table', action='append', choices=sorted(COUNTED_MODELS),
+                            help="Only these tables (repeatable)")
+
+    def handle(self, *args, **options):
+        before = table_counts()
+        for name, exact in recount(options['table']).items():
+            drift = exact - before[name]
+            self.stdout.write(f"{name}: {exact} rows (counter was off by {drift:+d})")
+        self.stdout.write(self.style.SUCCESS("Counters rebuilt"))
@@ -0,0 +1,228 @@
+"""
+Process-local metrics with Prometheus text exposition at /metrics.
+
+Each process accumulates counters and histograms in ``registry``. With
+``SENSOR_METRICS_DIR`` set (a directory shared by the gunicorn workers of one
+deployment) every process writes its snapshot to ``<dir>/<pid>.json`` every
+``SENSOR_METRICS_FLUSH_SECONDS`` and the scraping worker sums all snapshots,
+so the numbers cover every worker. Snapshots of workers that have exited are
+folded into ``archive.json`` so counters never go backwards when gunicorn
+recycles a worker. Without a directory /metrics shows the scraped process only.
+"""
+import fcntl
+import json
+import logging
+import os
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+
+from .background import PeriodicWorker
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+FLUSH_BUCKETS = (1, 10, 50, 100, 250, 500, 1000, 5000)
+
+# name -> (type, help, buckets)
+METRICS = {
+    'http_requests_total': ('counter', 'HTTP requests by URL name, method and status', None),
+    'http_request_duration_seconds': ('histogram', 'Request latency by URL name', LATENCY_BUCKETS),
+    'http_request_db_queries': ('histogram', 'SQL statements per request by URL name', QUERY_BUCKETS),
+    'http_db_query_seconds_total': ('counter', 'Time spent in SQL by URL name', None),
+    'http_response_bytes_total': ('counter', 'Response body bytes by URL name (non-streaming)', None),
+    'sensor_readings_saved_total': ('counter', 'Readings committed by sensor', None),
+    'sensor_ingest_flush_rows': ('histogram', 'Rows per buffered ingest flush', FLUSH_BUCKETS),
+    'sensor_ingest_flush_failures_total': ('counter', 'Buffered ingest flushes that failed and were retried or dropped', None),
+    'sensor_ingest_dropped_total': ('counter', 'Buffered readings dropped after failed flushes', None),
+    'sensor_ingest_rejected_total': ('counter', 'Readings refused with 503 because the ingest buffer was full', None),
+    'sensor_anomalies_total': ('counter', 'Anomaly events flagged on ingest by kind', None),
+}
+
+
+class Registry:
+    """Thread-safe counters and histograms for one process"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self.counters = defaultdict(float)
+        self.histograms = {}
+
+    def _check_fork(self):
+        # A forked worker must not report what its parent had counted
+        if self._pid != os.getpid():
+            self._reset()
+
+    def inc(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._check_fork()
+            self.counters[key] += value
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        buckets = METRICS[name][2]
+        with self._lock:
+            self._check_fork()
+            entry = self.histograms.get(key)
+            if entry is None:
+                entry = self.histograms[key] = [[0] * len(buckets), 0.0, 0]
+            for i, bound in enumerate(buckets):
+                if value <= bound:
+                    entry[0][i] += 1
+                    break
+            entry[1] += value
+            entry[2] += 1
+
+    def snapshot(self):
+        with self._lock:
+            self._check_fork()
+            return {
+                'counters': [[name, list(labels), value] for (name, labels), value in self.counters.items()],
+                'histograms': [[name, list(labels), list(counts), total, count]
+                               for (name, labels), (counts, total, count) in self.histograms.items()],
+            }
+
+
+registry = Registry()
+
+
+def merge(snapshots):
+    """Sum snapshots into one"""
+    counters = defaultdict(float)
+    histograms = {}
+    for snapshot in snapshots:
+        for name, labels, value in snapshot.get('counters', []):
+            counters[(name, tuple(map(tuple, labels)))] += value
+        for name, labels, counts, total, count in snapshot.get('histograms', []):
+            key = (name, tuple(map(tuple, labels)))
+            entry = histograms.get(key)
+            if entry is None:
+                histograms[key] = [list(counts), total, count]
+            else:
+                entry[0] = [a + b for a, b in zip(entry[0], counts)]
+                entry[1] += total
+                entry[2] += count
+    return {
+        'counters': [[name, list(labels), value] for (name, labels), value in counters.items()],
+        'histograms': [[name, list(labels), counts, total, count]
+                       for (name, labels), (counts, total, count) in histograms.items()],
+    }
+
+
+def _label_text(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in pairs)
+    return '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + '}'
+
+
+def render(snapshot):
+    """Prometheus text exposition format 0.0.4"""
+    by_name = defaultdict(list)
+    for name, labels, value in snapshot['counters']:
+        by_name[name].append((tuple(map(tuple, labels)), value))
+    for name, labels, counts, total, count in snapshot['histograms']:
+        by_name[name].append((tuple(map(tuple, labels)), (counts, total, count)))
+
+    lines = []
+    for name in sorted(by_name):
+        kind, help_text, buckets = METRICS.get(name, ('untyped', name, None))
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+        for labels, value in sorted(by_name[name]):
+            if kind != 'histogram':
+                lines.append(f'{name}{_label_text(labels)} {value:g}')
+                continue
+            counts, total, count = value
+            cumulative = 0
+            for bound, n in zip(buckets, counts):
+                cumulative += n
+                lines.append(f'{name}_bucket{_label_text(labels, [("le", f"{bound:g}")])} {cumulative}')
+            lines.append(f'{name}_bucket{_label_text(labels, [("le", "+Inf")])} {count}')
+            lines.append(f'{name}_sum{_label_text(labels)} {total:g}')
+            lines.append(f'{name}_count{_label_text(labels)} {count}')
+    return '\n'.join(lines) + '\n'
+
+
+def metrics_dir():
+    return getattr(settings, 'SENSOR_METRICS_DIR', '')
+
+
+def _write_json(path, data):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(data, f)
+    os.replace(tmp, path)
+
+
+def _read_json(path):
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def write_snapshot():
+    """Persist this process's snapshot for the other workers' scrapes"""
+    directory = metrics_dir()
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+        _write_json(os.path.join(directory, f'{os.getpid()}.json'), registry.snapshot())
+
+
+def collect():
+    """Merged snapshot of every process sharing SENSOR_METRICS_DIR"""
+    directory = metrics_dir()
+    if not directory:
+        return registry.snapshot()
+
+    write_snapshot()
+    archive_path = os.path.join(directory, 'archive.json')
+    with open(os.path.join(directory, '.lock'), 'w', encoding='utf-8') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        archive = _read_json(archive_path) or {}
+        live, dead = [], []
+        for entry in os.listdir(directory):
+            stem, ext = os.path.splitext(entry)
+            if ext != '.json' or not stem.isdigit():
+                continue
+            snapshot = _read_json(os.path.join(directory, entry))
+            if snapshot is None:
+                continue
+            (live if _alive(int(stem)) else dead).append((entry, snapshot))
+        if dead:
+            # Fold exited workers into the archive so their counts are kept
+            archive = merge([archive] + [snapshot for _, snapshot in dead])
+            _write_json(archive_path, archive)
+            for entry, _ in dead:
+                os.remove(os.path.join(directory, entry))
+    return merge([archive] + [snapshot for _, snapshot in live])
+
+
+snapshot_writer = PeriodicWorker(
+    getattr(settings, 'SENSOR_METRICS_FLUSH_SECONDS', 5.0), write_snapshot, 'sensor-metrics-writer'
+)
+
+
+def ensure_writer():
+    if metrics_dir():
+        snapshot_writer.ensure_started()
@@ -0,0 +1,105 @@
+"""
+Request instrumentation middleware.
+
+``QueryCountMiddleware`` counts the SQL statements a request executes (via
+``connection.execute_wrapper``, so it works with DEBUG off) and reports them in
+``X-DB-Queries`` / ``X-DB-Time-ms`` response headers. It is enabled with
+``SENSOR_QUERY_COUNT_HEADER`` for benchmarks (benchmarks/esp32_fleet.py) and is
+a no-op otherwise.
+
+``MetricsMiddleware`` records latency, SQL statements/time and response size
+per resolved URL name into ``metrics.registry`` for /metrics.
+
+``DecompressionMiddleware`` inflates gzip/deflate request bodies (see
+``compression``) before any view or parser reads them.
+"""
+import io
+import time
+
+from django.conf import settings
+from django.db import connection
+from django.http import JsonResponse
+
+from .compression import DecompressionError, decompress_body
+from .metrics import ensure_writer, registry
+
+
+class QueryCounter:
+    """execute_wrapper that counts statements and their time"""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.seconds += time.perf_counter() - started
+
+
+class QueryCountMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = getattr(settings, 'SENSOR_QUERY_COUNT_HEADER', False)
+
+    def __call__(self, request):
+        if not self.enabled:
+            return self.get_response(request)
+        counter = QueryCounter()
+        with connection.execute_wrapper(counter):
+            response = self.get_response(request)
+        response['X-DB-Queries'] = str(counter.count)
+        response['X-DB-Time-ms'] = f"{counter.seconds * 1000:.2f}"
+        return response
+
+
+class MetricsMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = getattr(settings, 'SENSOR_METRICS_ENABLED', True)
+
+    def __call__(self, request):
+        if not self.enabled:
+            return self.get_response(request)
+        ensure_writer()
+        counter = QueryCounter()
+        started = time.perf_counter()
+        with connection.execute_wrapper(counter):
+            response = self.get_response(request)
+        elapsed = time.perf_counter() - started
+
+        match = getattr(request, 'resolver_match', None)
+        view = (match.view_name if match else None) or 'unmatched'
+        registry.inc('http_requests_total', view=view, method=request.method,
+                     status=str(response.status_code))
+        registry.observe('http_request_duration_seconds', elapsed, view=view)
+        registry.observe('http_request_db_queries', counter.count, view=view)
+        registry.inc('http_db_query_seconds_total', counter.seconds, view=view)
+        if not response.streaming:
+            registry.inc('http_response_bytes_total', len(response.content), view=view)
+        return response
+
+
+class DecompressionMiddleware:
+    """Replace a Content-Encoded request body with the decoded bytes"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        encoding = request.META.get('HTTP_CONTENT_ENCODING')
+        if encoding:
+            try:
+                body = decompress_body(request.body, encoding)
+            except DecompressionError as e:
+                return JsonResponse({'status': 'error', 'code': e.status_code, 'message': str(e)},
+                                    status=e.status_code)
+            # Views, request.POST and DRF parsers all read from these
+            request._body = body
+            request._stream = io.BytesIO(body)
+            request.META['CONTENT_LENGTH'] = str(len(body))
+            del request.META['HTTP_CONTENT_ENCODING']
+        return self.get_response(request)
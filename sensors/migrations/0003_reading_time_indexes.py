@@ -0,0 +1,93 @@
+# Time-series indexes for the reading tables.
+#
+# Each table gets a composite (device_id, timestamp DESC) index for the
+# per-device .filter(device=...).latest('timestamp') queries and a plain
+# timestamp index for the global .latest('timestamp') queries.
+#
+# On PostgreSQL the indexes are built with CREATE INDEX CONCURRENTLY so the
+# migration does not block ingest, and with SENSOR_TIMESTAMP_BRIN=true an extra
+# BRIN index on timestamp is added for range scans (exports, retention). BRIN
+# cannot serve ORDER BY ... LIMIT 1, so it complements the btree indexes rather
+# than replacing them.
+
+from django.conf import settings
+from django.db import migrations, models
+
+READING_TABLES = {
+    'accelerometerreading': 'accel',
+    'devicestatus': 'status',
+    'ecgreading': 'ecg',
+    'max30102reading': 'max30102',
+    'pulseoximeterreading': 'pulseox',
+}
+
+
+class AddIndexConcurrentlyIfPostgres(migrations.AddIndex):
+    """CREATE INDEX CONCURRENTLY on PostgreSQL, a plain CREATE INDEX elsewhere.
+
+    Unlike django.contrib.postgres.operations.AddIndexConcurrently this does
+    not need psycopg installed, so SQLite development setups keep working.
+    """
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        model = to_state.apps.get_model(app_label, self.model_name)
+        if self.allow_migrate_model(schema_editor.connection.alias, model):
+            if schema_editor.connection.vendor == 'postgresql':
+                schema_editor.add_index(model, self.index, concurrently=True)
+            else:
+                schema_editor.add_index(model, self.index)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        model = from_state.apps.get_model(app_label, self.model_name)
+        if self.allow_migrate_model(schema_editor.connection.alias, model):
+            if schema_editor.connection.vendor == 'postgresql':
+                schema_editor.remove_index(model, self.index, concurrently=True)
+            else:
+                schema_editor.remove_index(model, self.index)
+
+
+def add_brin_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    if not getattr(settings, 'SENSOR_TIMESTAMP_BRIN', False):
+        return
+    for model_name, prefix in READING_TABLES.items():
+        table = apps.get_model('sensors', model_name)._meta.db_table
+        schema_editor.execute(
+            f'CREATE INDEX CONCURRENTLY IF NOT EXISTS "{prefix}_ts_brin" '
+            f'ON "{table}" USING brin ("timestamp")'
+        )
+
+
+def remove_brin_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for prefix in READING_TABLES.values():
+        schema_editor.execute(f'DROP INDEX CONCURRENTLY IF EXISTS "{prefix}_ts_brin"')
+
+
+class Migration(migrations.Migration):
+
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+    atomic = False
+
+    dependencies = [
+        ('sensors', '0002_reading_timestamp_default'),
+    ]
+
+    operations = [
+        operation
+        for model_name, prefix in READING_TABLES.items()
+        for operation in (
+            AddIndexConcurrentlyIfPostgres(
+                model_name=model_name,
+                index=models.Index(fields=['device', '-timestamp'], name=f'{prefix}_device_ts_idx'),
+            ),
+            AddIndexConcurrentlyIfPostgres(
+                model_name=model_name,
+                index=models.Index(fields=['timestamp'], name=f'{prefix}_ts_idx'),
+            ),
+        )
+    ] + [
+        migrations.RunPython(add_brin_indexes, remove_brin_indexes),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.6 on 2026-10-18 19:25
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sensors', '0003_reading_time_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WaveformChunk',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('channel', models.CharField(default='ecg', help_text='Signal name, e.g. ecg', max_length=20)),
+                ('start_time', models.DateTimeField(help_text='Time of the first sample')),
+                ('end_time', models.DateTimeField(help_text='Time just after the last sample')),
+                ('sample_rate', models.FloatField(help_text='Samples per second (Hz)')),
+                ('sample_count', models.IntegerField()),
+                ('dtype', models.CharField(choices=[('f4', 'float32'), ('i2', 'int16')], default='f4', max_length=2)),
+                ('scale', models.FloatField(default=1.0, help_text='Multiplier applied to int16 samples')),
+                ('samples', models.BinaryField(help_text='Little-endian packed samples')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('device', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='waveform_chunks', to='sensors.device')),
+            ],
+            options={
+                'ordering': ['-start_time'],
+                'indexes': [models.Index(fields=['device', 'channel', 'start_time'], name='waveform_device_start_idx')],
+            },
+        ),
+    ]
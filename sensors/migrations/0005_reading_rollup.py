@@ -0,0 +1,33 @@
+# Generated by Django 5.2.6 on 2026-10-18 19:26
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sensors', '0004_waveform_chunk'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReadingRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('metric', models.CharField(help_text='e.g. ecg_heart_rate, spo2, accel_magnitude', max_length=50)),
+                ('period', models.CharField(choices=[('minute', 'Minute'), ('hour', 'Hour')], max_length=10)),
+                ('bucket', models.DateTimeField(help_text='Start of the minute/hour (UTC)')),
+                ('count', models.BigIntegerField(default=0)),
+                ('min_value', models.FloatField()),
+                ('max_value', models.FloatField()),
+                ('sum_value', models.FloatField(default=0)),
+                ('sum_sq', models.FloatField(default=0, help_text='Sum of squares, for standard deviation')),
+                ('device', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rollups', to='sensors.device')),
+            ],
+            options={
+                'ordering': ['-bucket'],
+                'constraints': [models.UniqueConstraint(fields=('device', 'metric', 'period', 'bucket'), name='rollup_unique_bucket')],
+            },
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.6 on 2026-10-18 19:38
+
+from django.db import migrations, models
+
+# Counter name -> model, as in sensors.counters.COUNTED_MODELS
+COUNTED = {
+    'ecg': 'ECGReading',
+    'pulse_oximeter': 'PulseOximeterReading',
+    'max30102': 'MAX30102Reading',
+    'accelerometer': 'AccelerometerReading',
+    'device_status': 'DeviceStatus',
+    'device': 'Device',
+}
+
+
+def seed_counters(apps, schema_editor):
+    TableCounter = apps.get_model('sensors', 'TableCounter')
+    TableCounter.objects.bulk_create([
+        TableCounter(table=name, shard=0, count=apps.get_model('sensors', model).objects.count())
+        for name, model in COUNTED.items()
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sensors', '0005_reading_rollup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TableCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('table', models.CharField(help_text='e.g. ecg, pulse_oximeter, device', max_length=50)),
+                ('shard', models.PositiveSmallIntegerField(default=0)),
+                ('count', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('table', 'shard'), name='counter_unique_shard')],
+            },
+        ),
+        migrations.RunPython(seed_counters, migrations.RunPython.noop),
+    ]
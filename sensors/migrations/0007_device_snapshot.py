@@ -0,0 +1,72 @@
+# Generated by Django 5.2.6 on 2026-10-18 19:40
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+# model -> (timestamp column, {snapshot column: reading field}), as in sensors.snapshots
+GROUPS = {
+    'ECGReading': ('ecg_at', {'ecg_heart_rate': 'heart_rate', 'ecg_value': 'ecg_value'}),
+    'PulseOximeterReading': ('pulse_at', {'spo2': 'spo2', 'pulse_heart_rate': 'heart_rate'}),
+    'MAX30102Reading': ('max30102_at', {'max30102_heart_rate': 'heart_rate',
+                                        'red_value': 'red_value', 'ir_value': 'ir_value'}),
+    'AccelerometerReading': ('accel_at', {'x_axis': 'x_axis', 'y_axis': 'y_axis',
+                                          'z_axis': 'z_axis', 'magnitude': 'magnitude'}),
+    'DeviceStatus': ('status_at', {'battery_level': 'battery_level',
+                                   'wifi_signal_strength': 'wifi_signal_strength'}),
+}
+
+
+def build_snapshots(apps, schema_editor):
+    Device = apps.get_model('sensors', 'Device')
+    DeviceSnapshot = apps.get_model('sensors', 'DeviceSnapshot')
+    snapshots = []
+    for device in Device.objects.all().iterator():
+        fields = {}
+        for model_name, (at_column, columns) in GROUPS.items():
+            reading = (apps.get_model('sensors', model_name).objects
+                       .filter(device=device).order_by('-timestamp', '-id').first())
+            if reading is None:
+                continue
+            fields[at_column] = reading.timestamp
+            for column, field in columns.items():
+                fields[column] = getattr(reading, field)
+        if fields:
+            snapshots.append(DeviceSnapshot(device=device, updated_at=django.utils.timezone.now(), **fields))
+    DeviceSnapshot.objects.bulk_create(snapshots, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sensors', '0006_table_counter'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DeviceSnapshot',
+            fields=[
+                ('device', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='snapshot', serialize=False, to='sensors.device')),
+                ('updated_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('ecg_heart_rate', models.FloatField(blank=True, null=True)),
+                ('ecg_value', models.FloatField(blank=True, null=True)),
+                ('ecg_at', models.DateTimeField(blank=True, null=True)),
+                ('spo2', models.FloatField(blank=True, null=True)),
+                ('pulse_heart_rate', models.FloatField(blank=True, null=True)),
+                ('pulse_at', models.DateTimeField(blank=True, null=True)),
+                ('max30102_heart_rate', models.FloatField(blank=True, null=True)),
+                ('red_value', models.IntegerField(blank=True, null=True)),
+                ('ir_value', models.IntegerField(blank=True, null=True)),
+                ('max30102_at', models.DateTimeField(blank=True, null=True)),
+                ('x_axis', models.FloatField(blank=True, null=True)),
+                ('y_axis', models.FloatField(blank=True, null=True)),
+                ('z_axis', models.FloatField(blank=True, null=True)),
+                ('magnitude', models.FloatField(blank=True, null=True)),
+                ('accel_at', models.DateTimeField(blank=True, null=True)),
+                ('battery_level', models.FloatField(blank=True, null=True)),
+                ('wifi_signal_strength', models.IntegerField(blank=True, null=True)),
+                ('status_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.RunPython(build_snapshots, migrations.RunPython.noop),
+    ]
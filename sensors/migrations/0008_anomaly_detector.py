@@ -0,0 +1,49 @@
+# Generated by Django 5.2.6 on 2026-10-18 19:43
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sensors', '0007_device_snapshot'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AnomalyDetectorState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('metric', models.CharField(help_text='e.g. ecg_heart_rate, spo2, accel_magnitude', max_length=50)),
+                ('count', models.BigIntegerField(default=0)),
+                ('mean', models.FloatField(default=0)),
+                ('variance', models.FloatField(default=0)),
+                ('ewma', models.FloatField(default=0, help_text='Fast-moving average of recent samples')),
+                ('active', models.BooleanField(default=False, help_text='Inside a flagged episode')),
+                ('last_at', models.DateTimeField(blank=True, null=True)),
+                ('device', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='detector_states', to='sensors.device')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('device', 'metric'), name='detector_unique_metric')],
+            },
+        ),
+        migrations.CreateModel(
+            name='AnomalyEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('metric', models.CharField(max_length=50)),
+                ('kind', models.CharField(choices=[('spo2_drop', 'SpO2 drop'), ('hr_spike', 'Heart rate spike'), ('motion_spike', 'Motion spike')], max_length=20)),
+                ('timestamp', models.DateTimeField(help_text='Time of the flagged reading')),
+                ('value', models.FloatField()),
+                ('baseline', models.FloatField(help_text='Baseline mean when the reading was flagged')),
+                ('score', models.FloatField(help_text='Deviation from the baseline in standard deviations')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('device', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='anomalies', to='sensors.device')),
+            ],
+            options={
+                'ordering': ['-timestamp'],
+                'indexes': [models.Index(fields=['device', '-timestamp'], name='anomaly_device_time')],
+            },
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.6 on 2026-10-18 19:45
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sensors', '0008_anomaly_detector'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IngestSequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('boot_id', models.CharField(blank=True, default='', help_text='Changes when the device restarts its counter', max_length=32)),
+                ('sequence', models.BigIntegerField()),
+                ('received_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('device', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ingest_sequences', to='sensors.device')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('device', 'boot_id', 'sequence'), name='ingest_unique_sequence')],
+            },
+        ),
+    ]
@@ -28,7 +28,7 @@ class SensorReading(models.Model):
 class ECGReading(models.Model):
     """Model for ECG sensor readings"""
     device = models.ForeignKey(Device, on_delete=models.CASCADE, related_name='ecg_readings')
-    timestamp = models.DateTimeField(auto_now_add=True)
+    timestamp = models.DateTimeField(default=timezone.now)
     heart_rate = models.FloatField(help_text="Heart rate in BPM")
     ecg_value = models.FloatField(help_text="Raw ECG value")
     signal_quality = models.CharField(max_length=20, default='good', 
@@ -36,6 +36,10 @@ class ECGReading(models.Model):
     
     class Meta:
         ordering = ['-timestamp']
+        indexes = [
+            models.Index(fields=['device', '-timestamp'], name='ecg_device_ts_idx'),
+            models.Index(fields=['timestamp'], name='ecg_ts_idx'),
+        ]
     
     def __str__(self):
         return f"ECG - {self.device.name} - HR: {self.heart_rate} BPM"
@@ -44,13 +48,17 @@ class ECGReading(models.Model):
 class PulseOximeterReading(models.Model):
     """Model for Pulse Oximeter readings"""
     device = models.ForeignKey(Device, on_delete=models.CASCADE, related_name='pulse_ox_readings')
-    timestamp = models.DateTimeField(auto_now_add=True)
+    timestamp = models.DateTimeField(default=timezone.now)
     spo2 = models.FloatField(help_text="Blood oxygen saturation (%)")
     heart_rate = models.FloatField(help_text="Heart rate in BPM")
     signal_strength = models.IntegerField(help_text="Signal strength (0-100)")
     
     class Meta:
         ordering = ['-timestamp']
+        indexes = [
+            models.Index(fields=['device', '-timestamp'], name='pulseox_device_ts_idx'),
+            models.Index(fields=['timestamp'], name='pulseox_ts_idx'),
+        ]
     
     def __str__(self):
         return f"Pulse Ox - {self.device.name} - SpO2: {self.spo2}%, HR: {self.heart_rate} BPM"
@@ -59,7 +67,7 @@ class PulseOximeterReading(models.Model):
 class MAX30102Reading(models.Model):
     """Model for MAX30102 Heart Rate sensor readings"""
     device = models.ForeignKey(Device, on_delete=models.CASCADE, related_name='max30102_readings')
-    timestamp = models.DateTimeField(auto_now_add=True)
+    timestamp = models.DateTimeField(default=timezone.now)
     heart_rate = models.FloatField(help_text="Heart rate in BPM")
     spo2 = models.FloatField(null=True, blank=True, help_text="Blood oxygen saturation (%)")
     red_value = models.IntegerField(help_text="Red LED value")
@@ -68,6 +76,10 @@ class MAX30102Reading(models.Model):
     
     class Meta:
         ordering = ['-timestamp']
+        indexes = [
+            models.Index(fields=['device', '-timestamp'], name='max30102_device_ts_idx'),
+            models.Index(fields=['timestamp'], name='max30102_ts_idx'),
+        ]
     
     def __str__(self):
         return f"MAX30102 - {self.device.name} - HR: {self.heart_rate} BPM"
@@ -76,7 +88,7 @@ class MAX30102Reading(models.Model):
 class AccelerometerReading(models.Model):
     """Model for Accelerometer readings"""
     device = models.ForeignKey(Device, on_delete=models.CASCADE, related_name='accel_readings')
-    timestamp = models.DateTimeField(auto_now_add=True)
+    timestamp = models.DateTimeField(default=timezone.now)
     x_axis = models.FloatField(help_text="X-axis acceleration (g)")
     y_axis = models.FloatField(help_text="Y-axis acceleration (g)")
     z_axis = models.FloatField(help_text="Z-axis acceleration (g)")
@@ -84,6 +96,10 @@ class AccelerometerReading(models.Model):
     
     class Meta:
         ordering = ['-timestamp']
+        indexes = [
+            models.Index(fields=['device', '-timestamp'], name='accel_device_ts_idx'),
+            models.Index(fields=['timestamp'], name='accel_ts_idx'),
+        ]
     
     def __str__(self):
         return f"Accel - {self.device.name} - Mag: {self.magnitude:.2f}g"
@@ -92,7 +108,7 @@ class AccelerometerReading(models.Model):
 class DeviceStatus(models.Model):
     """Model for device status and health monitoring"""
     device = models.ForeignKey(Device, on_delete=models.CASCADE, related_name='status_reports')
-    timestamp = models.DateTimeField(auto_now_add=True)
+    timestamp = models.DateTimeField(default=timezone.now)
     battery_level = models.FloatField(null=True, blank=True, help_text="Battery level (%)")
     wifi_signal_strength = models.IntegerField(null=True, blank=True, help_text="WiFi signal strength (dBm)")
     memory_usage = models.FloatField(null=True, blank=True, help_text="Memory usage (%)")
@@ -101,6 +117,194 @@ class DeviceStatus(models.Model):
     
     class Meta:
         ordering = ['-timestamp']
+        indexes = [
+            models.Index(fields=['device', '-timestamp'], name='status_device_ts_idx'),
+            models.Index(fields=['timestamp'], name='status_ts_idx'),
+        ]
     
     def __str__(self):
         return f"Status - {self.device.name} - {self.timestamp}"
+
+
+class WaveformChunk(models.Model):
+    """Contiguous block of high-rate samples (e.g. ECG at 250-500 Hz) stored as one packed blob"""
+    DTYPE_FLOAT32 = 'f4'
+    DTYPE_INT16 = 'i2'
+    
+    device = models.ForeignKey(Device, on_delete=models.CASCADE, related_name='waveform_chunks')
+    channel = models.CharField(max_length=20, default='ecg', help_text="Signal name, e.g. ecg")
+    start_time = models.DateTimeField(help_text="Time of the first sample")
+    end_time = models.DateTimeField(help_text="Time just after the last sample")
+    sample_rate = models.FloatField(help_text="Samples per second (Hz)")
+    sample_count = models.IntegerField()
+    dtype = models.CharField(max_length=2, default=DTYPE_FLOAT32,
+                             choices=[(DTYPE_FLOAT32, 'float32'), (DTYPE_INT16, 'int16')])
+    scale = models.FloatField(default=1.0, help_text="Multiplier applied to int16 samples")
+    samples = models.BinaryField(help_text="Little-endian packed samples")
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['-start_time']
+        indexes = [
+            models.Index(fields=['device', 'channel', 'start_time'], name='waveform_device_start_idx'),
+        ]
+    
+    def __str__(self):
+        return f"Waveform {self.channel} - {self.device.name} - {self.sample_count} @ {self.sample_rate} Hz"
+
+
+class ReadingRollup(models.Model):
+    """Per-minute/per-hour aggregates of one reading metric, maintained on ingest"""
+    PERIOD_MINUTE = 'minute'
+    PERIOD_HOUR = 'hour'
+    
+    device = models.ForeignKey(Device, on_delete=models.CASCADE, related_name='rollups')
+    metric = models.CharField(max_length=50, help_text="e.g. ecg_heart_rate, spo2, accel_magnitude")
+    period = models.CharField(max_length=10, choices=[(PERIOD_MINUTE, 'Minute'), (PERIOD_HOUR, 'Hour')])
+    bucket = models.DateTimeField(help_text="Start of the minute/hour (UTC)")
+    count = models.BigIntegerField(default=0)
+    min_value = models.FloatField()
+    max_value = models.FloatField()
+    sum_value = models.FloatField(default=0)
+    sum_sq = models.FloatField(default=0, help_text="Sum of squares, for standard deviation")
+    
+    class Meta:
+        ordering = ['-bucket']
+        constraints = [
+            models.UniqueConstraint(fields=['device', 'metric', 'period', 'bucket'],
+                                    name='rollup_unique_bucket'),
+        ]
+    
+    @property
+    def mean(self):
+        return self.sum_value / self.count if self.count else None
+    
+    @property
+    def std(self):
+        if not self.count:
+            return None
+        variance = self.sum_sq / self.count - (self.sum_value / self.count) ** 2
+        return max(variance, 0.0) ** 0.5
+    
+    def __str__(self):
+        return f"Rollup {self.metric} {self.period} {self.bucket} - {self.device.device_id}"
+
+
+class TableCounter(models.Model):
+    """Sharded row counts per table, maintained on ingest and delete"""
+    table = models.CharField(max_length=50, help_text="e.g. ecg, pulse_oximeter, device")
+    shard = models.PositiveSmallIntegerField(default=0)
+    count = models.BigIntegerField(default=0)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['table', 'shard'], name='counter_unique_shard'),
+        ]
+    
+    def __str__(self):
+        return f"{self.table}[{self.shard}] = {self.count}"
+
+
+class DeviceSnapshot(models.Model):
+    """Newest value of every sensor field for one device, upserted on ingest"""
+    device = models.OneToOneField(Device, on_delete=models.CASCADE, primary_key=True,
+                                  related_name='snapshot')
+    updated_at = models.DateTimeField(default=timezone.now)
+    
+    # ECG
+    ecg_heart_rate = models.FloatField(null=True, blank=True)
+    ecg_value = models.FloatField(null=True, blank=True)
+    ecg_at = models.DateTimeField(null=True, blank=True)
+    
+    # Pulse Oximeter
+    spo2 = models.FloatField(null=True, blank=True)
+    pulse_heart_rate = models.FloatField(null=True, blank=True)
+    pulse_at = models.DateTimeField(null=True, blank=True)
+    
+    # MAX30102
+    max30102_heart_rate = models.FloatField(null=True, blank=True)
+    red_value = models.IntegerField(null=True, blank=True)
+    ir_value = models.IntegerField(null=True, blank=True)
+    max30102_at = models.DateTimeField(null=True, blank=True)
+    
+    # Accelerometer
+    x_axis = models.FloatField(null=True, blank=True)
+    y_axis = models.FloatField(null=True, blank=True)
+    z_axis = models.FloatField(null=True, blank=True)
+    magnitude = models.FloatField(null=True, blank=True)
+    accel_at = models.DateTimeField(null=True, blank=True)
+    
+    # Device status
+    battery_level = models.FloatField(null=True, blank=True)
+    wifi_signal_strength = models.IntegerField(null=True, blank=True)
+    status_at = models.DateTimeField(null=True, blank=True)
+    
+    def __str__(self):
+        return f"Snapshot - {self.device.device_id} at {self.updated_at}"
+
+
+class AnomalyDetectorState(models.Model):
+    """Running baseline of one metric of one device, for the streaming detector"""
+    device = models.ForeignKey(Device, on_delete=models.CASCADE, related_name='detector_states')
+    metric = models.CharField(max_length=50, help_text="e.g. ecg_heart_rate, spo2, accel_magnitude")
+    count = models.BigIntegerField(default=0)
+    mean = models.FloatField(default=0)
+    variance = models.FloatField(default=0)
+    ewma = models.FloatField(default=0, help_text="Fast-moving average of recent samples")
+    active = models.BooleanField(default=False, help_text="Inside a flagged episode")
+    last_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['device', 'metric'], name='detector_unique_metric'),
+        ]
+    
+    def __str__(self):
+        return f"Detector {self.metric} - {self.device.device_id}"
+
+
+class AnomalyEvent(models.Model):
+    """A reading the streaming detector flagged as anomalous"""
+    KIND_SPO2_DROP = 'spo2_drop'
+    KIND_HR_SPIKE = 'hr_spike'
+    KIND_MOTION_SPIKE = 'motion_spike'
+    KIND_CHOICES = [
+        (KIND_SPO2_DROP, 'SpO2 drop'),
+        (KIND_HR_SPIKE, 'Heart rate spike'),
+        (KIND_MOTION_SPIKE, 'Motion spike'),
+    ]
+    
+    device = models.ForeignKey(Device, on_delete=models.CASCADE, related_name='anomalies')
+    metric = models.CharField(max_length=50)
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    timestamp = models.DateTimeField(help_text="Time of the flagged reading")
+    value = models.FloatField()
+    baseline = models.FloatField(help_text="Baseline mean when the reading was flagged")
+    score = models.FloatField(help_text="Deviation from the baseline in standard deviations")
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['-timestamp']
+        indexes = [
+            models.Index(fields=['device', '-timestamp'], name='anomaly_device_time'),
+        ]
+    
+    def __str__(self):
+        return f"{self.get_kind_display()} {self.value} - {self.device.device_id} at {self.timestamp}"
+
+
+class IngestSequence(models.Model):
+    """A (device, boot, sequence) already written, for acknowledging retried posts"""
+    device = models.ForeignKey(Device, on_delete=models.CASCADE, related_name='ingest_sequences')
+    boot_id = models.CharField(max_length=32, blank=True, default='',
+                               help_text="Changes when the device restarts its counter")
+    sequence = models.BigIntegerField()
+    received_at = models.DateTimeField(default=timezone.now)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['device', 'boot_id', 'sequence'], name='ingest_unique_sequence'),
+        ]
+    
+    def __str__(self):
+        return f"Sequence {self.boot_id}:{self.sequence} - {self.device.device_id}"
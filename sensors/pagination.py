@@ -0,0 +1,130 @@
+"""
+Keyset (cursor) pagination and time-range filtering for the reading list views.
+
+Pages are ordered newest first on (timestamp, id) and the cursor encodes the
+last row seen, so each page is a ``WHERE (timestamp, id) < (...) ORDER BY
+timestamp DESC, id DESC LIMIT n`` that walks the (device_id, -timestamp)
+index instead of scanning past an OFFSET.
+"""
+import base64
+from datetime import timezone as dt_timezone
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+def parse_aware_datetime(value):
+    """Parse ISO 8601 text into an aware datetime (naive values are UTC).
+
+    Raises ValueError for malformed and for out-of-range values alike.
+    """
+    parsed = parse_datetime(value)
+    if parsed is None:
+        raise ValueError(f"Invalid datetime: {value}")
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed, dt_timezone.utc)
+    return parsed
+
+
+def parse_time_param(value, name):
+    """Parse an ISO 8601 query parameter into an aware datetime"""
+    try:
+        return parse_aware_datetime(value)
+    except ValueError as e:
+        raise ValidationError({name: f"Invalid datetime: {value}"}) from e
+
+
+def filter_readings(queryset, params):
+    """Apply ?device=, ?start= and ?end= (ISO 8601, end exclusive) filters"""
+    device_id = params.get('device')
+    if device_id:
+        queryset = queryset.filter(device__device_id=device_id)
+    if params.get('start'):
+        queryset = queryset.filter(timestamp__gte=parse_time_param(params['start'], 'start'))
+    if params.get('end'):
+        queryset = queryset.filter(timestamp__lt=parse_time_param(params['end'], 'end'))
+    return queryset
+
+
+class ReadingKeysetPagination(BasePagination):
+    """Cursor pagination on (timestamp, id), newest first"""
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+
+    def __init__(self):
+        self.page_size = getattr(settings, 'SENSOR_PAGE_SIZE', 100)
+        self.max_page_size = getattr(settings, 'SENSOR_MAX_PAGE_SIZE', 1000)
+        self.next_cursor = None
+        self.base_url = None
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except (TypeError, ValueError):
+            size = self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    @staticmethod
+    def encode_cursor(timestamp, pk):
+        raw = f"{timestamp.isoformat()}|{pk}".encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+    @staticmethod
+    def decode_cursor(cursor):
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            timestamp, pk = base64.urlsafe_b64decode(padded).decode().split('|')
+            parsed = parse_datetime(timestamp)
+            if parsed is None:
+                raise ValueError(timestamp)
+            return parsed, int(pk)
+        except (ValueError, UnicodeDecodeError) as e:
+            raise ValidationError({'cursor': 'Invalid cursor'}) from e
+
+    def paginate_queryset(self, queryset, request, view=None):
+        page_size = self.get_page_size(request)
+        self.base_url = request.build_absolute_uri()
+
+        queryset = queryset.order_by('-timestamp', '-id')
+        cursor = request.query_params.get(self.cursor_query_param)
+        if cursor:
+            timestamp, pk = self.decode_cursor(cursor)
+            queryset = queryset.filter(
+                Q(timestamp__lt=timestamp) | Q(timestamp=timestamp, id__lt=pk)
+            )
+
+        # One extra row tells us whether there is a next page
+        rows = list(queryset[:page_size + 1])
+        if len(rows) > page_size:
+            rows = rows[:page_size]
+            last = rows[-1]
+            self.next_cursor = self.encode_cursor(last.timestamp, last.pk)
+        else:
+            self.next_cursor = None
+        return rows
+
+    def get_next_link(self):
+        if self.next_cursor is None:
+            return None
+        return replace_query_param(self.base_url, self.cursor_query_param, self.next_cursor)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'results': data
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
@@ -0,0 +1,245 @@
+"""
+Optional native range partitioning of the reading tables on PostgreSQL.
+
+``convert_table`` turns e.g. ``sensors_ecgreading`` into a table partitioned
+by ``RANGE (timestamp)``: the existing rows stay where they are, attached as
+the DEFAULT partition (``<table>_legacy``), and new rows land in per-day or
+per-week partitions named ``<table>_pYYYYMMDD``. The model is unchanged; the
+primary key becomes (id, timestamp) as PostgreSQL requires, ids continue
+from a sequence owned by the new parent, and the foreign key and indexes
+(same names) are carried over.
+
+``ensure_partitions`` creates partitions ``SENSOR_PARTITION_AHEAD`` periods
+ahead and ``drop_expired`` detaches and drops the ones entirely older than the
+retention policy (``retention.retention_days``), which is a catalog change
+instead of a multi-million-row DELETE. Filters on ``timestamp`` (the
+``?start=/&end=`` list filters, export ranges, keyset cursors) let the planner
+skip partitions outside the range.
+
+Rows outside every range partition (device clocks running ahead, or readings
+of a period whose partition does not exist yet) land in the DEFAULT partition.
+PostgreSQL refuses to create a range partition while the DEFAULT one holds
+rows of that range, so ``create_partition`` detaches the DEFAULT partition,
+moves those rows into the new partition and attaches it again.
+
+SQLite has no partitioning and no per-period layout: Django's ORM maps a model
+to one table, and routers choose a database, not a table, so splitting a
+reading table there would need every query rewritten. On SQLite the commands
+here skip with a message and ``prune_readings`` does retention with chunked
+deletes.
+"""
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .counters import add_counts
+from .models import (
+    ECGReading, PulseOximeterReading, MAX30102Reading, AccelerometerReading,
+    DeviceStatus
+)
+
+# Retention policy name for each partitionable model (see retention.POLICIES)
+PARTITIONED_MODELS = {
+    'ecg': ECGReading,
+    'pulse_oximeter': PulseOximeterReading,
+    'max30102': MAX30102Reading,
+    'accelerometer': AccelerometerReading,
+    'device_status': DeviceStatus,
+}
+
+PERIODS = ('day', 'week')
+
+
+class PartitionError(Exception):
+    """Raised when partitioning is unavailable or a table is in the wrong state"""
+
+
+def partition_period():
+    period = getattr(settings, 'SENSOR_PARTITION_PERIOD', 'day')
+    if period not in PERIODS:
+        raise PartitionError(f"SENSOR_PARTITION_PERIOD must be one of {PERIODS}")
+    return period
+
+
+def period_start(moment, period):
+    """Start (UTC midnight; Monday for weeks) of the period containing ``moment``"""
+    day = moment.astimezone(dt_timezone.utc).date()
+    if period == 'week':
+        day -= timedelta(days=day.weekday())
+    return datetime.combine(day, time.min, tzinfo=dt_timezone.utc)
+
+
+def period_step(period):
+    return timedelta(days=7 if period == 'week' else 1)
+
+
+def partition_name(table, start):
+    return f"{table}_p{start:%Y%m%d}"
+
+
+def _check_vendor():
+    if connection.vendor != 'postgresql':
+        raise PartitionError("Table partitioning needs PostgreSQL; use prune_readings elsewhere")
+
+
+def is_partitioned(table):
+    _check_vendor()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM pg_partitioned_table pt JOIN pg_class c ON c.oid = pt.partrelid "
+            "WHERE c.relname = %s AND pg_table_is_visible(c.oid)", [table]
+        )
+        return cursor.fetchone() is not None
+
+
+def list_partitions(table):
+    """{start: name} for the range partitions created by this module"""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT c.relname FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid JOIN pg_class p ON p.oid = i.inhparent "
+            "WHERE p.relname = %s AND pg_table_is_visible(p.oid)", [table]
+        )
+        names = [row[0] for row in cursor.fetchall()]
+    partitions = {}
+    prefix = f"{table}_p"
+    for name in names:
+        suffix = name[len(prefix):]
+        if name.startswith(prefix) and len(suffix) == 8 and suffix.isdigit():
+            start = datetime.strptime(suffix, '%Y%m%d').replace(tzinfo=dt_timezone.utc)
+            partitions[start] = name
+    return partitions
+
+
+def default_partition(table):
+    """Name of the DEFAULT partition of ``table``, or None"""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT d.relname FROM pg_partitioned_table pt "
+            "JOIN pg_class c ON c.oid = pt.partrelid JOIN pg_class d ON d.oid = pt.partdefid "
+            "WHERE c.relname = %s AND pg_table_is_visible(c.oid)", [table]
+        )
+        row = cursor.fetchone()
+    return row[0] if row else None
+
+
+def create_partition(table, start, period):
+    """Create the partition for [start, start + period), taking its rows out of DEFAULT"""
+    qn = connection.ops.quote_name
+    end = start + period_step(period)
+    name = partition_name(table, start)
+    # DDL takes no bind parameters; the bounds are our own ISO timestamps
+    bounds = f"FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+    default = default_partition(table)
+    with transaction.atomic(), connection.cursor() as cursor:
+        if default:
+            cursor.execute(
+                f'SELECT 1 FROM {qn(default)} WHERE "timestamp" >= %s AND "timestamp" < %s LIMIT 1',
+                [start, end]
+            )
+        if not default or cursor.fetchone() is None:
+            cursor.execute(f"CREATE TABLE IF NOT EXISTS {qn(name)} PARTITION OF {qn(table)} FOR VALUES {bounds}")
+            return
+
+        # Rows of this range sit in DEFAULT: move them while it is detached
+        cursor.execute(f"ALTER TABLE {qn(table)} DETACH PARTITION {qn(default)}")
+        cursor.execute(f"CREATE TABLE {qn(name)} PARTITION OF {qn(table)} FOR VALUES {bounds}")
+        cursor.execute(
+            f'WITH moved AS (DELETE FROM {qn(default)} WHERE "timestamp" >= %s AND "timestamp" < %s '
+            f'RETURNING *) INSERT INTO {qn(name)} SELECT * FROM moved',
+            [start, end]
+        )
+        cursor.execute(f"ALTER TABLE {qn(table)} ATTACH PARTITION {qn(default)} DEFAULT")
+
+
+def convert_table(model, period, ahead):
+    """Convert one reading table in place; existing rows become the DEFAULT partition"""
+    _check_vendor()
+    qn = connection.ops.quote_name
+    table = model._meta.db_table
+    legacy = f"{table}_legacy"
+    if is_partitioned(table):
+        raise PartitionError(f"{table} is already partitioned")
+
+    device_table = model._meta.get_field('device').related_model._meta.db_table
+    sequence = f"{table}_part_id_seq"
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f"LOCK TABLE {qn(table)} IN ACCESS EXCLUSIVE MODE")
+        cursor.execute(f'SELECT MAX(id), MAX("timestamp") FROM {qn(table)}')
+        max_id, newest = cursor.fetchone()
+        cursor.execute(
+            "SELECT indexname, indexdef FROM pg_indexes "
+            "WHERE tablename = %s AND schemaname = current_schema() AND indexname <> %s",
+            [table, f"{table}_pkey"]
+        )
+        indexes = cursor.fetchall()
+
+        # Free the index names for the partitioned parent
+        cursor.execute(f"ALTER TABLE {qn(table)} RENAME TO {qn(legacy)}")
+        for name, _ in indexes:
+            cursor.execute(f"ALTER INDEX {qn(name)} RENAME TO {qn((name + '_legacy')[:63])}")
+        # A partition may not have its own identity column; ids come from the parent's sequence
+        cursor.execute(f"ALTER TABLE {qn(legacy)} ALTER COLUMN id DROP IDENTITY IF EXISTS")
+        cursor.execute(f"ALTER TABLE {qn(legacy)} ALTER COLUMN id DROP DEFAULT")
+
+        cursor.execute(
+            f"CREATE TABLE {qn(table)} (LIKE {qn(legacy)} INCLUDING CONSTRAINTS) "
+            f'PARTITION BY RANGE ("timestamp")'
+        )
+        cursor.execute(f"CREATE SEQUENCE {qn(sequence)} OWNED BY {qn(table)}.id START WITH {(max_id or 0) + 1}")
+        cursor.execute(f"ALTER TABLE {qn(table)} ALTER COLUMN id SET DEFAULT nextval('{sequence}')")
+        cursor.execute(f'ALTER TABLE {qn(table)} ADD PRIMARY KEY (id, "timestamp")')
+        cursor.execute(
+            f"ALTER TABLE {qn(table)} ADD CONSTRAINT {qn(table + '_device_fk')} "
+            f"FOREIGN KEY (device_id) REFERENCES {qn(device_table)} (id) DEFERRABLE INITIALLY DEFERRED"
+        )
+        for _, definition in indexes:
+            cursor.execute(definition)
+
+        # Matching legacy indexes are attached to the parent's indexes, not rebuilt
+        cursor.execute(f"ALTER TABLE {qn(table)} ATTACH PARTITION {qn(legacy)} DEFAULT")
+
+        # Range partitions start after the newest legacy row so none overlap the DEFAULT one
+        first = period_start(max(newest or timezone.now(), timezone.now()), period) + period_step(period)
+        for i in range(ahead):
+            create_partition(table, first + i * period_step(period), period)
+    return legacy
+
+
+def ensure_partitions(model, period, ahead, now=None):
+    """Create missing partitions from the current period to ``ahead`` periods out"""
+    table = model._meta.db_table
+    existing = list_partitions(table)
+    step = period_step(period)
+    start = period_start(now or timezone.now(), period)
+    if existing and start < min(existing):
+        # The current period still lives in the DEFAULT partition
+        start = min(existing)
+    created = []
+    for i in range(ahead + 1):
+        boundary = start + i * step
+        if boundary not in existing:
+            create_partition(table, boundary, period)
+            created.append(partition_name(table, boundary))
+    return created
+
+
+def drop_expired(name, period, days, now=None, dry_run=False):
+    """Detach and drop partitions whose whole range is older than ``days``"""
+    qn = connection.ops.quote_name
+    table = PARTITIONED_MODELS[name]._meta.db_table
+    cutoff = (now or timezone.now()) - timedelta(days=days)
+    dropped = []
+    for start, partition in sorted(list_partitions(table).items()):
+        if start + period_step(period) > cutoff:
+            break
+        if not dry_run:
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.execute(f"ALTER TABLE {qn(table)} DETACH PARTITION {qn(partition)}")
+                cursor.execute(f"SELECT COUNT(*) FROM {qn(partition)}")
+                add_counts({name: -cursor.fetchone()[0]})
+                cursor.execute(f"DROP TABLE {qn(partition)}")
+        dropped.append(partition)
+    return dropped
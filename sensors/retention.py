@@ -0,0 +1,110 @@
+"""
+Retention policies for readings, rollups and waveforms.
+
+Each policy names a table, the time column that ages it and how many days to
+keep. Raw readings are kept briefly and the per-minute/per-hour rollups
+(maintained on ingest, see ``rollups``) keep the downsampled history much
+longer. ``SENSOR_RETENTION_DAYS`` overrides the defaults, e.g.
+``ecg=3,rollup_hour=730``; 0 keeps a table forever.
+
+``prune`` deletes in primary-key windows of ``chunk_size`` ids, each window
+its own short transaction (which also adjusts the table counters), so no
+statement holds locks for long or writes a huge burst of WAL.
+"""
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max, Min
+from django.utils import timezone
+
+from .counters import COUNTED_MODELS, add_counts
+from .models import (
+    ECGReading, PulseOximeterReading, MAX30102Reading, AccelerometerReading,
+    DeviceStatus, WaveformChunk, ReadingRollup, AnomalyEvent,
+    IngestSequence
+)
+
+# name -> (model, time field, extra filter, default days)
+POLICIES = {
+    'ecg': (ECGReading, 'timestamp', {}, 7),
+    'pulse_oximeter': (PulseOximeterReading, 'timestamp', {}, 7),
+    'max30102': (MAX30102Reading, 'timestamp', {}, 7),
+    'accelerometer': (AccelerometerReading, 'timestamp', {}, 7),
+    'device_status': (DeviceStatus, 'timestamp', {}, 30),
+    'waveform': (WaveformChunk, 'end_time', {}, 7),
+    'rollup_minute': (ReadingRollup, 'bucket', {'period': ReadingRollup.PERIOD_MINUTE}, 30),
+    'rollup_hour': (ReadingRollup, 'bucket', {'period': ReadingRollup.PERIOD_HOUR}, 365),
+    'anomaly': (AnomalyEvent, 'timestamp', {}, 365),
+    'ingest_sequence': (IngestSequence, 'received_at', {}, 1),
+}
+
+
+def parse_overrides(value):
+    """Parse ``name=days,...`` into a dict, rejecting unknown names"""
+    overrides = {}
+    for item in filter(None, (part.strip() for part in (value or '').split(','))):
+        name, _, days = item.partition('=')
+        name = name.strip()
+        if name not in POLICIES or not days.strip().isdigit():
+            raise ValueError(f"Invalid retention policy: {item}")
+        overrides[name] = int(days)
+    return overrides
+
+
+def retention_days():
+    """Effective days to keep per policy name"""
+    days = {name: policy[3] for name, policy in POLICIES.items()}
+    days.update(parse_overrides(getattr(settings, 'SENSOR_RETENTION_DAYS', '')))
+    return days
+
+
+class PruneResult:
+    def __init__(self, name, cutoff):
+        self.name = name
+        self.cutoff = cutoff
+        self.deleted = 0
+        self.chunks = 0
+        self.seconds = 0.0
+
+    @property
+    def rate(self):
+        return self.deleted / self.seconds if self.seconds else 0.0
+
+
+def prune(name, days, chunk_size=5000, pause=0.0, dry_run=False, now=None):
+    """Delete rows of one policy older than ``days``; returns a PruneResult"""
+    model, field, extra, _ = POLICIES[name]
+    cutoff = (now or timezone.now()) - timedelta(days=days)
+    result = PruneResult(name, cutoff)
+    started = time.monotonic()
+
+    # pylint: disable=no-member
+    expired = model.objects.filter(**extra, **{f'{field}__lt': cutoff})  # type: ignore
+    if dry_run:
+        result.deleted = expired.count()
+        result.seconds = time.monotonic() - started
+        return result
+
+    # Rows arrive roughly in time order, but device-side timestamps can be
+    # late, so bound the id walk by the highest expired id, not the first fresh one
+    bounds = expired.aggregate(lo=Min('id'), hi=Max('id'))
+    if bounds['lo'] is None:
+        result.seconds = time.monotonic() - started
+        return result
+
+    lo = bounds['lo']
+    while lo <= bounds['hi']:
+        with transaction.atomic():
+            deleted, _ = expired.filter(id__gte=lo, id__lt=lo + chunk_size).delete()
+            if name in COUNTED_MODELS:
+                add_counts({name: -deleted})
+        result.deleted += deleted
+        result.chunks += 1
+        lo += chunk_size
+        if pause and deleted:
+            time.sleep(pause)
+
+    result.seconds = time.monotonic() - started
+    return result
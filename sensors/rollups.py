@@ -0,0 +1,114 @@
+"""
+Incrementally maintained per-minute and per-hour rollups of reading metrics.
+
+``apply_rollups`` is called by ``ingest.save_readings`` inside the same
+transaction as the raw inserts. It folds the batch into (device, metric,
+period, bucket) partials in memory and merges them with one multi-row
+``INSERT ... ON CONFLICT DO UPDATE`` that adds counts/sums and keeps the
+min/max, so concurrent writers never lose an update.
+"""
+from datetime import timezone as dt_timezone
+
+from django.db import connection
+
+from .models import (
+    ECGReading, PulseOximeterReading, MAX30102Reading, AccelerometerReading,
+    DeviceStatus, ReadingRollup
+)
+
+# (model, field, metric, skip_zero) - zero heart rate/SpO2 means "no sensor"
+ROLLUP_METRICS = [
+    (ECGReading, 'heart_rate', 'ecg_heart_rate', True),
+    (PulseOximeterReading, 'spo2', 'spo2', True),
+    (PulseOximeterReading, 'heart_rate', 'pulse_heart_rate', True),
+    (MAX30102Reading, 'heart_rate', 'max30102_heart_rate', True),
+    (AccelerometerReading, 'magnitude', 'accel_magnitude', False),
+    (DeviceStatus, 'battery_level', 'battery_level', False),
+]
+
+METRICS = {metric: (model, field, skip_zero) for model, field, metric, skip_zero in ROLLUP_METRICS}
+
+PERIODS = (ReadingRollup.PERIOD_MINUTE, ReadingRollup.PERIOD_HOUR)
+
+# Rows per INSERT statement, well under SQLite's bound-parameter limit
+UPSERT_BATCH = 100
+
+
+def bucket_start(timestamp, period):
+    """Start of the UTC minute/hour containing ``timestamp``"""
+    timestamp = timestamp.astimezone(dt_timezone.utc)
+    if period == ReadingRollup.PERIOD_HOUR:
+        return timestamp.replace(minute=0, second=0, microsecond=0)
+    return timestamp.replace(second=0, microsecond=0)
+
+
+def rollup_partials(instances):
+    """Fold readings into {(device_id, metric, period, bucket): [count, min, max, sum, sum_sq]}"""
+    partials = {}
+    for instance in instances:
+        for model, field, metric, skip_zero in ROLLUP_METRICS:
+            if not isinstance(instance, model):
+                continue
+            value = getattr(instance, field)
+            if value is None or (skip_zero and not value):
+                continue
+            for period in PERIODS:
+                key = (instance.device_id, metric, period, bucket_start(instance.timestamp, period))
+                partial = partials.get(key)
+                if partial is None:
+                    partials[key] = [1, value, value, value, value * value]
+                else:
+                    partial[0] += 1
+                    partial[1] = min(partial[1], value)
+                    partial[2] = max(partial[2], value)
+                    partial[3] += value
+                    partial[4] += value * value
+    return partials
+
+
+def merge_partials(partials, replace=False):
+    """Upsert partials into ReadingRollup.
+
+    By default counts and sums are added to existing buckets. With
+    ``replace=True`` (backfill) existing buckets are overwritten.
+    """
+    if not partials:
+        return 0
+
+    table = connection.ops.quote_name(ReadingRollup._meta.db_table)
+    least, greatest = ('LEAST', 'GREATEST') if connection.vendor == 'postgresql' else ('MIN', 'MAX')
+    if replace:
+        updates = ', '.join(f'{col} = EXCLUDED.{col}' for col in (
+            'count', 'min_value', 'max_value', 'sum_value', 'sum_sq'))
+    else:
+        updates = (
+            f'count = {table}.count + EXCLUDED.count, '
+            f'min_value = {least}({table}.min_value, EXCLUDED.min_value), '
+            f'max_value = {greatest}({table}.max_value, EXCLUDED.max_value), '
+            f'sum_value = {table}.sum_value + EXCLUDED.sum_value, '
+            f'sum_sq = {table}.sum_sq + EXCLUDED.sum_sq'
+        )
+
+    # Sorted so concurrent writers take row locks in the same order
+    rows = sorted(partials.items())
+    with connection.cursor() as cursor:
+        for start in range(0, len(rows), UPSERT_BATCH):
+            batch = rows[start:start + UPSERT_BATCH]
+            params = []
+            for (device_id, metric, period, bucket), values in batch:
+                params.extend([device_id, metric, period,
+                               connection.ops.adapt_datetimefield_value(bucket), *values])
+            placeholders = ', '.join(['(%s, %s, %s, %s, %s, %s, %s, %s, %s)'] * len(batch))
+            cursor.execute(
+                f'INSERT INTO {table} '
+                f'(device_id, metric, period, bucket, count, min_value, max_value, sum_value, sum_sq) '
+                f'VALUES {placeholders} '
+                f'ON CONFLICT (device_id, metric, period, bucket) DO UPDATE SET {updates}',
+                params
+            )
+    return len(rows)
+
+
+def apply_rollups(instances):
+    """Fold freshly inserted readings into the rollup tables"""
+    return merge_partials(rollup_partials(instances))
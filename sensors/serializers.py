@@ -1,9 +1,14 @@
+from datetime import timedelta
+from django.conf import settings
+from django.utils import timezone
 from rest_framework import serializers
 from typing import Optional, Any
 from .models import (
     Device, ECGReading, PulseOximeterReading, 
     MAX30102Reading, AccelerometerReading, DeviceStatus
 )
+from .devices import device_registry
+from .ingest import save_readings
 
 
 class DeviceSerializer(serializers.ModelSerializer):
@@ -24,14 +29,14 @@ class ECGReadingSerializer(serializers.ModelSerializer):
     
     def create(self, validated_data):
         device_id = validated_data.pop('device_id')
-        # pylint: disable=no-member
-        device, _ = Device.objects.get_or_create(  # type: ignore
-            device_id=device_id,
+        device, _ = device_registry.resolve(
+            device_id,
             defaults={'name': f'ECG Device {device_id}', 'device_type': 'ESP32'}
         )
-        device.save()  # Update last_seen
         validated_data['device'] = device
-        return super().create(validated_data)
+        instance = self.Meta.model(**validated_data)
+        save_readings([instance])  # Same write path as the ESP32 endpoints
+        return instance
 
 
 class PulseOximeterReadingSerializer(serializers.ModelSerializer):
@@ -45,14 +50,14 @@ class PulseOximeterReadingSerializer(serializers.ModelSerializer):
     
     def create(self, validated_data):
         device_id = validated_data.pop('device_id')
-        # pylint: disable=no-member
-        device, _ = Device.objects.get_or_create(  # type: ignore
-            device_id=device_id,
+        device, _ = device_registry.resolve(
+            device_id,
             defaults={'name': f'Pulse Oximeter {device_id}', 'device_type': 'ESP32'}
         )
-        device.save()  # Update last_seen
         validated_data['device'] = device
-        return super().create(validated_data)
+        instance = self.Meta.model(**validated_data)
+        save_readings([instance])  # Same write path as the ESP32 endpoints
+        return instance
 
 
 class MAX30102ReadingSerializer(serializers.ModelSerializer):
@@ -67,14 +72,14 @@ class MAX30102ReadingSerializer(serializers.ModelSerializer):
     
     def create(self, validated_data):
         device_id = validated_data.pop('device_id')
-        # pylint: disable=no-member
-        device, _ = Device.objects.get_or_create(  # type: ignore
-            device_id=device_id,
+        device, _ = device_registry.resolve(
+            device_id,
             defaults={'name': f'MAX30102 {device_id}', 'device_type': 'ESP32'}
         )
-        device.save()  # Update last_seen
         validated_data['device'] = device
-        return super().create(validated_data)
+        instance = self.Meta.model(**validated_data)
+        save_readings([instance])  # Same write path as the ESP32 endpoints
+        return instance
 
 
 class AccelerometerReadingSerializer(serializers.ModelSerializer):
@@ -88,14 +93,14 @@ class AccelerometerReadingSerializer(serializers.ModelSerializer):
     
     def create(self, validated_data):
         device_id = validated_data.pop('device_id')
-        # pylint: disable=no-member
-        device, _ = Device.objects.get_or_create(  # type: ignore
-            device_id=device_id,
+        device, _ = device_registry.resolve(
+            device_id,
             defaults={'name': f'Accelerometer {device_id}', 'device_type': 'ESP32'}
         )
-        device.save()  # Update last_seen
         validated_data['device'] = device
-        return super().create(validated_data)
+        instance = self.Meta.model(**validated_data)
+        save_readings([instance])  # Same write path as the ESP32 endpoints
+        return instance
 
 
 class DeviceStatusSerializer(serializers.ModelSerializer):
@@ -110,14 +115,18 @@ class DeviceStatusSerializer(serializers.ModelSerializer):
     
     def create(self, validated_data):
         device_id = validated_data.pop('device_id')
-        # pylint: disable=no-member
-        device, _ = Device.objects.get_or_create(  # type: ignore
-            device_id=device_id,
+        device, _ = device_registry.resolve(
+            device_id,
             defaults={'name': f'Device {device_id}', 'device_type': 'ESP32'}
         )
-        device.save()  # Update last_seen
         validated_data['device'] = device
-        return super().create(validated_data)
+        instance = self.Meta.model(**validated_data)
+        save_readings([instance])  # Same write path as the ESP32 endpoints
+        return instance
+
+
+# Tolerated device clock drift ahead of the server for device-side timestamps
+MAX_CLOCK_SKEW = timedelta(minutes=5)
 
 
 class BulkSensorDataSerializer(serializers.Serializer):
@@ -154,6 +163,70 @@ class BulkSensorDataSerializer(serializers.Serializer):
     cpu_temperature = serializers.FloatField(required=False, allow_null=True)
     uptime_seconds = serializers.IntegerField(required=False, allow_null=True)
     
+    # Device-side sample time: absolute, or device clock (millis()) in a batch
+    timestamp = serializers.DateTimeField(required=False, allow_null=True)
+    offset_ms = serializers.IntegerField(required=False, allow_null=True, min_value=0)
+    
+    # Per-device counter repeated by retries; boot_id changes when it restarts
+    sequence = serializers.IntegerField(required=False, allow_null=True, min_value=0, max_value=2 ** 63 - 1)
+    boot_id = serializers.CharField(max_length=32, required=False, allow_blank=True)
+    
+    def validate_timestamp(self, value):
+        if value is not None and value > timezone.now() + MAX_CLOCK_SKEW:
+            raise serializers.ValidationError("Timestamp is in the future")
+        return value
+    
+    def create(self, validated_data: dict) -> Optional[Any]:
+        """This serializer is used for validation only, not for creating objects"""
+        # pylint: disable=unused-argument
+        return None
+    
+    def update(self, instance: Any, validated_data: dict) -> Any:
+        """This serializer is used for validation only, not for updating objects"""
+        # pylint: disable=unused-argument
+        return instance
+
+
+class BulkSensorSampleSerializer(BulkSensorDataSerializer):
+    """One sample inside a multi-sample batch; device_id comes from the batch"""
+    device_id = serializers.CharField(max_length=100, required=False)
+
+
+class BulkSensorBatchSerializer(serializers.Serializer):
+    """Serializer for multi-sample batches buffered on the ESP32"""
+    device_id = serializers.CharField(max_length=100)
+    # Device clock (millis()) when the batch was sent; defaults to the newest sample
+    sent_offset_ms = serializers.IntegerField(required=False, allow_null=True, min_value=0)
+    # Default boot_id for samples that carry a sequence but no boot_id
+    boot_id = serializers.CharField(max_length=32, required=False, allow_blank=True)
+    samples = BulkSensorSampleSerializer(
+        many=True, allow_empty=False,
+        max_length=getattr(settings, 'SENSOR_BULK_MAX_SAMPLES', 500)
+    )
+    
+    def validate(self, attrs):
+        """Resolve offset_ms samples to absolute timestamps on the server clock"""
+        received_at = timezone.now()
+        samples = attrs['samples']
+        offsets = [s['offset_ms'] for s in samples if s.get('offset_ms') is not None]
+        sent_offset = attrs.get('sent_offset_ms')
+        if sent_offset is None and offsets:
+            sent_offset = max(offsets)
+        
+        # Reported per sample, in the same list shape as field errors
+        errors = [{} for _ in samples]
+        for sample, error in zip(samples, errors):
+            if sample.get('timestamp') is None and sample.get('offset_ms') is not None:
+                if sample['offset_ms'] > sent_offset:
+                    error['offset_ms'] = ["offset_ms is after sent_offset_ms"]
+                    continue
+                sample['timestamp'] = received_at - timedelta(
+                    milliseconds=sent_offset - sample['offset_ms']
+                )
+        if any(errors):
+            raise serializers.ValidationError({'samples': errors})
+        return attrs
+    
     def create(self, validated_data: dict) -> Optional[Any]:
         """This serializer is used for validation only, not for creating objects"""
         # pylint: disable=unused-argument
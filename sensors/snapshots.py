@@ -0,0 +1,138 @@
+"""
+Per-device snapshot of the newest value of every sensor field.
+
+``update_snapshots`` is called by ``ingest.save_readings`` inside the ingest
+transaction. It folds the batch to the newest reading per (device, sensor)
+and upserts one ``DeviceSnapshot`` row per device. Each sensor's columns are
+only replaced when the incoming reading is at least as new as the stored
+one (``<sensor>_at``), so late or replayed samples cannot move the snapshot
+backwards. Per-device "current values" reads become one row lookup, and
+``fleet_columns`` reads the whole fleet with a single LEFT JOIN.
+"""
+from django.db import connection
+from django.utils import timezone
+
+from .models import (
+    ECGReading, PulseOximeterReading, MAX30102Reading, AccelerometerReading,
+    DeviceStatus, Device, DeviceSnapshot
+)
+
+# model -> (timestamp column, {snapshot column: reading field})
+SNAPSHOT_GROUPS = {
+    ECGReading: ('ecg_at', {'ecg_heart_rate': 'heart_rate', 'ecg_value': 'ecg_value'}),
+    PulseOximeterReading: ('pulse_at', {'spo2': 'spo2', 'pulse_heart_rate': 'heart_rate'}),
+    MAX30102Reading: ('max30102_at', {'max30102_heart_rate': 'heart_rate',
+                                      'red_value': 'red_value', 'ir_value': 'ir_value'}),
+    AccelerometerReading: ('accel_at', {'x_axis': 'x_axis', 'y_axis': 'y_axis',
+                                        'z_axis': 'z_axis', 'magnitude': 'magnitude'}),
+    DeviceStatus: ('status_at', {'battery_level': 'battery_level',
+                                 'wifi_signal_strength': 'wifi_signal_strength'}),
+}
+
+# Sensor names (as in export/events) -> model, for column selection
+SENSOR_MODELS = {
+    'ecg': ECGReading,
+    'pulse_oximeter': PulseOximeterReading,
+    'max30102': MAX30102Reading,
+    'accelerometer': AccelerometerReading,
+    'device_status': DeviceStatus,
+}
+
+# Rows per INSERT statement, well under SQLite's bound-parameter limit
+UPSERT_BATCH = 25
+
+
+def snapshot_rows(instances):
+    """{device pk: {column: value}} holding the newest reading of each sensor"""
+    rows = {}
+    for instance in instances:
+        group = SNAPSHOT_GROUPS.get(type(instance))
+        if group is None:
+            continue
+        at_column, columns = group
+        row = rows.setdefault(instance.device_id, {})
+        current = row.get(at_column)
+        if current is not None and current > instance.timestamp:
+            continue
+        row[at_column] = instance.timestamp
+        for column, field in columns.items():
+            row[column] = getattr(instance, field)
+    return rows
+
+
+def update_snapshots(instances):
+    """Upsert the snapshot rows touched by a batch of new readings"""
+    rows = snapshot_rows(instances)
+    if not rows:
+        return 0
+
+    qn = connection.ops.quote_name
+    table = qn(DeviceSnapshot._meta.db_table)
+    columns = ['device_id', 'updated_at']
+    updates = ['updated_at = EXCLUDED.updated_at']
+    for at_column, group_columns in SNAPSHOT_GROUPS.values():
+        newer = (f'EXCLUDED.{at_column} IS NOT NULL AND '
+                 f'({table}.{at_column} IS NULL OR EXCLUDED.{at_column} >= {table}.{at_column})')
+        for column in [*group_columns, at_column]:
+            columns.append(column)
+            updates.append(f'{column} = CASE WHEN {newer} THEN EXCLUDED.{column} ELSE {table}.{column} END')
+
+    now = connection.ops.adapt_datetimefield_value(timezone.now())
+    # Sorted so concurrent writers lock snapshot rows in the same order
+    items = sorted(rows.items())
+    with connection.cursor() as cursor:
+        for start in range(0, len(items), UPSERT_BATCH):
+            batch = items[start:start + UPSERT_BATCH]
+            params = []
+            for device_pk, row in batch:
+                params.extend([device_pk, now])
+                for column in columns[2:]:
+                    value = row.get(column)
+                    if column.endswith('_at') and value is not None:
+                        value = connection.ops.adapt_datetimefield_value(value)
+                    params.append(value)
+            placeholder = '(' + ', '.join(['%s'] * len(columns)) + ')'
+            cursor.execute(
+                f'INSERT INTO {table} ({", ".join(columns)}) '
+                f'VALUES {", ".join([placeholder] * len(batch))} '
+                f'ON CONFLICT (device_id) DO UPDATE SET {", ".join(updates)}',
+                params
+            )
+    return len(rows)
+
+
+def get_snapshot(device_id):
+    """(device, snapshot or None) for a device_id string in one query, or (None, None)"""
+    # pylint: disable=no-member
+    snapshot = (DeviceSnapshot.objects.select_related('device')  # type: ignore
+                .filter(device__device_id=device_id).first())
+    if snapshot is not None:
+        return snapshot.device, snapshot
+    device = Device.objects.filter(device_id=device_id).first()  # type: ignore
+    return device, None
+
+
+def fleet_columns(device_ids=None, sensors=None):
+    """
+    Current values of many devices as (columns, rows) from one query.
+
+    Without ``device_ids`` every active device is returned. Devices that have
+    not reported yet get None values. ``sensors`` limits the value columns to
+    those sensor groups.
+    """
+    columns = ['device_id', 'last_seen']
+    for name, model in SENSOR_MODELS.items():
+        if sensors and name not in sensors:
+            continue
+        at_column, group_columns = SNAPSHOT_GROUPS[model]
+        columns.extend([*group_columns, at_column])
+
+    # pylint: disable=no-member
+    devices = Device.objects.all()  # type: ignore
+    if device_ids:
+        devices = devices.filter(device_id__in=device_ids)
+    else:
+        devices = devices.filter(is_active=True)
+    lookups = columns[:2] + [f'snapshot__{column}' for column in columns[2:]]
+    rows = devices.order_by('device_id').values_list(*lookups)
+    return columns, rows
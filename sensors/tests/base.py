@@ -0,0 +1,18 @@
+from django.test import TestCase
+
+from ..dedupe import dedupe_window
+from ..devices import device_registry
+from ..latest import latest_values
+from ..models import Device
+
+
+class SensorTestCase(TestCase):
+    """Clears the per-process caches, which outlive each test's rolled-back transaction"""
+
+    def setUp(self):
+        dedupe_window.clear()
+        device_registry.clear()
+        latest_values.clear()
+
+    def device(self, device_id='ESP32_TEST'):
+        return Device.objects.create(device_id=device_id, name=device_id)  # type: ignore
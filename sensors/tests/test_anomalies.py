@@ -0,0 +1,72 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.test import override_settings
+
+from ..anomalies import detect_anomalies
+from ..metrics import registry
+from ..models import AnomalyDetectorState, AnomalyEvent, ECGReading
+from .base import SensorTestCase
+
+T0 = datetime(2024, 5, 16, 12, 0, tzinfo=dt_timezone.utc)
+SPIKES = ('sensor_anomalies_total', (('kind', AnomalyEvent.KIND_HR_SPIKE),))
+
+
+@override_settings(SENSOR_ANOMALY_WARMUP=10, SENSOR_ANOMALY_Z=4.0, SENSOR_ANOMALY_ALPHA=0.01)
+class AnomalyEpisodeTests(SensorTestCase):
+    def setUp(self):
+        super().setUp()
+        self.device_row = self.device()
+        self.seconds = 0
+        # Baseline: 60/62 bpm, mean 61 and standard deviation 1
+        self.feed(*[60.0, 62.0] * 5)
+
+    def feed(self, *heart_rates):
+        readings = []
+        for heart_rate in heart_rates:
+            readings.append(ECGReading(device=self.device_row, heart_rate=heart_rate, ecg_value=0,
+                                       timestamp=T0 + timedelta(seconds=self.seconds)))
+            self.seconds += 1
+        with self.captureOnCommitCallbacks(execute=True):
+            return detect_anomalies(readings)
+
+    def state(self):
+        return AnomalyDetectorState.objects.get(device=self.device_row, metric='ecg_heart_rate')  # type: ignore
+
+    def test_warmup_learns_the_baseline(self):
+        state = self.state()
+        self.assertEqual(state.count, 10)
+        self.assertAlmostEqual(state.mean, 61.0)
+        self.assertAlmostEqual(state.variance, 1.0)
+        self.assertFalse(AnomalyEvent.objects.exists())  # type: ignore
+
+    def test_episode_is_recorded_once_until_it_ends(self):
+        before = registry.counters[SPIKES]
+        with self.assertLogs('sensors.anomalies', 'WARNING'):
+            [event] = self.feed(90.0)
+        self.assertEqual((event.kind, event.value), (AnomalyEvent.KIND_HR_SPIKE, 90.0))
+        self.assertEqual(event.timestamp, T0 + timedelta(seconds=10))
+        self.assertAlmostEqual(event.baseline, 61.0)
+        self.assertTrue(self.state().active)
+        self.assertEqual(registry.counters[SPIKES], before + 1)
+
+        # Still outside the band: same episode
+        self.assertEqual(self.feed(90.0, 91.0), [])
+        # Back to normal ends the episode; the next spike starts a new one
+        self.assertEqual(self.feed(61.0), [])
+        self.assertFalse(self.state().active)
+        with self.assertLogs('sensors.anomalies', 'WARNING'):
+            self.assertEqual(len(self.feed(95.0)), 1)
+        self.assertEqual(AnomalyEvent.objects.count(), 2)  # type: ignore
+
+    def test_small_deviations_are_not_flagged(self):
+        # Many standard deviations out, but below the 15 bpm minimum delta
+        self.assertEqual(self.feed(70.0), [])
+
+    def test_late_samples_are_not_scored(self):
+        self.seconds = -60
+        self.assertEqual(self.feed(120.0), [])
+        self.assertEqual(self.state().count, 10)
+
+    def test_zero_heart_rate_is_skipped(self):
+        self.assertEqual(self.feed(0.0), [])
+        self.assertEqual(self.state().count, 10)
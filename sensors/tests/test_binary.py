@@ -0,0 +1,93 @@
+from datetime import timedelta
+
+from django.utils import timezone
+
+from ..binary import HEADER, BOOT_ID, RECORD, MAGIC, SENSOR_ECG, SENSOR_ACCEL, BinaryPayloadError, decode_records
+from ..models import ECGReading
+from .base import SensorTestCase
+
+
+def binary_body(records, version=1, boot_id=0, sent_offset_ms=10000, count=None):
+    body = HEADER.pack(MAGIC, version, len(records) if count is None else count, sent_offset_ms)
+    if version >= 2:
+        body += BOOT_ID.pack(boot_id)
+    for device_id, sequence, offset_ms, sensors, values in records:
+        body += RECORD.pack(device_id.encode('ascii'), sequence, offset_ms, sensors, *values)
+    return body
+
+
+class BinaryDecodeTests(SensorTestCase):
+    values = (72.0, 0.5, 98.0, 71.0, 70.0, 0.1, 0.2, 9.8)
+
+    def test_decodes_version_1_records(self):
+        body = binary_body([('ESP32_A', 3, 9000, SENSOR_ECG | SENSOR_ACCEL, self.values)])
+        (device_id, boot_id, sequence, timestamp, sensors, floats), = decode_records(body)
+        self.assertEqual((device_id, boot_id, sequence), ('ESP32_A', '', 3))
+        self.assertEqual(sensors, SENSOR_ECG | SENSOR_ACCEL)
+        self.assertEqual(floats[0], 72.0)
+        # Sampled one second before the batch was sent
+        self.assertLess(timestamp, timezone.now() - timedelta(milliseconds=900))
+
+    def test_version_2_header_carries_the_boot_id(self):
+        body = binary_body([('ESP32_A', 1, 0, SENSOR_ECG, self.values)], version=2, boot_id=0xBEEF)
+        (_, boot_id, *_), = decode_records(body)
+        self.assertEqual(boot_id, 'beef')
+
+    def test_zero_boot_id_means_unknown(self):
+        body = binary_body([('ESP32_A', 1, 0, SENSOR_ECG, self.values)], version=2, boot_id=0)
+        (_, boot_id, *_), = decode_records(body)
+        self.assertEqual(boot_id, '')
+
+    def test_rejects_malformed_bodies(self):
+        record = [('ESP32_A', 1, 0, SENSOR_ECG, self.values)]
+        bodies = {
+            'short header': binary_body(record)[:HEADER.size - 1],
+            'short v2 header': binary_body([], version=2)[:HEADER.size + 2],
+            'bad magic': b'XXXX' + binary_body(record)[4:],
+            'unknown version': binary_body(record, version=9),
+            'count too high': binary_body(record, count=2),
+            'count too low': binary_body(record, count=0),
+            'truncated record': binary_body(record)[:-1],
+        }
+        for name, body in bodies.items():
+            with self.subTest(name):
+                with self.assertRaises(BinaryPayloadError):
+                    list(decode_records(body))
+
+    def test_endpoint_answers_400_for_a_bad_body(self):
+        response = self.client.post('/api/post_sensor_data/binary/', b'ESPB',
+                                    content_type='application/octet-stream')
+        self.assertEqual(response.status_code, 400)
+
+    def test_non_finite_values_of_a_flagged_sensor_are_rejected(self):
+        for bad in (float('nan'), float('inf'), float('-inf')):
+            values = (72.0, 0.5, 98.0, 71.0, 70.0, 0.1, bad, 9.8)
+            body = binary_body([('ESP32_A', 1, 0, SENSOR_ECG, self.values),
+                                ('ESP32_A', 2, 0, SENSOR_ACCEL, values)])
+            with self.subTest(bad):
+                with self.assertRaisesMessage(BinaryPayloadError, 'Record 1'):
+                    list(decode_records(body))
+
+    def test_non_finite_values_of_unflagged_sensors_are_ignored(self):
+        values = (72.0, 0.5) + (float('nan'),) * 6
+        (*_, floats), = decode_records(binary_body([('ESP32_A', 1, 0, SENSOR_ECG, values)]))
+        self.assertEqual(floats[0], 72.0)
+
+    def test_endpoint_writes_records_and_rejects_nan_with_400(self):
+        body = binary_body([('ESP32_A', 1, 0, SENSOR_ECG, self.values)], version=2, boot_id=7)
+        response = self.client.post('/api/post_sensor_data/binary/', body,
+                                    content_type='application/octet-stream')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['records'], 1)
+        # Replaying the same body is acknowledged without a second write
+        response = self.client.post('/api/post_sensor_data/binary/', body,
+                                    content_type='application/octet-stream')
+        self.assertEqual(response.json()['duplicates'], 1)
+        self.assertEqual(ECGReading.objects.count(), 1)  # type: ignore
+
+        nan = (float('nan'),) + self.values[1:]
+        response = self.client.post('/api/post_sensor_data/binary/',
+                                    binary_body([('ESP32_A', 2, 0, SENSOR_ECG, nan)]),
+                                    content_type='application/octet-stream')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('Record 0', response.json()['message'])
@@ -0,0 +1,78 @@
+import json
+from datetime import timedelta
+
+from django.utils import timezone
+
+from ..models import AccelerometerReading, ECGReading, PulseOximeterReading
+from .base import SensorTestCase
+
+
+class BulkBatchTests(SensorTestCase):
+    url = '/api/sensors/bulk/'
+
+    def post(self, payload):
+        return self.client.post(self.url, json.dumps(payload), content_type='application/json')
+
+    def test_batch_is_written_with_device_side_times(self):
+        stamp = timezone.now() - timedelta(hours=1)
+        response = self.post({
+            'device_id': 'ESP32_BATCH',
+            'sent_offset_ms': 61000,
+            'samples': [
+                {'offset_ms': 1000, 'ecg_heart_rate': 70, 'spo2': 97},
+                {'offset_ms': 61000, 'ecg_heart_rate': 72},
+                {'timestamp': stamp.isoformat(), 'x_axis': 0.1, 'y_axis': 0.2, 'z_axis': 9.8},
+            ],
+        })
+        self.assertEqual(response.status_code, 201)
+        body = response.json()
+        self.assertEqual(body['samples'], 3)
+        self.assertEqual(body['readings'], {'ecg': 2, 'pulse_oximeter': 1, 'accelerometer': 1})
+
+        first, second = ECGReading.objects.order_by('timestamp')  # type: ignore
+        self.assertAlmostEqual((second.timestamp - first.timestamp).total_seconds(), 60, places=3)
+        self.assertLess(timezone.now() - second.timestamp, timedelta(seconds=5))
+        self.assertEqual(AccelerometerReading.objects.get().timestamp, stamp)  # type: ignore
+
+    def test_errors_are_reported_per_sample_and_nothing_is_written(self):
+        response = self.post({
+            'device_id': 'ESP32_BATCH',
+            'samples': [
+                {'ecg_heart_rate': 70},
+                {'spo2': 'not a number'},
+                {'ecg_heart_rate': 71},
+            ],
+        })
+        self.assertEqual(response.status_code, 400)
+        errors = response.json()['errors']['samples']
+        self.assertEqual(len(errors), 3)
+        self.assertEqual((errors[0], errors[2]), ({}, {}))
+        self.assertIn('spo2', errors[1])
+        self.assertFalse(ECGReading.objects.exists())  # type: ignore
+
+    def test_offset_after_the_send_time_is_reported_on_its_sample(self):
+        response = self.post({
+            'device_id': 'ESP32_BATCH',
+            'sent_offset_ms': 5000,
+            'samples': [{'offset_ms': 4000, 'spo2': 97}, {'offset_ms': 6000, 'spo2': 98}],
+        })
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['errors']['samples'][1], {'offset_ms': ['offset_ms is after sent_offset_ms']})
+        self.assertFalse(PulseOximeterReading.objects.exists())  # type: ignore
+
+    def test_empty_batch_is_rejected(self):
+        self.assertEqual(self.post({'device_id': 'ESP32_BATCH', 'samples': []}).status_code, 400)
+
+    def test_replayed_samples_are_counted_not_written(self):
+        payload = {'device_id': 'ESP32_BATCH', 'boot_id': 'b00t',
+                   'samples': [{'sequence': 1, 'ecg_heart_rate': 70}, {'sequence': 2, 'ecg_heart_rate': 71}]}
+        self.post(payload)
+        payload['samples'].append({'sequence': 3, 'ecg_heart_rate': 72})
+        body = self.post(payload).json()
+        self.assertEqual((body['samples'], body['duplicates']), (1, 2))
+        self.assertEqual(ECGReading.objects.count(), 3)  # type: ignore
+
+    def test_single_sample_mentioning_samples_is_not_a_batch(self):
+        response = self.post({'device_id': 'ESP32_ONE', 'ecg_heart_rate': 70, 'note': '"samples"'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(ECGReading.objects.count(), 1)  # type: ignore
@@ -0,0 +1,66 @@
+import gzip
+import json
+import zlib
+
+from django.test import override_settings
+
+from ..compression import BodyTooLarge, DecompressionError, UnsupportedEncoding, decompress_body
+from ..models import ECGReading
+from .base import SensorTestCase
+
+
+class DecompressionTests(SensorTestCase):
+    payload = json.dumps({'device_id': 'ESP32_GZ', 'ecg_heart_rate': 70}).encode()
+
+    def test_gzip_and_deflate_round_trip(self):
+        self.assertEqual(decompress_body(gzip.compress(self.payload), 'gzip'), self.payload)
+        self.assertEqual(decompress_body(zlib.compress(self.payload), 'deflate'), self.payload)
+        raw = zlib.compressobj(wbits=-zlib.MAX_WBITS)
+        raw_deflate = raw.compress(self.payload) + raw.flush()
+        self.assertEqual(decompress_body(raw_deflate, 'deflate'), self.payload)
+
+    def test_concatenated_gzip_members_are_all_decoded(self):
+        body = gzip.compress(b'abc') + gzip.compress(b'def')
+        self.assertEqual(decompress_body(body, 'gzip'), b'abcdef')
+
+    def test_limit_stops_a_compression_bomb(self):
+        bomb = gzip.compress(b'\0' * (1024 * 1024))
+        with self.assertRaises(BodyTooLarge):
+            decompress_body(bomb, 'gzip', limit=64 * 1024)
+        members = gzip.compress(b'a' * 600) + gzip.compress(b'b' * 600)
+        with self.assertRaises(BodyTooLarge):
+            decompress_body(members, 'gzip', limit=1000)
+
+    def test_trailing_and_truncated_data_is_rejected(self):
+        bodies = {
+            'gzip trailing bytes': ('gzip', gzip.compress(self.payload) + b'junk'),
+            'deflate trailing bytes': ('deflate', zlib.compress(self.payload) + b'junk'),
+            'truncated gzip': ('gzip', gzip.compress(self.payload)[:-4]),
+        }
+        for name, (encoding, body) in bodies.items():
+            with self.subTest(name):
+                with self.assertRaises(DecompressionError):
+                    decompress_body(body, encoding)
+
+    def test_unsupported_encoding(self):
+        with self.assertRaises(UnsupportedEncoding):
+            decompress_body(self.payload, 'br')
+
+    def test_middleware_status_codes(self):
+        def post(body, encoding):
+            return self.client.post('/api/post_sensor_data/', body, content_type='application/json',
+                                    HTTP_CONTENT_ENCODING=encoding)
+        self.assertEqual(post(gzip.compress(self.payload), 'gzip').status_code, 200)
+        self.assertEqual(post(gzip.compress(self.payload) + b'junk', 'gzip').status_code, 400)
+        self.assertEqual(post(self.payload, 'br').status_code, 415)
+        with override_settings(SENSOR_MAX_DECOMPRESSED_BYTES=16):
+            self.assertEqual(post(gzip.compress(self.payload), 'gzip').status_code, 413)
+
+
+
+    def test_decoded_body_reaches_the_view(self):
+        response = self.client.post('/api/post_sensor_data/', gzip.compress(self.payload),
+                                    content_type='application/json', HTTP_CONTENT_ENCODING='gzip')
+        self.assertEqual(response.status_code, 200)
+        reading = ECGReading.objects.get(device__device_id='ESP32_GZ')  # type: ignore
+        self.assertEqual(reading.heart_rate, 70)
@@ -0,0 +1,70 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import RequestFactory
+from django.utils import timezone
+
+from .. import views
+from ..counters import SHARDS, add_counts, count_instances, recount, table_counts
+from ..ingest import save_readings
+from ..models import AccelerometerReading, Device, ECGReading, TableCounter
+from .base import SensorTestCase
+
+
+class TableCounterTests(SensorTestCase):
+    def ecg(self, device, n=1):
+        return [ECGReading(device=device, heart_rate=70, ecg_value=0, timestamp=timezone.now()) for _ in range(n)]
+
+    def test_deltas_are_summed_over_shards(self):
+        for _ in range(50):
+            add_counts({'ecg': 2, 'accelerometer': 0})
+        add_counts({'ecg': -10})
+        counts = table_counts()
+        self.assertEqual((counts['ecg'], counts['accelerometer']), (90, 0))
+        shards = set(TableCounter.objects.filter(table='ecg').values_list('shard', flat=True))  # type: ignore
+        self.assertGreater(len(shards), 1)
+        self.assertTrue(shards <= set(range(SHARDS)))
+
+    def test_one_query_per_update_and_read(self):
+        with self.assertNumQueries(1):
+            add_counts({'ecg': 1, 'device': 1, 'max30102': 0})
+        with self.assertNumQueries(0):
+            add_counts({'ecg': 0})
+        with self.assertNumQueries(1):
+            table_counts()
+
+    def test_ingest_and_device_lifecycle(self):
+        device = self.device()
+        readings = self.ecg(device, 3) + [AccelerometerReading(
+            device=device, x_axis=0, y_axis=0, z_axis=1, magnitude=1, timestamp=timezone.now()
+        )]
+        self.assertEqual(count_instances(readings), {'ecg': 3, 'accelerometer': 1})
+        save_readings(readings)
+        counts = table_counts()
+        self.assertEqual((counts['device'], counts['ecg'], counts['accelerometer']), (1, 3, 1))
+
+        # Deleting the device cascades to its readings without per-row signals
+        device.delete()
+        counts = table_counts()
+        self.assertEqual((counts['device'], counts['ecg'], counts['accelerometer']), (0, 0, 0))
+
+    def test_recount_replaces_drifted_counters(self):
+        device = self.device()
+        ECGReading.objects.bulk_create(self.ecg(device, 4))  # type: ignore
+        add_counts({'ecg': 7})
+        self.assertEqual(recount(['ecg']), {'ecg': 4})
+        self.assertEqual(table_counts()['ecg'], 4)
+        self.assertEqual(TableCounter.objects.filter(table='ecg').count(), 1)  # type: ignore
+
+    def test_recount_command_reports_drift(self):
+        Device.objects.bulk_create([Device(device_id='ESP32_B', name='b')])  # type: ignore
+        out = StringIO()
+        call_command('recount_tables', '--table', 'device', stdout=out)
+        self.assertIn('device: 1 rows (counter was off by +1)', out.getvalue())
+        self.assertIn('Counters rebuilt', out.getvalue())
+
+    def test_overview_reads_the_counters(self):
+        save_readings(self.ecg(self.device(), 2))
+        response = views.api_overview(RequestFactory().get('/api/overview/'))
+        self.assertIn('Devices: 1 total, 1 active', response.data)
+        self.assertIn('Readings: 2 ECG, 0 pulse', response.data)
@@ -0,0 +1,83 @@
+import json
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from ..dedupe import claim_sequences, dedupe_window, drop_replays
+from ..models import ECGReading, IngestSequence
+from .base import SensorTestCase
+
+
+class SequenceDedupeTests(SensorTestCase):
+    def test_replayed_sequence_is_not_claimed_twice(self):
+        device = self.device()
+        with transaction.atomic():
+            self.assertEqual(claim_sequences(device, [1, 2], 'b00t'), {1, 2})
+        with transaction.atomic():
+            self.assertEqual(claim_sequences(device, [2, 3], 'b00t'), {3})
+
+    def test_replay_is_answered_from_the_window_after_commit(self):
+        device = self.device()
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                claim_sequences(device, [7], 'b00t')
+        self.assertTrue(dedupe_window.seen((device.pk, 'b00t', 7)))
+        with self.assertNumQueries(0):
+            self.assertEqual(claim_sequences(device, [7], 'b00t'), set())
+
+    def test_new_boot_id_restarts_the_counter(self):
+        device = self.device()
+        with transaction.atomic():
+            claim_sequences(device, [1], 'first')
+        with transaction.atomic():
+            self.assertEqual(claim_sequences(device, [1], 'second'), {1})
+
+    def test_sequences_without_boot_id_are_never_deduplicated(self):
+        device = self.device()
+        with transaction.atomic():
+            self.assertEqual(claim_sequences(device, [1], ''), {1})
+            self.assertEqual(claim_sequences(device, [1], None), {1})
+        self.assertFalse(IngestSequence.objects.exists())  # type: ignore
+
+    def test_rolled_back_claim_does_not_block_the_retry(self):
+        device = self.device()
+        with self.assertRaises(RuntimeError):
+            with transaction.atomic():
+                claim_sequences(device, [5], 'b00t')
+                raise RuntimeError("write failed")
+        with transaction.atomic():
+            self.assertEqual(claim_sequences(device, [5], 'b00t'), {5})
+
+    def test_stale_claim_is_reused(self):
+        device = self.device()
+        with transaction.atomic():
+            claim_sequences(device, [9], 'b00t')
+        IngestSequence.objects.update(  # type: ignore
+            received_at=timezone.now() - timedelta(seconds=dedupe_window.seconds + 60)
+        )
+        with transaction.atomic():
+            self.assertEqual(claim_sequences(device, [9], 'b00t'), {9})
+
+    def test_drop_replays_keeps_one_copy_within_a_batch(self):
+        device = self.device()
+        items = [
+            (device, 'b00t', 1, 'a'),
+            (device, 'b00t', 1, 'a again'),
+            (device, 'b00t', None, 'unnumbered'),
+            (device, '', 1, 'no boot id'),
+        ]
+        with transaction.atomic():
+            kept, replays = drop_replays(items)
+        self.assertEqual(kept, ['a', 'unnumbered', 'no boot id'])
+        self.assertEqual(replays, 1)
+
+    def test_post_sensor_data_acknowledges_a_retry_without_writing(self):
+        payload = json.dumps({'device_id': 'ESP32_RETRY', 'ecg_heart_rate': 72,
+                              'sequence': 41, 'boot_id': 'b00t'})
+        first = self.client.post('/api/post_sensor_data/', payload, content_type='application/json')
+        retry = self.client.post('/api/post_sensor_data/', payload, content_type='application/json')
+        self.assertEqual(first.status_code, 200)
+        self.assertNotIn('duplicate', first.json())
+        self.assertTrue(retry.json()['duplicate'])
+        self.assertEqual(ECGReading.objects.filter(device__device_id='ESP32_RETRY').count(), 1)  # type: ignore
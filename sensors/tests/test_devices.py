@@ -0,0 +1,69 @@
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from ..devices import DeviceRegistry, device_registry
+from ..models import Device
+from .base import SensorTestCase
+
+
+class DeviceRegistryTests(SensorTestCase):
+    def setUp(self):
+        super().setUp()
+        self.registry = DeviceRegistry(max_size=2, flush_seconds=60)
+        self.addCleanup(self.registry._flusher.stop)
+
+    def test_cached_device_costs_no_query(self):
+        device = self.device('ESP32_A')
+        with self.assertNumQueries(1):
+            self.assertEqual(self.registry.resolve('ESP32_A'), (device, False))
+        with self.assertNumQueries(0):
+            cached, created = self.registry.resolve('ESP32_A')
+        self.assertEqual((cached.pk, created), (device.pk, False))
+
+    def test_unknown_device_is_created_with_defaults(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            device, created = self.registry.resolve('ESP32_NEW', defaults={'name': 'New'})
+        self.assertTrue(created)
+        self.assertEqual(Device.objects.get(device_id='ESP32_NEW').name, 'New')  # type: ignore
+        self.assertEqual(len(self.registry), 1)
+
+    def test_device_from_a_rolled_back_transaction_is_not_cached(self):
+        with self.assertRaises(RuntimeError):
+            with self.captureOnCommitCallbacks(execute=True):
+                with transaction.atomic():
+                    self.registry.resolve('ESP32_GHOST')
+                    raise RuntimeError("write failed")
+        self.assertEqual(len(self.registry), 0)
+        self.assertFalse(Device.objects.filter(device_id='ESP32_GHOST').exists())  # type: ignore
+
+    def test_least_recently_used_device_is_evicted(self):
+        for device_id in ('ESP32_A', 'ESP32_B', 'ESP32_C'):
+            self.device(device_id)
+        self.registry.resolve('ESP32_A')
+        self.registry.resolve('ESP32_B')
+        self.registry.resolve('ESP32_A')
+        self.registry.resolve('ESP32_C')
+        self.assertEqual(list(self.registry._devices), ['ESP32_A', 'ESP32_C'])
+
+    def test_saved_or_deleted_device_is_invalidated(self):
+        device = self.device('ESP32_A')
+        device_registry.resolve('ESP32_A')
+        device.name = 'Renamed'
+        device.save()
+        self.assertNotIn('ESP32_A', device_registry._devices)
+        device_registry.resolve('ESP32_A')
+        device.delete()
+        self.assertNotIn('ESP32_A', device_registry._devices)
+
+    def test_last_seen_is_written_in_one_batched_update(self):
+        old = timezone.now() - timedelta(days=1)
+        for device_id in ('ESP32_A', 'ESP32_B'):
+            Device.objects.create(device_id=device_id, name=device_id, last_seen=old)  # type: ignore
+            self.registry.resolve(device_id)
+        self.assertEqual(Device.objects.filter(last_seen=old).count(), 2)  # type: ignore
+        with self.assertNumQueries(1):
+            self.assertEqual(self.registry.flush_last_seen(), 2)
+        self.assertFalse(Device.objects.filter(last_seen=old).exists())  # type: ignore
+        self.assertEqual(self.registry.flush_last_seen(), 0)
@@ -0,0 +1,146 @@
+import asyncio
+import json
+import threading
+
+from django.test import RequestFactory, override_settings
+from django.utils import timezone
+
+from .. import views
+from ..events import EventHub, PostgresListener, StreamSlots, event_hub, events_backend, stream_slots
+from ..ingest import save_readings
+from ..latest import latest_values
+from ..models import ECGReading
+from .base import SensorTestCase
+
+
+def event(device='ESP32_A', sensor='ecg', **extra):
+    return dict({'device': device, 'sensor': sensor, 'values': {}}, **extra)
+
+
+class EventHubTests(SensorTestCase):
+    def test_wait_returns_only_newer_events(self):
+        hub = EventHub()
+        hub.publish([event(), event(sensor='spo2')])
+        self.assertEqual([e.seq for e in hub.wait(0, 0)], [1, 2])
+        self.assertEqual([e.sensor for e in hub.wait(1, 0)], ['spo2'])
+        self.assertEqual(hub.wait(2, 0.01), [])
+
+    def test_wait_wakes_on_publish(self):
+        hub = EventHub()
+        timer = threading.Timer(0.05, hub.publish, [[event()]])
+        timer.start()
+        self.addCleanup(timer.cancel)
+        self.assertEqual(len(hub.wait(0, 5)), 1)
+
+    def test_history_is_bounded(self):
+        hub = EventHub(history=3)
+        hub.publish([event() for _ in range(5)])
+        self.assertEqual([e.seq for e in hub.wait(0, 0)], [3, 4, 5])
+
+    def test_resume_from_a_local_id(self):
+        hub = EventHub()
+        hub.publish([event(), event()])
+        first = hub.wait(0, 0)[0]
+        self.assertEqual(hub.resolve(hub.event_id(first)), 1)
+
+    def test_resume_from_an_id_shared_by_every_process(self):
+        hub = EventHub()
+        hub.publish([event(id='other.7'), event(id='other.8')])
+        self.assertEqual(hub.event_id(hub.wait(0, 0)[0]), 'other.7')
+        self.assertEqual(hub.resolve('other.7'), 1)
+        # The id is not part of the data sent to clients
+        self.assertNotIn('id', json.loads(hub.wait(0, 0)[0].data))
+
+    def test_unknown_id_resumes_from_now(self):
+        hub = EventHub()
+        hub.publish([event()])
+        self.assertEqual(hub.resolve('elsewhere-3'), 1)
+        self.assertEqual(hub.resolve(None), 1)
+
+    def test_backend_follows_the_database(self):
+        with override_settings(SENSOR_EVENTS_BACKEND=''):
+            self.assertEqual(events_backend(), 'local')
+        with override_settings(SENSOR_EVENTS_BACKEND='postgres'):
+            self.assertEqual(events_backend(), 'postgres')
+
+    def test_committed_readings_are_published(self):
+        after = event_hub.last_seq()
+        device = self.device()
+        with self.captureOnCommitCallbacks(execute=True):
+            save_readings([ECGReading(device=device, heart_rate=70, ecg_value=1, timestamp=timezone.now())])
+        published = event_hub.wait(after, 0)
+        self.assertEqual([(e.device, e.sensor) for e in published], [('ESP32_TEST', 'ecg')])
+        self.assertEqual(json.loads(published[0].data)['values']['heart_rate'], 70)
+
+    def test_notified_events_feed_the_hub_and_latest_values(self):
+        after = event_hub.last_seq()
+        payload = '\n'.join(json.dumps(event(
+            device='ESP32_TEST', id=f'w2.{n}', timestamp=timezone.now().isoformat(),
+            values={'heart_rate': 60 + n, 'ecg_value': 1.0},
+        )) for n in range(2))
+        PostgresListener._deliver(payload)
+        self.assertEqual([event_hub.event_id(e) for e in event_hub.wait(after, 0)], ['w2.0', 'w2.1'])
+        with self.assertNumQueries(0):
+            self.assertEqual(latest_values.get('ecg', 'ESP32_TEST').body, b'61')
+
+
+class StreamSlotTests(SensorTestCase):
+    def test_slots_are_bounded(self):
+        slots = StreamSlots(limit=2)
+        self.assertTrue(slots.acquire() and slots.acquire())
+        self.assertFalse(slots.acquire())
+        slots.release()
+        self.assertTrue(slots.acquire())
+
+
+@override_settings(SENSOR_SSE_KEEPALIVE_SECONDS=0.01, SENSOR_SSE_MAX_SECONDS=5)
+class ReadingStreamTests(SensorTestCase):
+    def setUp(self):
+        super().setUp()
+        self.factory = RequestFactory()
+        limit = stream_slots.limit
+        stream_slots.limit = 1
+        self.addCleanup(setattr, stream_slots, 'limit', limit)
+
+    def test_frames_are_filtered_and_carry_ids(self):
+        response = views.reading_stream(self.factory.get('/api/stream/', {'device': 'ESP32_A', 'sensor': 'ecg'}))
+        self.addCleanup(response.close)
+        frames = iter(response)
+        self.assertEqual(next(frames), b'retry: 3000\n\n')
+        event_hub.publish([event(device='ESP32_B'), event(sensor='spo2'), event(id='w1.5')])
+        frame = next(frames).decode()
+        self.assertEqual(frame.count('\n\n'), 1)
+        self.assertTrue(frame.startswith('id: w1.5\nevent: ecg\ndata: '))
+        # Nothing new: a keepalive comment
+        self.assertEqual(next(frames), b': keepalive\n\n')
+
+    def test_streams_beyond_the_limit_get_503(self):
+        first = views.reading_stream(self.factory.get('/api/stream/'))
+        second = views.reading_stream(self.factory.get('/api/stream/'))
+        self.assertEqual((second.status_code, second['Retry-After']), (503, '5'))
+        # Closing the response, even unstarted, frees its slot
+        first.close()
+        third = views.reading_stream(self.factory.get('/api/stream/'))
+        self.assertEqual(third.status_code, 200)
+        third.close()
+        self.assertEqual(stream_slots.active, 0)
+
+    def test_unknown_sensor_is_a_400(self):
+        self.assertEqual(views.reading_stream(self.factory.get('/api/stream/', {'sensor': 'x'})).status_code, 400)
+
+    def test_asgi_stream_is_async(self):
+        from django.core.handlers.asgi import ASGIRequest
+        scope = {'type': 'http', 'method': 'GET', 'path': '/api/stream/', 'query_string': b'', 'headers': []}
+        response = views.reading_stream(ASGIRequest(scope, __import__('io').BytesIO()))
+        self.addCleanup(response.close)
+        self.assertTrue(response.is_async)
+
+        async def first_frames():
+            frames = aiter(response)
+            head = await anext(frames)
+            event_hub.publish([event()])
+            return head, await anext(frames)
+
+        head, frame = asyncio.run(first_frames())
+        self.assertEqual(head, b'retry: 3000\n\n')
+        self.assertIn(b'event: ecg', frame)
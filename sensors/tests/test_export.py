@@ -0,0 +1,58 @@
+import csv
+import io
+import json
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.http import StreamingHttpResponse
+
+from ..export import export_columns, stream_export
+from ..models import ECGReading
+from .base import SensorTestCase
+
+START = datetime(2025, 1, 1, tzinfo=dt_timezone.utc)
+
+
+class ExportTests(SensorTestCase):
+    def setUp(self):
+        super().setUp()
+        self.device_row = self.device('ESP32_A')
+        other = self.device('ESP32_B')
+        ECGReading.objects.bulk_create([  # type: ignore
+            ECGReading(device=device, heart_rate=60 + i, ecg_value=i,
+                       timestamp=START + timedelta(seconds=i))
+            for i, device in enumerate([self.device_row] * 4 + [other])
+        ])
+
+    def get(self, **params):
+        response = self.client.get('/api/export/', params)
+        self.assertIsInstance(response, StreamingHttpResponse)
+        return response, b''.join(response.streaming_content).decode()
+
+    def test_csv_is_streamed_in_time_order(self):
+        response, body = self.get(sensor='ecg', format='csv', device='ESP32_A')
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        self.assertIn('filename="ecg_ESP32_A.csv"', response['Content-Disposition'])
+        rows = list(csv.reader(io.StringIO(body)))
+        self.assertEqual(rows[0], export_columns(ECGReading))
+        self.assertEqual([row[rows[0].index('heart_rate')] for row in rows[1:]], ['60.0', '61.0', '62.0', '63.0'])
+        self.assertEqual(rows[1][1], START.isoformat())
+
+    def test_ndjson_with_a_time_range(self):
+        response, body = self.get(sensor='ecg', format='ndjson',
+                                  start=(START + timedelta(seconds=1)).isoformat(),
+                                  end=(START + timedelta(seconds=3)).isoformat())
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        records = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual([(r['device_id'], r['heart_rate']) for r in records], [('ESP32_A', 61), ('ESP32_A', 62)])
+
+    def test_blocks_hold_chunk_size_rows(self):
+        blocks = list(stream_export('ecg', 'ndjson', chunk_size=2))
+        self.assertEqual([block.count(b'\n') for block in blocks], [2, 2, 1])
+        csv_blocks = list(stream_export('ecg', 'csv', chunk_size=2))
+        # The header travels with the first block
+        self.assertEqual([block.count(b'\n') for block in csv_blocks], [3, 2, 1])
+
+    def test_bad_parameters(self):
+        for params in ({'sensor': 'nope'}, {'format': 'xml'}, {'start': '2024-13-45T00:00:00'}):
+            with self.subTest(params):
+                self.assertEqual(self.client.get('/api/export/', params).status_code, 400)
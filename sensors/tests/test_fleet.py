@@ -0,0 +1,61 @@
+import csv
+import io
+
+from django.utils import timezone
+
+from ..ingest import save_readings
+from ..models import Device, ECGReading, PulseOximeterReading
+from .base import SensorTestCase
+
+URL = '/api/devices/latest/'
+
+
+class FleetLatestTests(SensorTestCase):
+    def setUp(self):
+        super().setUp()
+        self.now = timezone.now()
+        self.first = self.device('ESP32_A')
+        self.second = self.device('ESP32_B')
+        Device.objects.create(device_id='ESP32_OFF', name='off', is_active=False)  # type: ignore
+        save_readings([
+            ECGReading(device=self.first, heart_rate=71.0, ecg_value=1.5, timestamp=self.now),
+            PulseOximeterReading(device=self.second, spo2=97.0, heart_rate=64.0, signal_strength=90,
+                                 timestamp=self.now),
+        ])
+
+    def test_columnar_values_of_active_devices(self):
+        with self.assertNumQueries(1):
+            data = self.client.get(URL, {'sensor': 'ecg,pulse_oximeter'}).json()
+        self.assertEqual(data['count'], 2)
+        self.assertEqual(data['columns'], ['device_id', 'last_seen', 'ecg_heart_rate', 'ecg_value', 'ecg_at',
+                                           'spo2', 'pulse_heart_rate', 'pulse_at'])
+        values = data['values']
+        self.assertEqual(values['device_id'], ['ESP32_A', 'ESP32_B'])
+        self.assertEqual(values['ecg_heart_rate'], [71.0, None])
+        self.assertEqual(values['spo2'], [None, 97.0])
+        self.assertEqual(values['ecg_at'], [self.now.isoformat(), None])
+
+    def test_query_stays_flat_with_more_devices(self):
+        for n in range(20):
+            save_readings([ECGReading(device=self.device(f'ESP32_{n:02}'), heart_rate=60.0, ecg_value=0.0,
+                                      timestamp=self.now)])
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get(URL).json()['count'], 22)
+
+    def test_named_devices_include_inactive_ones(self):
+        data = self.client.get(URL, {'device': 'ESP32_B,ESP32_OFF', 'sensor': 'pulse_oximeter'}).json()
+        self.assertEqual(data['values']['device_id'], ['ESP32_B', 'ESP32_OFF'])
+        self.assertEqual(data['values']['spo2'], [97.0, None])
+
+    def test_csv(self):
+        response = self.client.get(URL, {'sensor': 'ecg', 'format': 'csv'})
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        rows = list(csv.reader(io.StringIO(response.content.decode())))
+        self.assertEqual(rows[0], ['device_id', 'last_seen', 'ecg_heart_rate', 'ecg_value', 'ecg_at'])
+        self.assertEqual(rows[1][:4], ['ESP32_A', rows[1][1], '71.0', '1.5'])
+        self.assertEqual(rows[2][2:], ['', '', ''])
+
+    def test_bad_params(self):
+        self.assertEqual(self.client.get(URL, {'sensor': 'bogus'}).status_code, 400)
+        self.assertEqual(self.client.get(URL, {'format': 'xml'}).status_code, 400)
+        self.assertEqual(self.client.post(URL).status_code, 405)
@@ -0,0 +1,99 @@
+from unittest import mock
+
+from django.test import override_settings
+
+from ..ingest import BufferFull, IngestBuffer
+from ..metrics import registry as metrics
+from ..models import ECGReading
+from .base import SensorTestCase
+
+
+def counter(name):
+    return sum(value for key, value in metrics.counters.items() if key[0] == name)
+
+
+class IngestBufferTests(SensorTestCase):
+    def setUp(self):
+        super().setUp()
+        self.device_row = self.device()
+        # A long interval keeps the flusher thread out of the way; tests flush by hand
+        self.buffer = IngestBuffer(batch_size=3, flush_ms=60000, max_rows=5, max_retries=2)
+        self.buffer.retry_base = 0
+        self.addCleanup(self.buffer._flusher.stop)
+
+    def readings(self, count):
+        return [ECGReading(device=self.device_row, heart_rate=70 + i, ecg_value=0) for i in range(count)]
+
+    def stored(self):
+        return ECGReading.objects.count()  # type: ignore
+
+    def test_flush_writes_what_was_queued(self):
+        self.buffer.add(self.readings(2))
+        self.assertEqual((len(self.buffer), self.stored()), (2, 0))
+        self.assertEqual(self.buffer.flush(), 2)
+        self.assertEqual((len(self.buffer), self.stored()), (0, 2))
+
+    def test_reaching_the_batch_size_flushes_inline(self):
+        self.buffer.add(self.readings(2))
+        self.buffer.add(self.readings(1))
+        self.assertEqual((len(self.buffer), self.stored()), (0, 3))
+
+    def test_stop_writes_the_remainder(self):
+        self.buffer.add(self.readings(1))
+        self.buffer.stop()
+        self.assertEqual(self.stored(), 1)
+
+    def test_full_buffer_refuses_new_rows(self):
+        self.buffer.batch_size = 100
+        self.buffer.add(self.readings(4))
+        with self.assertRaises(BufferFull):
+            self.buffer.add(self.readings(2))
+        self.assertEqual(len(self.buffer), 4)
+
+    def test_failed_flush_is_retried(self):
+        self.buffer.add(self.readings(2))
+        # Fails after bulk_create assigned primary keys, so the retry must reset them
+        with mock.patch('sensors.ingest.apply_rollups', side_effect=RuntimeError("db down")), \
+                self.assertLogs('sensors.ingest', 'ERROR'):
+            self.assertEqual(self.buffer.flush(), 0)
+        self.assertEqual((len(self.buffer), self.stored()), (2, 0))
+        self.assertEqual(self.buffer.flush(), 2)
+        self.assertEqual((len(self.buffer), self.stored()), (0, 2))
+
+    def test_retry_waits_for_the_backoff(self):
+        self.buffer.retry_base = 60
+        self.buffer.add(self.readings(1))
+        with mock.patch('sensors.ingest.save_readings', side_effect=RuntimeError("db down")), \
+                self.assertLogs('sensors.ingest', 'ERROR'):
+            self.buffer.flush()
+        self.assertEqual(self.buffer.flush(), 0)
+        self.assertEqual(len(self.buffer), 1)
+
+    def test_batch_is_dropped_and_counted_after_max_retries(self):
+        dropped = counter('sensor_ingest_dropped_total')
+        self.buffer.add(self.readings(2))
+        with mock.patch('sensors.ingest.save_readings', side_effect=RuntimeError("db down")), \
+                self.assertLogs('sensors.ingest', 'ERROR') as logs:
+            for _ in range(self.buffer.max_retries + 1):
+                self.buffer.flush()
+        self.assertIn('Dropped 2 buffered readings', logs.output[-1])
+        self.assertEqual(len(self.buffer), 0)
+        self.assertEqual(counter('sensor_ingest_dropped_total') - dropped, 2)
+
+    def test_failed_final_flush_is_counted(self):
+        dropped = counter('sensor_ingest_dropped_total')
+        self.buffer.add(self.readings(1))
+        with mock.patch('sensors.ingest.save_readings', side_effect=RuntimeError("db down")), \
+                self.assertLogs('sensors.ingest', 'ERROR'):
+            self.buffer.stop()
+        self.assertEqual(counter('sensor_ingest_dropped_total') - dropped, 1)
+
+
+@override_settings(SENSOR_INGEST_BUFFERED=True)
+class BufferedEndpointTests(SensorTestCase):
+    def test_full_buffer_answers_503(self):
+        with mock.patch('sensors.ingest.ingest_buffer.add', side_effect=BufferFull):
+            response = self.client.post('/api/post_sensor_data/', {'ecg_heart_rate': 72},
+                                        content_type='application/json')
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '1')
@@ -0,0 +1,99 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.test import RequestFactory
+from django.utils import timezone
+
+from .. import views
+from ..latest import LatestValueCache, latest_values
+from ..models import AccelerometerReading, ECGReading
+from .base import SensorTestCase
+
+
+class LatestValueCacheTests(SensorTestCase):
+    def setUp(self):
+        super().setUp()
+        self.device_row = self.device('ESP32_A')
+        self.cache = LatestValueCache(ttl=30)
+
+    def ecg(self, heart_rate, timestamp=None, save=True):
+        reading = ECGReading(device=self.device_row, heart_rate=heart_rate, ecg_value=0,
+                             timestamp=timestamp or timezone.now())
+        if save:
+            reading.save()
+        return reading
+
+    def test_cold_key_is_loaded_once(self):
+        self.ecg(71)
+        with self.assertNumQueries(1):
+            self.assertEqual(self.cache.get('ecg').body, b'71.0')
+        with self.assertNumQueries(0):
+            self.assertEqual(self.cache.get('ecg').value, 71)
+
+    def test_missing_data_serves_the_fallback(self):
+        entry = self.cache.get('ecg', 'ESP32_NOPE')
+        self.assertEqual((entry.body, entry.has_data), (b'75', False))
+
+    def test_recorded_reading_is_served_without_a_query(self):
+        self.cache.record(self.ecg(80.0, save=False))
+        with self.assertNumQueries(0):
+            self.assertEqual(self.cache.get('ecg').body, b'80.0')
+            self.assertEqual(self.cache.get('ecg', 'ESP32_A').body, b'80.0')
+
+    def test_older_reading_does_not_replace_a_newer_one(self):
+        now = timezone.now()
+        self.cache.record(self.ecg(80, now, save=False))
+        self.cache.record(self.ecg(60, now - timedelta(seconds=5), save=False))
+        self.assertEqual(self.cache.get('ecg').value, 80)
+
+    def test_event_from_another_process_is_recorded(self):
+        self.cache.record_event(AccelerometerReading, {
+            'device': 'ESP32_A', 'sensor': 'accelerometer', 'timestamp': timezone.now().isoformat(),
+            'values': {'x_axis': 0.0, 'y_axis': 0.5, 'z_axis': 9.8, 'magnitude': 9.81},
+        })
+        with self.assertNumQueries(0):
+            # Accelerometer axes only fall back for None, so 0.0 is served as is
+            self.assertEqual(self.cache.get('accel_x').body, b'0.0')
+            self.assertEqual(self.cache.get('accel_z', 'ESP32_A').value, 9.8)
+
+    def test_entries_expire_after_the_ttl(self):
+        self.ecg(71)
+        self.cache.get('ecg')
+        later = mock.patch('sensors.latest.time.monotonic', return_value=10 ** 9)
+        with later, self.assertNumQueries(1):
+            self.cache.get('ecg')
+
+    def test_zero_ttl_never_expires(self):
+        cache = LatestValueCache(ttl=0)
+        self.ecg(71)
+        cache.get('ecg')
+        with mock.patch('sensors.latest.time.monotonic', return_value=10 ** 9), self.assertNumQueries(0):
+            cache.get('ecg')
+
+    def test_least_recently_used_key_is_evicted(self):
+        cache = LatestValueCache(max_size=3)
+        for device_id in ('A', 'B', 'C'):
+            cache.get('ecg', device_id)
+        cache.get('ecg', 'A')
+        cache.get('ecg', 'D')
+        self.assertEqual(len(cache), 3)
+        self.assertEqual([key[1] for key in cache._entries], ['C', 'A', 'D'])
+
+
+class LegacyValueViewTests(SensorTestCase):
+    # bulk_sensor_data's GET branch and the views.*_value functions are not
+    # routed, so they are called directly
+    def get(self, view, **params):
+        return view(RequestFactory().get('/', params))
+
+    def test_single_value_views_read_the_cache(self):
+        device = self.device()
+        latest_values.record(ECGReading(device=device, heart_rate=81.0, ecg_value=0, timestamp=timezone.now()))
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get('/api/ecg/').content, b'81.0')
+            self.assertEqual(self.get(views.ecg_value).content, b'81.0')
+            self.assertEqual(self.get(views.bulk_sensor_data, sensor='ecg').data, '81.0')
+
+    def test_fallbacks_without_data(self):
+        self.assertEqual(self.get(views.accel_x_value).content, b'0.15')
+        self.assertEqual(self.get(views.bulk_sensor_data).data, '75\n98.5\n72')
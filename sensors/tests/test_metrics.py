@@ -0,0 +1,113 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+from django.test import override_settings
+
+from ..metrics import Registry, collect, merge, registry, render, write_snapshot
+from .base import SensorTestCase
+
+
+def exited_pid():
+    process = subprocess.Popen([sys.executable, '-c', 'pass'])
+    process.wait()
+    return process.pid
+
+
+class RegistryTests(SensorTestCase):
+    def test_counters_and_histograms(self):
+        local = Registry()
+        local.inc('http_requests_total', view='health', method='GET', status='200')
+        local.inc('http_requests_total', 2, status='200', method='GET', view='health')
+        local.observe('http_request_db_queries', 3, view='health')
+        local.observe('http_request_db_queries', 500, view='health')
+        text = render(local.snapshot())
+        self.assertIn('# TYPE http_requests_total counter', text)
+        self.assertIn('http_requests_total{method="GET",status="200",view="health"} 3', text)
+        # Buckets are cumulative; the 500 only counts towards +Inf
+        self.assertIn('http_request_db_queries_bucket{view="health",le="5"} 1', text)
+        self.assertIn('http_request_db_queries_bucket{view="health",le="100"} 1', text)
+        self.assertIn('http_request_db_queries_bucket{view="health",le="+Inf"} 2', text)
+        self.assertIn('http_request_db_queries_sum{view="health"} 503', text)
+
+    def test_label_values_are_escaped(self):
+        local = Registry()
+        local.inc('http_requests_total', view='a"b\\c')
+        self.assertIn('{view="a\\"b\\\\c"}', render(local.snapshot()))
+
+    def test_merge_sums_processes(self):
+        first, second = Registry(), Registry()
+        for local in (first, second):
+            local.inc('sensor_readings_saved_total', 5, sensor='ecg')
+            local.observe('sensor_ingest_flush_rows', 20)
+        second.inc('sensor_readings_saved_total', 1, sensor='spo2')
+        merged = merge([first.snapshot(), json.loads(json.dumps(second.snapshot()))])
+        counters = {(name, tuple(map(tuple, labels))): value for name, labels, value in merged['counters']}
+        self.assertEqual(counters[('sensor_readings_saved_total', (('sensor', 'ecg'),))], 10)
+        self.assertEqual(counters[('sensor_readings_saved_total', (('sensor', 'spo2'),))], 1)
+        [(_, _, counts, total, count)] = merged['histograms']
+        self.assertEqual((counts[2], total, count), (2, 40, 2))
+
+
+class MultiprocessCollectTests(SensorTestCase):
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.dir = directory.name
+        override = override_settings(SENSOR_METRICS_DIR=self.dir)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def worker_file(self, pid, value):
+        other = Registry()
+        other.inc('sensor_anomalies_total', value, kind='spo2_low')
+        with open(os.path.join(self.dir, f'{pid}.json'), 'w', encoding='utf-8') as f:
+            json.dump(other.snapshot(), f)
+
+    def total(self, snapshot):
+        return sum(value for name, _, value in snapshot['counters'] if name == 'sensor_anomalies_total')
+
+    def test_collect_sums_every_worker(self):
+        before = self.total(registry.snapshot())
+        self.worker_file(os.getppid(), 2)
+        write_snapshot()
+        self.assertEqual(self.total(collect()), before + 2)
+
+    def test_exited_workers_are_archived(self):
+        before = self.total(registry.snapshot())
+        pid = exited_pid()
+        self.worker_file(pid, 4)
+        self.assertEqual(self.total(collect()), before + 4)
+        self.assertFalse(os.path.exists(os.path.join(self.dir, f'{pid}.json')))
+        # The archived count survives later scrapes
+        self.assertEqual(self.total(collect()), before + 4)
+
+    def test_unreadable_snapshots_are_skipped(self):
+        with open(os.path.join(self.dir, '12345.json'), 'w', encoding='utf-8') as f:
+            f.write('{')
+        with open(os.path.join(self.dir, 'notes.json'), 'w', encoding='utf-8') as f:
+            f.write('{}')
+        self.assertEqual(self.total(collect()), self.total(registry.snapshot()))
+
+
+class MetricsEndpointTests(SensorTestCase):
+    @override_settings(SENSOR_METRICS_TOKEN='', DEBUG=False)
+    def test_hidden_without_a_token(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 404)
+
+    @override_settings(SENSOR_METRICS_TOKEN='', DEBUG=True)
+    def test_open_in_debug_without_a_token(self):
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+
+    @override_settings(SENSOR_METRICS_TOKEN='s3cret', DEBUG=False)
+    def test_token_is_required(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 401)
+        self.assertEqual(self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer wrong').status_code, 401)
+        response = self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer s3cret')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'# TYPE http_requests_total counter', response.content)
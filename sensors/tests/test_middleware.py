@@ -0,0 +1,38 @@
+from django.http import HttpResponse
+from django.test import RequestFactory, override_settings
+
+from ..middleware import QueryCountMiddleware
+from ..models import Device
+from .base import SensorTestCase
+
+
+def two_queries(request):
+    Device.objects.count()  # type: ignore
+    Device.objects.exists()  # type: ignore
+    return HttpResponse('ok')
+
+
+class QueryCountMiddlewareTests(SensorTestCase):
+    def setUp(self):
+        super().setUp()
+        self.request = RequestFactory().get('/')
+
+    @override_settings(SENSOR_QUERY_COUNT_HEADER=True)
+    def test_counts_the_request_statements(self):
+        response = QueryCountMiddleware(two_queries)(self.request)
+        self.assertEqual(response['X-DB-Queries'], '2')
+        self.assertGreaterEqual(float(response['X-DB-Time-ms']), 0)
+        # Each request starts from zero
+        self.assertEqual(QueryCountMiddleware(two_queries)(self.request)['X-DB-Queries'], '2')
+
+    @override_settings(SENSOR_QUERY_COUNT_HEADER=False)
+    def test_disabled_by_default(self):
+        response = QueryCountMiddleware(two_queries)(self.request)
+        self.assertNotIn('X-DB-Queries', response)
+
+    @override_settings(SENSOR_QUERY_COUNT_HEADER=True)
+    def test_installed_for_api_requests(self):
+        self.device()
+        response = self.client.get('/api/health/db/')
+        self.assertIn('X-DB-Queries', response)
+        self.assertGreater(int(response['X-DB-Queries']), 0)
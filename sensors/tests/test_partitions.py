@@ -0,0 +1,105 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+from io import StringIO
+from unittest import skipIf, skipUnless
+
+from django.core.management import call_command
+from django.db import connection
+from django.utils import timezone
+
+from ..counters import recount, table_counts
+from ..models import ECGReading
+from ..partitions import (
+    PartitionError, convert_table, default_partition, drop_expired, ensure_partitions,
+    is_partitioned, list_partitions, partition_name, period_start
+)
+from .base import SensorTestCase
+
+TABLE = ECGReading._meta.db_table
+
+
+class PeriodTests(SensorTestCase):
+    def test_period_start(self):
+        moment = datetime(2024, 5, 16, 13, 30, tzinfo=dt_timezone.utc)  # a Thursday
+        self.assertEqual(period_start(moment, 'day'), datetime(2024, 5, 16, tzinfo=dt_timezone.utc))
+        self.assertEqual(period_start(moment, 'week'), datetime(2024, 5, 13, tzinfo=dt_timezone.utc))
+        self.assertEqual(partition_name(TABLE, period_start(moment, 'week')), f'{TABLE}_p20240513')
+
+
+@skipIf(connection.vendor == 'postgresql', "SQLite and other backends only")
+class UnsupportedBackendTests(SensorTestCase):
+    def test_scheduled_run_skips(self):
+        with self.assertRaises(PartitionError):
+            is_partitioned(TABLE)
+        out = StringIO()
+        call_command('manage_partitions', stdout=out)
+        self.assertIn('Skipping', out.getvalue())
+
+
+@skipUnless(connection.vendor == 'postgresql', "Native partitioning needs PostgreSQL")
+class PostgresPartitionTests(SensorTestCase):
+    # DDL is transactional on PostgreSQL, so each test's conversion is rolled back
+
+    def setUp(self):
+        super().setUp()
+        self.device_row = self.device()
+        self.now = timezone.now()
+
+    def ecg(self, timestamp):
+        return ECGReading.objects.create(  # type: ignore
+            device=self.device_row, heart_rate=70, ecg_value=0, timestamp=timestamp
+        )
+
+    def rows_in(self, table):
+        with connection.cursor() as cursor:
+            cursor.execute(f"SELECT COUNT(*) FROM {connection.ops.quote_name(table)}")
+            return cursor.fetchone()[0]
+
+    def test_convert_keeps_rows_in_the_default_partition(self):
+        old = self.ecg(self.now - timedelta(days=3))
+        legacy = convert_table(ECGReading, 'day', 3)
+        self.assertTrue(is_partitioned(TABLE))
+        self.assertEqual(default_partition(TABLE), legacy)
+        first = period_start(self.now, 'day') + timedelta(days=1)
+        self.assertEqual(sorted(list_partitions(TABLE)), [first + timedelta(days=i) for i in range(3)])
+
+        # Ids continue and new rows are routed to their range partition
+        new = self.ecg(first + timedelta(hours=1))
+        self.assertGreater(new.id, old.id)
+        self.assertEqual(self.rows_in(partition_name(TABLE, first)), 1)
+        self.assertEqual(ECGReading.objects.count(), 2)  # type: ignore
+
+        with self.assertRaises(PartitionError):
+            convert_table(ECGReading, 'day', 3)
+
+    def test_ensure_partitions_moves_rows_out_of_default(self):
+        legacy = convert_table(ECGReading, 'day', 1)
+        # A device clock running ahead: no partition covers it yet
+        ahead = period_start(self.now, 'day') + timedelta(days=3)
+        late = self.ecg(ahead + timedelta(hours=2))
+        self.assertEqual(self.rows_in(legacy), 1)
+
+        created = ensure_partitions(ECGReading, 'day', 4, now=self.now)
+        self.assertIn(partition_name(TABLE, ahead), created)
+        self.assertEqual(self.rows_in(legacy), 0)
+        self.assertEqual(self.rows_in(partition_name(TABLE, ahead)), 1)
+        self.assertEqual(default_partition(TABLE), legacy)
+        self.assertEqual(ECGReading.objects.get().id, late.id)  # type: ignore
+        # Nothing left to create
+        self.assertEqual(ensure_partitions(ECGReading, 'day', 4, now=self.now), [])
+
+    def test_drop_expired_partitions(self):
+        convert_table(ECGReading, 'day', 2)
+        first = min(list_partitions(TABLE))
+        self.ecg(first + timedelta(hours=1))
+        self.ecg(first + timedelta(days=1, hours=1))
+        recount(['ecg'])
+
+        # Keeping 8 days: only the first partition ends before the cutoff
+        later = first + timedelta(days=9, hours=1)
+        self.assertEqual(drop_expired('ecg', 'day', 8, now=later, dry_run=True), [partition_name(TABLE, first)])
+        self.assertEqual(len(list_partitions(TABLE)), 2)
+
+        self.assertEqual(drop_expired('ecg', 'day', 8, now=later), [partition_name(TABLE, first)])
+        self.assertEqual(sorted(list_partitions(TABLE)), [first + timedelta(days=1)])
+        self.assertEqual(table_counts()['ecg'], 1)
+        self.assertEqual(ECGReading.objects.count(), 1)  # type: ignore
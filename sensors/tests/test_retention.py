@@ -0,0 +1,107 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import CommandError, call_command
+from django.test import override_settings
+from django.utils import timezone
+
+from ..counters import recount, table_counts
+from ..models import ECGReading, ReadingRollup
+from ..retention import parse_overrides, prune, retention_days
+from .base import SensorTestCase
+
+
+class PruneTests(SensorTestCase):
+    def setUp(self):
+        super().setUp()
+        self.device_row = self.device()
+        self.now = timezone.now()
+
+    def ecg(self, *ages):
+        readings = ECGReading.objects.bulk_create([  # type: ignore
+            ECGReading(device=self.device_row, heart_rate=70, ecg_value=0,
+                       timestamp=self.now - timedelta(days=age))
+            for age in ages
+        ])
+        recount(['ecg'])
+        return readings
+
+    def test_deletes_expired_rows_in_chunks(self):
+        fresh = self.ecg(10, 9, 8, 1, 0)[3:]
+        result = prune('ecg', 7, chunk_size=2, now=self.now)
+        self.assertEqual((result.deleted, result.chunks), (3, 2))
+        self.assertEqual(set(ECGReading.objects.values_list('id', flat=True)),  # type: ignore
+                         {reading.id for reading in fresh})
+        self.assertEqual(table_counts()['ecg'], 2)
+
+    def test_each_chunk_is_one_delete(self):
+        self.ecg(10, 9, 8)
+        # The id bounds, then per chunk a DELETE and the counter upsert
+        # (wrapped in a savepoint inside the test transaction)
+        with self.assertNumQueries(1 + 4 * 3):
+            prune('ecg', 7, chunk_size=1, now=self.now)
+
+    def test_late_rows_behind_fresh_ids_are_reached(self):
+        # A device clock that lags: the newest id holds the oldest reading
+        self.ecg(0, 1, 30)
+        result = prune('ecg', 7, chunk_size=1, now=self.now)
+        self.assertEqual(result.deleted, 1)
+        self.assertEqual(ECGReading.objects.count(), 2)  # type: ignore
+
+    def test_dry_run_only_counts(self):
+        self.ecg(10, 0)
+        with self.assertNumQueries(1):
+            result = prune('ecg', 7, dry_run=True, now=self.now)
+        self.assertEqual((result.deleted, result.chunks), (1, 0))
+        self.assertEqual(table_counts()['ecg'], 2)
+
+    def test_nothing_expired(self):
+        self.ecg(0)
+        self.assertEqual(prune('ecg', 7, now=self.now).chunks, 0)
+
+    def test_rollup_policies_only_touch_their_period(self):
+        old = self.now - timedelta(days=60)
+        for period in (ReadingRollup.PERIOD_MINUTE, ReadingRollup.PERIOD_HOUR):
+            ReadingRollup.objects.create(  # type: ignore
+                device=self.device_row, metric='heart_rate', period=period, bucket=old,
+                count=1, min_value=70, max_value=70, sum_value=70
+            )
+        self.assertEqual(prune('rollup_minute', 30, now=self.now).deleted, 1)
+        self.assertEqual(list(ReadingRollup.objects.values_list('period', flat=True)),  # type: ignore
+                         [ReadingRollup.PERIOD_HOUR])
+
+
+class RetentionSettingsTests(SensorTestCase):
+    def test_overrides(self):
+        self.assertEqual(parse_overrides(' ecg=3, rollup_hour=0 '), {'ecg': 3, 'rollup_hour': 0})
+        for value in ('bogus=3', 'ecg=-1', 'ecg'):
+            with self.assertRaises(ValueError):
+                parse_overrides(value)
+
+    @override_settings(SENSOR_RETENTION_DAYS='ecg=3')
+    def test_settings_override_defaults(self):
+        days = retention_days()
+        self.assertEqual((days['ecg'], days['rollup_hour']), (3, 365))
+
+
+class PruneCommandTests(SensorTestCase):
+    def run_command(self, *args):
+        out = StringIO()
+        call_command('prune_readings', *args, stdout=out)
+        return out.getvalue()
+
+    def test_reports_per_table(self):
+        device = self.device()
+        ECGReading.objects.create(device=device, heart_rate=70, ecg_value=0,  # type: ignore
+                                  timestamp=timezone.now() - timedelta(days=10))
+        output = self.run_command('--only', 'ecg', '--only', 'anomaly', '--days', 'anomaly=0')
+        self.assertIn('ecg: deleted 1 rows', output)
+        self.assertIn('anomaly: kept forever', output)
+        self.assertIn('Deleted 1 rows', output)
+        self.assertFalse(ECGReading.objects.exists())  # type: ignore
+
+    def test_bad_arguments(self):
+        with self.assertRaises(CommandError):
+            self.run_command('--chunk-size', '0')
+        with self.assertRaises(CommandError):
+            self.run_command('--days', 'bogus=1')
@@ -0,0 +1,71 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+from io import StringIO
+
+from django.core.management import call_command
+
+from ..ingest import save_readings
+from ..models import ECGReading, PulseOximeterReading, ReadingRollup
+from ..rollups import apply_rollups, bucket_start, merge_partials, rollup_partials
+from .base import SensorTestCase
+
+HOUR = datetime(2025, 1, 1, 10, tzinfo=dt_timezone.utc)
+
+
+class RollupTests(SensorTestCase):
+    def setUp(self):
+        super().setUp()
+        self.device_row = self.device()
+
+    def ecg(self, heart_rate, seconds):
+        return ECGReading(device=self.device_row, heart_rate=heart_rate, ecg_value=0,
+                          timestamp=HOUR + timedelta(seconds=seconds))
+
+    def rollup(self, metric='ecg_heart_rate', period=ReadingRollup.PERIOD_MINUTE, bucket=HOUR):
+        return ReadingRollup.objects.get(device=self.device_row, metric=metric,  # type: ignore
+                                         period=period, bucket=bucket)
+
+    def test_bucket_start(self):
+        stamp = datetime(2025, 1, 1, 10, 37, 12, 500, tzinfo=dt_timezone(timedelta(hours=2)))
+        self.assertEqual(bucket_start(stamp, ReadingRollup.PERIOD_MINUTE),
+                         datetime(2025, 1, 1, 8, 37, tzinfo=dt_timezone.utc))
+        self.assertEqual(bucket_start(stamp, ReadingRollup.PERIOD_HOUR),
+                         datetime(2025, 1, 1, 8, tzinfo=dt_timezone.utc))
+
+    def test_partials_fold_a_batch_and_skip_absent_sensors(self):
+        partials = rollup_partials([self.ecg(60, 1), self.ecg(80, 2), self.ecg(0, 3), self.ecg(70, 61)])
+        key = (self.device_row.pk, 'ecg_heart_rate', ReadingRollup.PERIOD_MINUTE, HOUR)
+        self.assertEqual(partials[key], [2, 60, 80, 140, 60 * 60 + 80 * 80])
+        hour_key = (self.device_row.pk, 'ecg_heart_rate', ReadingRollup.PERIOD_HOUR, HOUR)
+        self.assertEqual(partials[hour_key][0], 3)
+
+    def test_one_reading_feeds_every_metric_of_its_model(self):
+        reading = PulseOximeterReading(device=self.device_row, spo2=97, heart_rate=71, timestamp=HOUR)
+        metrics = {key[1] for key in rollup_partials([reading])}
+        self.assertEqual(metrics, {'spo2', 'pulse_heart_rate'})
+
+    def test_upserts_add_to_existing_buckets(self):
+        apply_rollups([self.ecg(60, 1), self.ecg(80, 2)])
+        apply_rollups([self.ecg(50, 3)])
+        rollup = self.rollup()
+        self.assertEqual((rollup.count, rollup.min_value, rollup.max_value), (3, 50, 80))
+        self.assertAlmostEqual(rollup.mean, 190 / 3)
+        self.assertEqual(self.rollup(period=ReadingRollup.PERIOD_HOUR).count, 3)
+
+    def test_replace_overwrites_a_bucket(self):
+        apply_rollups([self.ecg(60, 1), self.ecg(80, 2)])
+        merge_partials(rollup_partials([self.ecg(90, 1)]), replace=True)
+        rollup = self.rollup()
+        self.assertEqual((rollup.count, rollup.min_value, rollup.sum_value), (1, 90, 90))
+
+    def test_ingest_maintains_rollups(self):
+        save_readings([self.ecg(60, 1), self.ecg(70, 2)])
+        self.assertEqual(self.rollup().count, 2)
+
+    def test_backfill_rebuilds_from_raw_rows(self):
+        ECGReading.objects.bulk_create([self.ecg(60, 1), self.ecg(80, 65)])  # type: ignore
+        apply_rollups([self.ecg(999, 1)])  # a stale bucket the backfill must overwrite
+        call_command('backfill_rollups', since='2025-01-01T10:00:00Z', until='2025-01-01T11:00:00Z',
+                     stdout=StringIO())
+        self.assertEqual((self.rollup().count, self.rollup().max_value), (1, 60))
+        hour = self.rollup(period=ReadingRollup.PERIOD_HOUR)
+        self.assertEqual((hour.count, hour.sum_value), (2, 140))
@@ -0,0 +1,56 @@
+from datetime import timedelta
+
+from django.utils import timezone
+
+from ..models import DeviceSnapshot, ECGReading
+from ..ingest import save_readings
+from ..snapshots import get_snapshot, update_snapshots
+from .base import SensorTestCase
+
+
+class SnapshotTests(SensorTestCase):
+    def reading(self, device, stamp, heart_rate):
+        return ECGReading(device=device, timestamp=stamp, heart_rate=heart_rate, ecg_value=heart_rate)
+
+    def test_newer_reading_replaces_the_snapshot(self):
+        device = self.device()
+        now = timezone.now()
+        update_snapshots([self.reading(device, now - timedelta(seconds=5), 60)])
+        update_snapshots([self.reading(device, now, 80)])
+        snapshot = DeviceSnapshot.objects.get(device=device)  # type: ignore
+        self.assertEqual((snapshot.ecg_heart_rate, snapshot.ecg_at), (80, now))
+
+    def test_late_reading_never_moves_the_snapshot_backwards(self):
+        device = self.device()
+        now = timezone.now()
+        update_snapshots([self.reading(device, now, 80)])
+        update_snapshots([self.reading(device, now - timedelta(seconds=5), 60)])
+        snapshot = DeviceSnapshot.objects.get(device=device)  # type: ignore
+        self.assertEqual((snapshot.ecg_heart_rate, snapshot.ecg_at), (80, now))
+
+    def test_newest_reading_of_a_batch_wins(self):
+        device = self.device()
+        now = timezone.now()
+        update_snapshots([self.reading(device, now, 80), self.reading(device, now - timedelta(seconds=5), 60)])
+        snapshot = DeviceSnapshot.objects.get(device=device)  # type: ignore
+        self.assertEqual(snapshot.ecg_heart_rate, 80)
+
+    def test_other_sensors_are_left_alone(self):
+        device = self.device()
+        now = timezone.now()
+        update_snapshots([self.reading(device, now, 80)])
+        snapshot = DeviceSnapshot.objects.get(device=device)  # type: ignore
+        self.assertIsNone(snapshot.spo2)
+        self.assertIsNone(snapshot.pulse_at)
+
+    def test_ingest_updates_the_snapshot(self):
+        device = self.device()
+        save_readings([self.reading(device, timezone.now(), 72)])
+        with self.assertNumQueries(1):
+            found, snapshot = get_snapshot('ESP32_TEST')
+        self.assertEqual((found, snapshot.ecg_heart_rate), (device, 72))
+
+    def test_device_without_readings(self):
+        device = self.device()
+        self.assertEqual(get_snapshot('ESP32_TEST'), (device, None))
+        self.assertEqual(get_snapshot('missing'), (None, None))
@@ -0,0 +1,92 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+import numpy as np
+from django.core.cache import cache
+from django.test import override_settings
+
+from ..models import ECGReading, PulseOximeterReading
+from ..vitals import cache_window, desaturations, hrv, load_series, summarize, vitals_stats
+from .base import SensorTestCase
+
+T0 = datetime(2024, 5, 16, 12, 0, tzinfo=dt_timezone.utc)
+
+
+class VitalsMathTests(SensorTestCase):
+    def test_hrv_from_heart_rate(self):
+        # 60 and 75 bpm are RR intervals of 1000 and 800 ms; zero readings are skipped
+        stats = hrv(np.array([60.0, 0.0, 75.0, 60.0]))
+        self.assertAlmostEqual(stats['sdnn_ms'], np.std([1000, 800, 1000], ddof=1))
+        self.assertAlmostEqual(stats['rmssd_ms'], 200.0)
+        self.assertEqual(hrv(np.array([60.0])), {'sdnn_ms': None, 'rmssd_ms': None})
+
+    def test_desaturation_episodes(self):
+        times = np.arange(8, dtype=np.float64) * 10
+        spo2 = np.array([88.0, 95, 89, 87, 96, 97, 85, 99])
+        stats = desaturations(times, spo2)
+        self.assertEqual(stats['episodes'], 3)
+        self.assertEqual(stats['samples_below'], 4)
+        self.assertEqual(stats['seconds_below'], 40.0)
+        self.assertEqual(stats['nadir'], 85.0)
+
+    def test_no_samples(self):
+        empty = np.array([], dtype=np.float64)
+        self.assertEqual(summarize(empty), {'count': 0})
+        self.assertEqual(desaturations(empty, empty)['episodes'], 0)
+        self.assertIsNone(desaturations(empty, empty)['nadir'])
+
+    def test_summary(self):
+        stats = summarize(np.array([1.0, 2.0, 3.0, 4.0, 5.0]))
+        self.assertEqual((stats['count'], stats['mean'], stats['min'], stats['max']), (5, 3.0, 1.0, 5.0))
+        self.assertEqual(stats['percentiles']['p50'], 3.0)
+
+
+@override_settings(SENSOR_VITALS_CACHE_SECONDS=60)
+class VitalsQueryTests(SensorTestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.device_row = self.device()
+
+    def spo2(self, offset, value):
+        PulseOximeterReading.objects.create(  # type: ignore
+            device=self.device_row, spo2=value, heart_rate=60, signal_strength=90,
+            timestamp=T0 + timedelta(seconds=offset)
+        )
+
+    def test_window_is_rounded_down_to_the_cache_period(self):
+        start, end = cache_window(T0 + timedelta(seconds=59, microseconds=999999), T0 + timedelta(seconds=61))
+        self.assertEqual((start, end), (T0, T0 + timedelta(seconds=60)))
+
+    def test_load_series_skips_zero_heart_rates(self):
+        for offset, heart_rate in ((0, 60.0), (1, 0.0), (2, 75.0)):
+            ECGReading.objects.create(device=self.device_row, heart_rate=heart_rate, ecg_value=0,  # type: ignore
+                                      timestamp=T0 + timedelta(seconds=offset))
+        times, values = load_series('ESP32_TEST', 'ecg_heart_rate', T0, T0 + timedelta(minutes=1))
+        self.assertEqual(values.tolist(), [60.0, 75.0])
+        self.assertEqual((times - T0.timestamp()).tolist(), [0.0, 2.0])
+
+    def test_polls_within_a_period_share_the_cached_result(self):
+        self.spo2(10, 97.0)
+        self.spo2(20, 88.0)
+        self.spo2(30, 96.0)
+        with self.assertNumQueries(1):
+            stats = vitals_stats('ESP32_TEST', 'spo2', T0, T0 + timedelta(seconds=65))
+        self.assertEqual(stats['desaturation']['episodes'], 1)
+        self.assertEqual(stats['desaturation']['seconds_below'], 10.0)
+        with self.assertNumQueries(0):
+            again = vitals_stats('ESP32_TEST', 'spo2', T0 + timedelta(seconds=3), T0 + timedelta(seconds=119))
+        self.assertEqual(again, stats)
+
+    def test_endpoint_reports_the_rounded_window(self):
+        self.spo2(10, 97.0)
+        end = (T0 + timedelta(seconds=90)).isoformat()
+        response = self.client.get('/api/vitals/ESP32_TEST/', {'metric': 'spo2', 'window': '120', 'end': end})
+        data = response.json()
+        self.assertEqual((data['start'], data['end']), ((T0 - timedelta(minutes=1)).isoformat(),
+                                                         (T0 + timedelta(minutes=1)).isoformat()))
+        self.assertEqual(data['count'], 1)
+
+    def test_endpoint_rejects_bad_params(self):
+        for params in ({'metric': 'bogus'}, {'window': '0'}, {'window': str(8 * 86400)}, {'end': 'soon'}):
+            self.assertEqual(self.client.get('/api/vitals/ESP32_TEST/', params).status_code, 400)
@@ -0,0 +1,97 @@
+import json
+import math
+from array import array
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.test import override_settings
+
+from ..models import WaveformChunk
+from ..waveform import WaveformError, create_chunk, pack_samples, read_waveform, unpack_samples
+from .base import SensorTestCase
+
+ORIGIN = datetime(2025, 1, 1, tzinfo=dt_timezone.utc)
+RATE = 10.0
+
+
+def at(seconds):
+    return ORIGIN + timedelta(seconds=seconds)
+
+
+class WaveformTests(SensorTestCase):
+    def setUp(self):
+        super().setUp()
+        self.device_row = self.device()
+
+    def chunk(self, start_seconds, samples, rate=RATE, **kwargs):
+        dtype = kwargs.get('dtype', WaveformChunk.DTYPE_FLOAT32)
+        return create_chunk(self.device_row, at(start_seconds), rate, pack_samples(samples, dtype), **kwargs)
+
+    def read(self, start, end):
+        return read_waveform(self.device_row, 'ecg', at(start), at(end))
+
+    def test_pack_round_trip(self):
+        self.assertEqual(list(unpack_samples(pack_samples([1.5, -2.0]), 'f4')), [1.5, -2.0])
+        scaled = unpack_samples(pack_samples([100, -200], 'i2'), 'i2', scale=0.01)
+        self.assertEqual([round(v, 4) for v in scaled], [1.0, -2.0])
+        with self.assertRaises(WaveformError):
+            pack_samples([70000], 'i2')
+
+    def test_chunk_records_its_time_span(self):
+        chunk = self.chunk(0, range(25))
+        self.assertEqual((chunk.sample_count, chunk.end_time), (25, at(2.5)))
+
+    def test_slice_within_one_chunk(self):
+        self.chunk(0, range(20))
+        first, rate, values = self.read(0.5, 1.0)
+        self.assertEqual((first, rate, list(values)), (at(0.5), RATE, [5, 6, 7, 8, 9]))
+
+    def test_slice_starting_between_samples_aligns_to_the_next_one(self):
+        self.chunk(0, range(20))
+        first, _, values = self.read(0.55, 0.8)
+        self.assertEqual((first, list(values)), (at(0.6), [6, 7]))
+
+    def test_gap_between_chunks_is_nan(self):
+        self.chunk(0, [1, 2])
+        self.chunk(0.4, [5, 6])
+        _, _, values = self.read(0, 1)
+        self.assertEqual(values[:2].tolist(), [1, 2])
+        self.assertTrue(all(math.isnan(v) for v in values[2:4]))
+        self.assertEqual(values[4:].tolist(), [5, 6])
+
+    def test_later_chunk_wins_an_overlap(self):
+        self.chunk(0, [1, 2, 3, 4])
+        self.chunk(0.2, [30, 40])
+        _, _, values = self.read(0, 1)
+        self.assertEqual(list(values), [1, 2, 30, 40])
+
+    def test_range_without_chunks(self):
+        self.chunk(0, [1, 2])
+        self.assertIsNone(self.read(5, 6))
+
+    def test_mixed_sample_rates_are_refused(self):
+        self.chunk(0, [1, 2])
+        self.chunk(1, [1, 2], rate=20.0)
+        with self.assertRaises(WaveformError):
+            self.read(0, 2)
+
+    @override_settings(SENSOR_WAVEFORM_MAX_SAMPLES=5)
+    def test_sample_limit(self):
+        self.chunk(0, range(20))
+        with self.assertRaises(WaveformError):
+            self.read(0, 2)
+
+    def test_endpoint_round_trip(self):
+        response = self.client.post('/api/waveform/ESP32_TEST/', json.dumps({
+            'start_time': ORIGIN.isoformat(), 'sample_rate': RATE, 'samples': [0.5, 1.5, 2.5],
+        }), content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+
+        response = self.client.get('/api/waveform/ESP32_TEST/', {'start': at(0).isoformat(), 'end': at(1).isoformat()})
+        self.assertEqual(response['X-Sample-Count'], '3')
+        values = array('f')
+        values.frombytes(response.content)
+        self.assertEqual(list(values), [0.5, 1.5, 2.5])
+
+        response = self.client.post('/api/waveform/ESP32_TEST/?sample_rate=10', b'\x00\x00\x80',
+                                    content_type='application/octet-stream')
+        self.assertEqual(response.status_code, 400)
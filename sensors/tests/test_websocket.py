@@ -0,0 +1,101 @@
+import asyncio
+import json
+from unittest import mock
+
+from ..events import Event, event_hub
+from ..websocket import Broadcaster, Subscriber, readings_socket
+from .base import SensorTestCase
+
+
+def reading(seq, device='ESP32_A', sensor='ecg', value=0):
+    return Event(seq, device, sensor, json.dumps({'device': device, 'sensor': sensor, 'value': value}))
+
+
+class SubscriberTests(SensorTestCase):
+    def test_filters(self):
+        subscriber = Subscriber(None, devices={'ESP32_A'}, sensors={'ecg'})
+        self.assertTrue(subscriber.wants(reading(1)))
+        self.assertFalse(subscriber.wants(reading(2, device='ESP32_B')))
+        self.assertFalse(subscriber.wants(reading(3, sensor='accelerometer')))
+        self.assertTrue(Subscriber(None).wants(reading(4, device='ESP32_B')))
+
+    def test_slow_client_gets_the_newest_value_per_key(self):
+        sent = []
+
+        async def send(message):
+            sent.append(json.loads(message['text']))
+
+        async def run():
+            subscriber = Subscriber(send)
+            for seq, value in enumerate((1, 2, 3), start=1):
+                subscriber.offer(reading(seq, value=value))
+            subscriber.offer(reading(4, sensor='accelerometer', value=9))
+            drain = asyncio.create_task(subscriber.drain())
+            await asyncio.sleep(0)
+            drain.cancel()
+            return subscriber
+
+        subscriber = asyncio.run(run())
+        self.assertEqual(subscriber.coalesced, 2)
+        self.assertEqual([(m['sensor'], m['value']) for m in sent], [('ecg', 3), ('accelerometer', 9)])
+
+
+@mock.patch('sensors.websocket.PUMP_TIMEOUT', 0.05)
+class ReadingsSocketTests(SensorTestCase):
+    def setUp(self):
+        super().setUp()
+        patcher = mock.patch('sensors.websocket.broadcaster', Broadcaster())
+        self.broadcaster = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def converse(self, query, client):
+        """Run readings_socket with ``client(inbox, outbox)`` playing the browser"""
+        async def run():
+            inbox, outbox = asyncio.Queue(), asyncio.Queue()
+            await inbox.put({'type': 'websocket.connect'})
+            server = asyncio.create_task(readings_socket(
+                {'type': 'websocket', 'query_string': query}, inbox.get, outbox.put
+            ))
+            try:
+                return await asyncio.wait_for(client(inbox, outbox), 5)
+            finally:
+                await inbox.put({'type': 'websocket.disconnect'})
+                await asyncio.wait_for(server, 5)
+        return asyncio.run(run())
+
+    def test_unknown_sensor_is_refused(self):
+        async def client(inbox, outbox):
+            return await outbox.get()
+        self.assertEqual(self.converse(b'sensor=bogus', client), {'type': 'websocket.close', 'code': 4400})
+
+    def test_matching_readings_are_pushed(self):
+        async def client(inbox, outbox):
+            accepted = await outbox.get()
+            while not self.broadcaster.subscribers:
+                await asyncio.sleep(0.01)
+            await asyncio.sleep(0.01)
+            event_hub.publish([
+                {'device': 'ESP32_B', 'sensor': 'ecg', 'values': {}},
+                {'device': 'ESP32_A', 'sensor': 'ecg', 'values': {'heart_rate': 70}},
+            ])
+            return accepted, await outbox.get()
+
+        accepted, frame = self.converse(b'device=ESP32_A', client)
+        self.assertEqual(accepted, {'type': 'websocket.accept'})
+        self.assertEqual(json.loads(frame['text'])['values'], {'heart_rate': 70})
+
+    def test_subscription_can_be_changed(self):
+        async def client(inbox, outbox):
+            await outbox.get()
+            await inbox.put({'type': 'websocket.receive', 'text': json.dumps({'sensors': ['spo2']})})
+            await inbox.put({'type': 'websocket.receive', 'text': json.dumps({'sensors': ['pulse_oximeter']})})
+            while True:
+                # 'spo2' is not a sensor name, so only the second update applies
+                subscriber = next(iter(self.broadcaster.subscribers), None)
+                if subscriber and subscriber.sensors == {'pulse_oximeter'}:
+                    return subscriber.devices, subscriber.sensors
+                await asyncio.sleep(0.01)
+
+        self.assertEqual(self.converse(b'device=ESP32_A', client), (set(), {'pulse_oximeter'}))
+        # Disconnecting unsubscribes
+        self.assertFalse(self.broadcaster.subscribers)
@@ -7,99 +7,54 @@ from django.http import HttpResponse, JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 import json
-from django.utils import timezone
+from django.db import transaction
+from . import views
 
-# REAL-TIME endpoints that fetch from database with DEBUG INFO
-def ecg_value(request):
-    """Returns REAL-TIME ECG data from database"""
+# REAL-TIME endpoints served from the latest-value cache with DEBUG INFO
+def latest_value_response(request, sensor):
+    """Returns the latest value of one sensor, optionally for ?device=<device_id>"""
+    from .latest import latest_values, SENSORS
+    spec = SENSORS[sensor]
+    debug = request.GET.get('debug')
     try:
-        from .models import ECGReading
-        # Try to get latest reading
-        latest = ECGReading.objects.latest('timestamp')
-        value = latest.heart_rate if latest.heart_rate else 75
-        # Add debug info if needed
-        if request.GET.get('debug'):
-            return HttpResponse(f"Latest ECG: {value} from {latest.timestamp} (Device: {latest.device.device_id})", content_type='text/plain')
-        return HttpResponse(str(value), content_type='text/plain')
-    except ECGReading.DoesNotExist:
-        # No data in database yet
-        if request.GET.get('debug'):
-            return HttpResponse("No ECG data in database - returning fallback 75", content_type='text/plain')
-        return HttpResponse("75", content_type='text/plain')
+        # Served from memory; only a cold cache entry queries the database
+        entry = latest_values.get(sensor, request.GET.get('device'))
     except Exception as e:
         # Other error
-        if request.GET.get('debug'):
-            return HttpResponse(f"Error: {str(e)} - returning fallback 75", content_type='text/plain')
-        return HttpResponse("75", content_type='text/plain')
+        if debug:
+            return HttpResponse(f"Error: {str(e)} - returning fallback {spec.fallback}", content_type='text/plain')
+        return HttpResponse(spec.fallback, content_type='text/plain')
+    
+    if debug:
+        if not entry.has_data:
+            # No data in database yet
+            return HttpResponse(f"No {spec.label} data in database - returning fallback {spec.fallback}", content_type='text/plain')
+        return HttpResponse(f"Latest {spec.label}: {entry.body.decode()} from {entry.timestamp} (Device: {entry.device_id})", content_type='text/plain')
+    return HttpResponse(entry.body, content_type='text/plain')
+
+def ecg_value(request):
+    """Returns REAL-TIME ECG data"""
+    return latest_value_response(request, 'ecg')
 
 def spo2_value(request):
-    """Returns REAL-TIME SpO2 data from database"""
-    try:
-        from .models import PulseOximeterReading
-        latest = PulseOximeterReading.objects.latest('timestamp')
-        value = latest.spo2 if latest.spo2 else 98.5
-        if request.GET.get('debug'):
-            return HttpResponse(f"Latest SpO2: {value} from {latest.timestamp} (Device: {latest.device.device_id})", content_type='text/plain')
-        return HttpResponse(str(value), content_type='text/plain')
-    except PulseOximeterReading.DoesNotExist:
-        if request.GET.get('debug'):
-            return HttpResponse("No SpO2 data in database - returning fallback 98.5", content_type='text/plain')
-        return HttpResponse("98.5", content_type='text/plain')
-    except Exception as e:
-        if request.GET.get('debug'):
-            return HttpResponse(f"Error: {str(e)} - returning fallback 98.5", content_type='text/plain')
-        return HttpResponse("98.5", content_type='text/plain')
+    """Returns REAL-TIME SpO2 data"""
+    return latest_value_response(request, 'spo2')
 
 def max30102_value(request):
-    """Returns REAL-TIME MAX30102 heart rate data from database"""
-    try:
-        from .models import MAX30102Reading
-        latest = MAX30102Reading.objects.latest('timestamp')
-        value = latest.heart_rate if latest.heart_rate else 72
-        if request.GET.get('debug'):
-            return HttpResponse(f"Latest MAX30102: {value} from {latest.timestamp} (Device: {latest.device.device_id})", content_type='text/plain')
-        return HttpResponse(str(value), content_type='text/plain')
-    except MAX30102Reading.DoesNotExist:
-        if request.GET.get('debug'):
-            return HttpResponse("No MAX30102 data in database - returning fallback 72", content_type='text/plain')
-        return HttpResponse("72", content_type='text/plain')
-    except Exception as e:
-        if request.GET.get('debug'):
-            return HttpResponse(f"Error: {str(e)} - returning fallback 72", content_type='text/plain')
-        return HttpResponse("72", content_type='text/plain')
+    """Returns REAL-TIME MAX30102 heart rate data"""
+    return latest_value_response(request, 'max30102')
 
 def accel_x_value(request):
-    """Returns REAL-TIME accelerometer X data from database"""
-    try:
-        from .models import AccelerometerReading
-        latest = AccelerometerReading.objects.latest('timestamp')
-        value = latest.x_axis if latest.x_axis is not None else 0.15
-        return HttpResponse(str(value), content_type='text/plain')
-    except:
-        # Fallback when no device connected yet
-        return HttpResponse("0.15", content_type='text/plain')
+    """Returns REAL-TIME accelerometer X data"""
+    return latest_value_response(request, 'accel_x')
 
 def accel_y_value(request):
-    """Returns REAL-TIME accelerometer Y data from database"""
-    try:
-        from .models import AccelerometerReading
-        latest = AccelerometerReading.objects.latest('timestamp')
-        value = latest.y_axis if latest.y_axis is not None else -0.08
-        return HttpResponse(str(value), content_type='text/plain')
-    except:
-        # Fallback when no device connected yet
-        return HttpResponse("-0.08", content_type='text/plain')
+    """Returns REAL-TIME accelerometer Y data"""
+    return latest_value_response(request, 'accel_y')
 
 def accel_z_value(request):
-    """Returns REAL-TIME accelerometer Z data from database"""
-    try:
-        from .models import AccelerometerReading
-        latest = AccelerometerReading.objects.latest('timestamp')
-        value = latest.z_axis if latest.z_axis is not None else 9.81
-        return HttpResponse(str(value), content_type='text/plain')
-    except:
-        # Fallback when no device connected yet
-        return HttpResponse("9.81", content_type='text/plain')
+    """Returns REAL-TIME accelerometer Z data"""
+    return latest_value_response(request, 'accel_z')
 
 def health_status(request):
     return HttpResponse('{"status":"healthy","institution":"ready"}', content_type='application/json')
@@ -114,6 +69,12 @@ def test_post_endpoint(request):
     else:
         return post_sensor_data(request)
 
+def busy_response():
+    """503 for a full ingest buffer; the device retries the same payload later"""
+    response = JsonResponse({'status': 'error', 'message': 'Ingest buffer full, retry later'}, status=503)
+    response['Retry-After'] = '1'
+    return response
+
 @csrf_exempt
 def post_sensor_data(request):
     """Endpoint for ESP32 to POST sensor data"""
@@ -126,14 +87,22 @@ def post_sensor_data(request):
         
         # Import models here to avoid import issues
         try:
-            from .models import Device, ECGReading, PulseOximeterReading, MAX30102Reading, AccelerometerReading
+            from .dedupe import claim_sequences, parse_sequence
+            from .devices import device_registry
+            from .ingest import BufferFull, readings_from_payload, save_readings, ingest_buffer, buffering_enabled
         except ImportError as e:
             return JsonResponse({'status': 'error', 'message': f'Model import error: {str(e)}'}, status=500)
         
-        # Get or create device
+        # Optional per-device sequence number; retried posts repeat it
+        try:
+            sequence = parse_sequence(data.get('sequence'))
+        except ValueError as e:
+            return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
+        
+        # Resolve device from the registry cache; last_seen is written in batches
         device_id_str = data.get('device_id', 'ESP32_IOT_SENSORS')
-        device, created = Device.objects.get_or_create(
-            device_id=device_id_str,
+        device, created = device_registry.resolve(
+            device_id_str,
             defaults={
                 'name': f'ESP32 Device {device_id_str}',
                 'device_type': 'ESP32',
@@ -141,66 +110,39 @@ def post_sensor_data(request):
             }
         )
         
-        # Update last_seen
-        device.last_seen = timezone.now()
-        device.save()
+        # Validate sensor readings, then save or queue them
+        readings = readings_from_payload(device, data)
+        saved_data = [label for label, _ in readings]
+        instances = [instance for _, instance in readings]
         
-        # Save sensor readings
-        saved_data = []
-        
-        # Create ECG reading
-        if 'ecg_heart_rate' in data and data['ecg_heart_rate']:
+        if buffering_enabled():
+            # The sequence is claimed by the flush that writes the readings
             try:
-                ECGReading.objects.create(
-                    device=device,
-                    heart_rate=float(data['ecg_heart_rate']),
-                    ecg_value=float(data['ecg_heart_rate']),  # Use same value for now
-                )
-                saved_data.append('ECG')
-            except Exception as e:
-                pass  # Continue with other sensors
+                ingest_buffer.add(instances, (device, data.get('boot_id'), sequence))
+            except BufferFull:
+                return busy_response()
+            return JsonResponse({
+                'status': 'success',
+                'message': 'Sensor data accepted for buffered write',
+                'device_created': created,
+                'accepted': saved_data,
+                'accepted_count': len(instances),
+                'received_fields': list(data.keys())
+            })
         
-        # Create SpO2 reading  
-        if 'spo2' in data and data['spo2']:
-            try:
-                PulseOximeterReading.objects.create(
-                    device=device,
-                    spo2=float(data['spo2']),
-                    heart_rate=float(data.get('pulse_heart_rate', data.get('ecg_heart_rate', 70))),
-                    signal_strength=90,  # Default signal strength
-                )
-                saved_data.append('SpO2')
-            except Exception as e:
-                pass  # Continue with other sensors
-        
-        # Create MAX30102 reading
-        if 'max30102_heart_rate' in data and data['max30102_heart_rate']:
-            try:
-                MAX30102Reading.objects.create(
-                    device=device,
-                    heart_rate=float(data['max30102_heart_rate']),
-                    red_value=1000,  # Default values
-                    ir_value=1000,
-                )
-                saved_data.append('MAX30102')
-            except Exception as e:
-                pass  # Continue with other sensors
-        
-        # Create Accelerometer reading
-        if all(key in data for key in ['x_axis', 'y_axis', 'z_axis']):
-            try:
-                x, y, z = float(data['x_axis']), float(data['y_axis']), float(data['z_axis'])
-                magnitude = (x**2 + y**2 + z**2)**0.5
-                AccelerometerReading.objects.create(
-                    device=device,
-                    x_axis=x,
-                    y_axis=y,
-                    z_axis=z,
-                    magnitude=magnitude
-                )
-                saved_data.append('Accelerometer')
-            except Exception as e:
-                pass  # Continue
+        with transaction.atomic():
+            # The claim commits or rolls back together with the readings
+            if sequence is not None and not claim_sequences(device, [sequence], data.get('boot_id')):
+                return JsonResponse({
+                    'status': 'success',
+                    'message': 'Duplicate sequence, already saved',
+                    'duplicate': True,
+                    'sequence': sequence,
+                    'saved': []
+                })
+            
+            if instances:
+                save_readings(instances)
         
         return JsonResponse({
             'status': 'success',
@@ -215,9 +157,80 @@ def post_sensor_data(request):
     except Exception as e:
         return JsonResponse({'status': 'error', 'message': f'Server error: {str(e)}'}, status=500)
 
+@csrf_exempt
+def post_sensor_data_binary(request):
+    """Endpoint for ESP32 firmware posting the compact binary layout in sensors/binary.py"""
+    if request.method != 'POST':
+        return JsonResponse({'status': 'error', 'message': 'Only POST method allowed'}, status=405)
+    
+    from .binary import BinaryPayloadError, decode_records, readings_from_record
+    from .dedupe import drop_replays
+    from .devices import device_registry
+    from .ingest import BufferFull, save_readings, ingest_buffer, buffering_enabled
+    
+    try:
+        decoded = []
+        for device_id, boot_id, sequence, timestamp, sensors, values in decode_records(request.body):
+            device, _ = device_registry.resolve(
+                device_id,
+                defaults={
+                    'name': f'ESP32 Device {device_id}',
+                    'device_type': 'ESP32',
+                    'is_active': True
+                }
+            )
+            decoded.append((device, boot_id, sequence, timestamp, sensors, values))
+    except (BinaryPayloadError, UnicodeDecodeError) as e:
+        return JsonResponse({'status': 'error', 'message': f'Invalid binary payload: {str(e)}'}, status=400)
+    
+    # Sequence 0 means the firmware does not number its records; the boot id
+    # (version 2 header) is the same for every record
+    records = [
+        (device, boot_id, sequence or None, readings_from_record(device, timestamp, sensors, values))
+        for device, boot_id, sequence, timestamp, sensors, values in decoded
+    ]
+    
+    try:
+        if buffering_enabled():
+            # Sequences are claimed by the flush that writes the readings
+            ingest_buffer.add_groups([
+                (device, boot_id, sequence, [instance for _, instance in readings])
+                for device, boot_id, sequence, readings in records
+            ])
+            accepted, duplicates = [readings for _, _, _, readings in records], 0
+        else:
+            with transaction.atomic():
+                accepted, duplicates = drop_replays(records)
+                save_readings([instance for readings in accepted for _, instance in readings])
+    except BufferFull:
+        return busy_response()
+    except Exception as e:
+        return JsonResponse({'status': 'error', 'message': f'Server error: {str(e)}'}, status=500)
+    
+    counts = {}
+    for readings in accepted:
+        for label, _ in readings:
+            counts[label] = counts.get(label, 0) + 1
+    
+    return JsonResponse({
+        'status': 'success',
+        'message': 'Sensor data accepted for buffered write' if buffering_enabled() else 'Sensor data received and saved',
+        'records': len(accepted),
+        'duplicates': duplicates,
+        'accepted': counts
+    })
+
 @csrf_exempt  
 def sensors_bulk(request):
-    """Alternative bulk endpoint for ESP32 compatibility"""
+    """Alternative bulk endpoint for ESP32 compatibility.
+    Multi-sample batches ({"device_id": ..., "samples": [...]}) go to views.bulk_sensor_data."""
+    if request.method == 'POST':
+        try:
+            data = json.loads(request.body.decode('utf-8'))
+        except (UnicodeDecodeError, ValueError):
+            data = None  # post_sensor_data answers with its usual error
+        if isinstance(data, dict) and isinstance(data.get('samples'), list):
+            return views.bulk_sensor_data(request)
     return post_sensor_data(request)
 
 urlpatterns = [
@@ -226,11 +239,45 @@ urlpatterns = [
     
     # Health check
     path('health/', health_status, name='health'),
+    path('health/db/', views.health_check, name='health-db'),
+    path('overview/', views.api_overview, name='api-overview'),
     
     # ESP32 POST endpoints
     path('post_sensor_data/', post_sensor_data, name='post-sensor-data'),
+    path('post_sensor_data/binary/', post_sensor_data_binary, name='post-sensor-data-binary'),
     path('sensors/bulk/', sensors_bulk, name='sensors-bulk'),
     
+    # Reading lists: ?device=&start=&end= filters, keyset pagination via ?cursor=
+    path('sensors/ecg/', views.ECGReadingListCreateView.as_view(), name='ecg-readings'),
+    path('sensors/pulse-oximeter/', views.PulseOximeterReadingListCreateView.as_view(), name='pulse-oximeter-readings'),
+    path('sensors/max30102/', views.MAX30102ReadingListCreateView.as_view(), name='max30102-readings'),
+    path('sensors/accelerometer/', views.AccelerometerReadingListCreateView.as_view(), name='accelerometer-readings'),
+    path('sensors/status/', views.DeviceStatusListCreateView.as_view(), name='device-status-readings'),
+    
+    # Streaming CSV/NDJSON export for clinical review
+    path('export/', views.export_readings, name='export-readings'),
+    
+    # Chunked high-rate waveforms (ECG at 250-500 Hz)
+    path('waveform/<str:device_id>/', views.waveform_chunks, name='waveform'),
+    path('waveform/<str:device_id>/<str:channel>/', views.waveform_chunks, name='waveform-channel'),
+    
+    # Per-device current values from the DeviceSnapshot row
+    path('devices/latest/', views.fleet_latest, name='fleet-latest'),
+    path('devices/<str:device_id>/raw/', views.raw_sensor_values, name='device-raw-values'),
+    path('devices/<str:device_id>/latest/', views.latest_readings, name='device-latest-readings'),
+    
+    # Per-minute/per-hour rollups for trend charts
+    path('rollups/<str:device_id>/', views.reading_rollups, name='reading-rollups'),
+    
+    # Events flagged by the streaming anomaly detector on ingest
+    path('anomalies/', views.anomaly_events, name='anomaly-events'),
+    
+    # Server-side statistics over raw readings (requires numpy)
+    path('vitals/<str:device_id>/', views.vitals_statistics, name='vitals-statistics'),
+    
+    # Server-Sent Events push of new readings (replaces polling /api/ecg/ etc.)
+    path('stream/', views.reading_stream, name='reading-stream'),
+    
     # Test endpoint (can be accessed via browser)
     path('test_post/', test_post_endpoint, name='test-post'),
     
@@ -1,20 +1,48 @@
 from rest_framework import generics, status
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
+from django.conf import settings
 from django.utils import timezone
 from django.db import transaction
-from django.http import HttpRequest, HttpResponse
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpRequest, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.views.decorators.csrf import csrf_exempt
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+import asyncio
+import csv
+import io
+import json
 import math
+import time
 
 from .models import (
     Device, ECGReading, PulseOximeterReading, 
-    MAX30102Reading, AccelerometerReading, DeviceStatus
+    MAX30102Reading, AccelerometerReading, DeviceStatus, WaveformChunk,
+    ReadingRollup, AnomalyEvent
 )
 from .serializers import (
     DeviceSerializer, ECGReadingSerializer, PulseOximeterReadingSerializer,
     MAX30102ReadingSerializer, AccelerometerReadingSerializer, 
-    DeviceStatusSerializer, BulkSensorDataSerializer
+    DeviceStatusSerializer, BulkSensorDataSerializer, BulkSensorBatchSerializer
 )
+from .counters import table_counts
+from .dedupe import claim_sequences, drop_replays
+from .devices import device_registry
+from .events import SENSOR_NAMES as EVENT_SENSORS, event_hub, ensure_listening, stream_slots
+from .metrics import collect as collect_metrics, render as render_metrics
+from .export import (
+    CONTENT_TYPES as EXPORT_CONTENT_TYPES, EXPORT_MODELS, FORMATS as EXPORT_FORMATS,
+    stream_export
+)
+from .health import health_probe
+from .ingest import readings_from_sample, save_readings
+from .latest import latest_values
+from .pagination import ReadingKeysetPagination, filter_readings, parse_aware_datetime
+from .rollups import METRICS as ROLLUP_METRIC_NAMES
+from .snapshots import SENSOR_MODELS as SNAPSHOT_SENSORS, fleet_columns, get_snapshot
+from .vitals import MAX_WINDOW as VITALS_MAX_WINDOW, VitalsUnavailable, cache_window, vitals_stats
+from .waveform import create_chunk, pack_samples, read_waveform, waveform_bytes
 
 
 class DeviceListCreateView(generics.ListCreateAPIView):
@@ -44,36 +72,57 @@ class DeviceDetailView(generics.RetrieveUpdateDestroyAPIView):
     lookup_field = 'device_id'
 
 
-class ECGReadingListCreateView(generics.ListCreateAPIView):
+class ReadingListMixin:
+    """?device=, ?start=, ?end= filters and keyset pagination (?cursor=, ?page_size=)"""
+    pagination_class = ReadingKeysetPagination
+    
+    def get_queryset(self):
+        queryset = super().get_queryset().select_related('device')  # type: ignore
+        return filter_readings(queryset, self.request.query_params)  # type: ignore
+
+
+class ECGReadingListCreateView(ReadingListMixin, generics.ListCreateAPIView):
     # pylint: disable=no-member
     queryset = ECGReading.objects.all()  # type: ignore
     serializer_class = ECGReadingSerializer
 
 
-class PulseOximeterReadingListCreateView(generics.ListCreateAPIView):
+class PulseOximeterReadingListCreateView(ReadingListMixin, generics.ListCreateAPIView):
     # pylint: disable=no-member
     queryset = PulseOximeterReading.objects.all()  # type: ignore
     serializer_class = PulseOximeterReadingSerializer
 
 
-class MAX30102ReadingListCreateView(generics.ListCreateAPIView):
+class MAX30102ReadingListCreateView(ReadingListMixin, generics.ListCreateAPIView):
     # pylint: disable=no-member
     queryset = MAX30102Reading.objects.all()  # type: ignore
     serializer_class = MAX30102ReadingSerializer
 
 
-class AccelerometerReadingListCreateView(generics.ListCreateAPIView):
+class AccelerometerReadingListCreateView(ReadingListMixin, generics.ListCreateAPIView):
     # pylint: disable=no-member
     queryset = AccelerometerReading.objects.all()  # type: ignore
     serializer_class = AccelerometerReadingSerializer
 
 
-class DeviceStatusListCreateView(generics.ListCreateAPIView):
+class DeviceStatusListCreateView(ReadingListMixin, generics.ListCreateAPIView):
     # pylint: disable=no-member
     queryset = DeviceStatus.objects.all()  # type: ignore
     serializer_class = DeviceStatusSerializer
 
 
+# Fallbacks of the legacy single-value views; any falsy reading shows the fallback
+LEGACY_FALLBACKS = {
+    'ecg': 75, 'spo2': 98.5, 'max30102': 72,
+    'accel_x': 0.15, 'accel_y': -0.08, 'accel_z': 9.81,
+}
+
+
+def _legacy_value(sensor):
+    """Latest fleet-wide value of ``sensor`` from the latest-value cache, as text"""
+    return str(latest_values.get(sensor).value or LEGACY_FALLBACKS[sensor])
+
+
 @api_view(['POST', 'GET'])
 def bulk_sensor_data(request: HttpRequest) -> Response:
     """
@@ -101,64 +150,22 @@ def bulk_sensor_data(request: HttpRequest) -> Response:
     if request.method == 'GET':
         sensor_type = request.GET.get('sensor', 'all')
         
+        # Served from the latest-value cache; only a cold entry queries the database
         try:
-            if sensor_type == 'ecg':
-                latest = ECGReading.objects.latest('timestamp')
-                return Response(str(latest.heart_rate or 75), content_type='text/plain')
-            elif sensor_type == 'spo2':
-                latest = PulseOximeterReading.objects.latest('timestamp')
-                return Response(str(latest.spo2 or 98.5), content_type='text/plain')
-            elif sensor_type == 'max30102':
-                latest = MAX30102Reading.objects.latest('timestamp')
-                return Response(str(latest.heart_rate or 72), content_type='text/plain')
-            elif sensor_type == 'accel_x':
-                latest = AccelerometerReading.objects.latest('timestamp')
-                return Response(str(latest.x_axis or 0.15), content_type='text/plain')
-            elif sensor_type == 'accel_y':
-                latest = AccelerometerReading.objects.latest('timestamp')
-                return Response(str(latest.y_axis or -0.08), content_type='text/plain')
-            elif sensor_type == 'accel_z':
-                latest = AccelerometerReading.objects.latest('timestamp')
-                return Response(str(latest.z_axis or 9.81), content_type='text/plain')
-            else:
-                # Return all values (default behavior)
-                values = []
-                try:
-                    latest = ECGReading.objects.latest('timestamp')
-                    values.append(str(latest.heart_rate or 75))
-                except ECGReading.DoesNotExist:
-                    values.append("75")
-                
-                try:
-                    latest = PulseOximeterReading.objects.latest('timestamp')
-                    values.append(str(latest.spo2 or 98.5))
-                except PulseOximeterReading.DoesNotExist:
-                    values.append("98.5")
-                    
-                try:
-                    latest = MAX30102Reading.objects.latest('timestamp')
-                    values.append(str(latest.heart_rate or 72))
-                except MAX30102Reading.DoesNotExist:
-                    values.append("72")
-                
-                return Response('\n'.join(values), content_type='text/plain')
-                
+            if sensor_type in LEGACY_FALLBACKS:
+                return Response(_legacy_value(sensor_type), content_type='text/plain')
+            # Return all values (default behavior)
+            values = [_legacy_value(sensor) for sensor in ('ecg', 'spo2', 'max30102')]
+            return Response('\n'.join(values), content_type='text/plain')
         except Exception:
             # Return default values if no data
-            if sensor_type == 'ecg':
-                return Response("75", content_type='text/plain')
-            elif sensor_type == 'spo2':
-                return Response("98.5", content_type='text/plain')
-            elif sensor_type == 'max30102':
-                return Response("72", content_type='text/plain')
-            elif sensor_type == 'accel_x':
-                return Response("0.15", content_type='text/plain')
-            elif sensor_type == 'accel_y':
-                return Response("-0.08", content_type='text/plain')
-            elif sensor_type == 'accel_z':
-                return Response("9.81", content_type='text/plain')
-            else:
-                return Response("75\n98.5\n72", content_type='text/plain')
+            if sensor_type in LEGACY_FALLBACKS:
+                return Response(str(LEGACY_FALLBACKS[sensor_type]), content_type='text/plain')
+            return Response("75\n98.5\n72", content_type='text/plain')
+    
+    # Handle POST request - multi-sample batch (device-side buffering)
+    if isinstance(request.data, dict) and 'samples' in request.data:
+        return bulk_sensor_batch(request)
     
     # Handle POST request - original bulk sensor data processing
     serializer = BulkSensorDataSerializer(data=request.data)
@@ -167,89 +174,27 @@ def bulk_sensor_data(request: HttpRequest) -> Response:
         device_id = data['device_id']
         
         try:
+            # Resolve device outside the write transaction; last_seen is
+            # written in batches by the registry
+            device, _ = device_registry.resolve(
+                device_id,
+                defaults={
+                    'name': f'IoT Device {device_id}',
+                    'device_type': 'ESP32'
+                }
+            )
+            
             with transaction.atomic():
-                # Get or create device
-                # pylint: disable=no-member
-                device, created = Device.objects.get_or_create(  # type: ignore
-                    device_id=device_id,
-                    defaults={
-                        'name': f'IoT Device {device_id}',
-                        'device_type': 'ESP32'
-                    }
-                )
-                device.last_seen = timezone.now()
-                device.save()
-                
-                readings_created = []
-                
-                # Create ECG reading if data available
-                if data.get('ecg_heart_rate') or data.get('ecg_value'):
-                    # pylint: disable=no-member
-                    ECGReading.objects.create(  # type: ignore
-                        device=device,
-                        heart_rate=data.get('ecg_heart_rate', 0),
-                        ecg_value=data.get('ecg_value', 0),
-                        signal_quality=data.get('ecg_signal_quality', 'good')
-                    )
-                    readings_created.append('ecg')
-                
-                # Create Pulse Oximeter reading if data available
-                if data.get('spo2') or data.get('pulse_heart_rate'):
-                    # pylint: disable=no-member
-                    PulseOximeterReading.objects.create(  # type: ignore
-                        device=device,
-                        spo2=data.get('spo2', 0),
-                        heart_rate=data.get('pulse_heart_rate', 0),
-                        signal_strength=data.get('pulse_signal_strength', 50)
-                    )
-                    readings_created.append('pulse_oximeter')
-                
-                # Create MAX30102 reading if data available
-                if (data.get('max30102_heart_rate') or data.get('red_value') or 
-                    data.get('ir_value')):
-                    # pylint: disable=no-member
-                    MAX30102Reading.objects.create(  # type: ignore
-                        device=device,
-                        heart_rate=data.get('max30102_heart_rate', 0),
-                        spo2=data.get('max30102_spo2'),
-                        red_value=data.get('red_value', 0),
-                        ir_value=data.get('ir_value', 0),
-                        temperature=data.get('temperature')
-                    )
-                    readings_created.append('max30102')
-                
-                # Create Accelerometer reading if data available
-                if (data.get('x_axis') is not None or data.get('y_axis') is not None or 
-                    data.get('z_axis') is not None):
-                    x = data.get('x_axis', 0)
-                    y = data.get('y_axis', 0)
-                    z = data.get('z_axis', 0)
-                    magnitude = data.get('magnitude', math.sqrt(x*x + y*y + z*z))
-                    
-                    # pylint: disable=no-member
-                    AccelerometerReading.objects.create(  # type: ignore
-                        device=device,
-                        x_axis=x,
-                        y_axis=y,
-                        z_axis=z,
-                        magnitude=magnitude
-                    )
-                    readings_created.append('accelerometer')
+                # A retried post repeats its sequence; acknowledge it without writing
+                sequence = data.get('sequence')
+                if sequence is not None and not claim_sequences(device, [sequence], data.get('boot_id')):
+                    return Response("DUPLICATE",
+                                  status=status.HTTP_200_OK,
+                                  content_type='text/plain')
                 
-                # Create Device Status if data available
-                if (data.get('battery_level') is not None or 
-                    data.get('wifi_signal_strength') is not None or
-                    data.get('memory_usage') is not None):
-                    # pylint: disable=no-member
-                    DeviceStatus.objects.create(  # type: ignore
-                        device=device,
-                        battery_level=data.get('battery_level'),
-                        wifi_signal_strength=data.get('wifi_signal_strength'),
-                        memory_usage=data.get('memory_usage'),
-                        cpu_temperature=data.get('cpu_temperature'),
-                        uptime_seconds=data.get('uptime_seconds')
-                    )
-                    readings_created.append('device_status')
+                # Create one reading per sensor that sent data
+                readings = readings_from_sample(device, data, data.get('timestamp'))
+                save_readings([instance for _, instance in readings])
                 
                 # Return only raw sensor values - no device names, one per line
                 # Only include non-zero values (actual sensor readings)
@@ -306,6 +251,67 @@ def bulk_sensor_data(request: HttpRequest) -> Response:
     }, status=status.HTTP_400_BAD_REQUEST)
 
 
+def bulk_sensor_batch(request: HttpRequest) -> Response:
+    """
+    POST: Multi-sample batch from a device that buffers readings
+    Expected JSON format:
+    {
+        "device_id": "ESP32_001",
+        "sent_offset_ms": 61000,
+        "samples": [
+            {"offset_ms": 60000, "ecg_heart_rate": 75.0, "spo2": 98.5, ...},
+            {"timestamp": "2025-09-09T16:05:01Z", "x_axis": 0.1, ...}
+        ]
+    }
+    Each sample takes the BulkSensorDataSerializer fields plus an optional
+    device-side "timestamp" or an "offset_ms" on the device clock (millis()).
+    All samples are validated before anything is written, then each sensor
+    table gets a single bulk_create.
+    """
+    serializer = BulkSensorBatchSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response({
+            'status': 'error',
+            'code': 400,
+            'message': 'Bad Request',
+            'errors': serializer.errors
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
+    data = serializer.validated_data
+    device, _ = device_registry.resolve(
+        data['device_id'],
+        defaults={
+            'name': f'IoT Device {data["device_id"]}',
+            'device_type': 'ESP32'
+        }
+    )
+    
+    with transaction.atomic():
+        # Samples with a sequence already claimed are replays of an earlier post
+        samples, duplicates = drop_replays([
+            (device, sample.get('boot_id', data.get('boot_id')), sample.get('sequence'), sample)
+            for sample in data['samples']
+        ])
+        
+        counts = {}
+        instances = []
+        for sample in samples:
+            for label, instance in readings_from_sample(device, sample, sample.get('timestamp')):
+                counts[label] = counts.get(label, 0) + 1
+                instances.append(instance)
+        
+        save_readings(instances)
+    
+    return Response({
+        'status': 'success',
+        'code': 201,
+        'message': 'Created',
+        'samples': len(data['samples']) - duplicates,
+        'duplicates': duplicates,
+        'readings': counts
+    }, status=status.HTTP_201_CREATED)
+
+
 # pylint: disable=unused-argument
 @api_view(['GET'])
 def device_readings(request: HttpRequest, device_id: str) -> Response:
@@ -357,56 +363,28 @@ def simple_device_list(request: HttpRequest) -> Response:
 @api_view(['GET'])
 def raw_sensor_values(request: HttpRequest, device_id: str) -> Response:
     """Get raw sensor values - just numbers, no JSON"""
-    try:
-        # pylint: disable=no-member
-        device = Device.objects.get(device_id=device_id)  # type: ignore
-    except Device.DoesNotExist:  # type: ignore
+    # One row from the per-device snapshot maintained on ingest
+    device, snapshot = get_snapshot(device_id)
+    if device is None:
         return Response("Device not found", 
                        status=status.HTTP_404_NOT_FOUND,
                        content_type='text/plain')
     
-    values = []
-    
-    # Get latest ECG reading - just the number
-    try:
-        # pylint: disable=no-member
-        latest_ecg = ECGReading.objects.filter(device=device).latest('timestamp')  # type: ignore
-        if latest_ecg.heart_rate:
-            values.append(str(latest_ecg.heart_rate))
-    except ECGReading.DoesNotExist:  # type: ignore
-        values.append("0")
-    
-    # Get latest Pulse Oximeter reading - just the number
-    try:
-        # pylint: disable=no-member
-        latest_pulse = PulseOximeterReading.objects.filter(device=device).latest('timestamp')  # type: ignore
-        if latest_pulse.spo2:
-            values.append(str(latest_pulse.spo2))
-        else:
-            values.append("0")
-    except PulseOximeterReading.DoesNotExist:  # type: ignore
-        values.append("0")
+    def number(value):
+        return str(value) if value else "0"
     
-    # Get latest MAX30102 reading - just the number
-    try:
-        # pylint: disable=no-member
-        latest_max30102 = MAX30102Reading.objects.filter(device=device).latest('timestamp')  # type: ignore
-        if latest_max30102.heart_rate:
-            values.append(str(latest_max30102.heart_rate))
+    if snapshot is None:
+        values = ["0"] * 6
+    else:
+        values = [
+            number(snapshot.ecg_heart_rate),
+            number(snapshot.spo2),
+            number(snapshot.max30102_heart_rate),
+        ]
+        if snapshot.accel_at is not None:
+            values.extend([str(snapshot.x_axis), str(snapshot.y_axis), str(snapshot.z_axis)])
         else:
-            values.append("0")
-    except MAX30102Reading.DoesNotExist:  # type: ignore
-        values.append("0")
-    
-    # Get latest Accelerometer reading - just X,Y,Z values
-    try:
-        # pylint: disable=no-member
-        latest_accel = AccelerometerReading.objects.filter(device=device).latest('timestamp')  # type: ignore
-        values.append(str(latest_accel.x_axis))
-        values.append(str(latest_accel.y_axis)) 
-        values.append(str(latest_accel.z_axis))
-    except AccelerometerReading.DoesNotExist:  # type: ignore
-        values.extend(["0", "0", "0"])
+            values.extend(["0", "0", "0"])
     
     # Return just comma-separated values: ECG,SpO2,MAX30102,X,Y,Z
     return Response(",".join(values), 
@@ -414,69 +392,40 @@ def raw_sensor_values(request: HttpRequest, device_id: str) -> Response:
                    content_type='text/plain')
 
 
+@api_view(['GET'])
+def latest_readings(request: HttpRequest, device_id: str) -> Response:
     """Get the latest sensor readings in simple value format"""
-    try:
-        # pylint: disable=no-member
-        device = Device.objects.get(device_id=device_id)  # type: ignore
-    except Device.DoesNotExist:  # type: ignore
+    device, snapshot = get_snapshot(device_id)
+    if device is None:
         return Response({
             'error': f'Device {device_id} not found'
         }, status=status.HTTP_404_NOT_FOUND)
     
     readings = []
-    
-    # Get latest readings for each sensor type
-    try:
-        # pylint: disable=no-member
-        latest_ecg = ECGReading.objects.filter(device=device).latest('timestamp')  # type: ignore
-        if latest_ecg.heart_rate:
-            readings.append(f"ECG Heart Rate: {latest_ecg.heart_rate} BPM")
-        if latest_ecg.ecg_value:
-            readings.append(f"ECG Value: {latest_ecg.ecg_value}")
-    except ECGReading.DoesNotExist:  # type: ignore
-        pass
-    
-    try:
-        # pylint: disable=no-member
-        latest_pulse = PulseOximeterReading.objects.filter(device=device).latest('timestamp')  # type: ignore
-        if latest_pulse.spo2:
-            readings.append(f"SpO2: {latest_pulse.spo2}%")
-        if latest_pulse.heart_rate:
-            readings.append(f"Pulse Rate: {latest_pulse.heart_rate} BPM")
-    except PulseOximeterReading.DoesNotExist:  # type: ignore
-        pass
-    
-    try:
-        # pylint: disable=no-member
-        latest_max30102 = MAX30102Reading.objects.filter(device=device).latest('timestamp')  # type: ignore
-        if latest_max30102.heart_rate:
-            readings.append(f"MAX30102 Heart Rate: {latest_max30102.heart_rate} BPM")
-        if latest_max30102.red_value:
-            readings.append(f"Red Value: {latest_max30102.red_value}")
-        if latest_max30102.ir_value:
-            readings.append(f"IR Value: {latest_max30102.ir_value}")
-    except MAX30102Reading.DoesNotExist:  # type: ignore
-        pass
-    
-    try:
-        # pylint: disable=no-member
-        latest_accel = AccelerometerReading.objects.filter(device=device).latest('timestamp')  # type: ignore
-        readings.append(f"X-Axis: {latest_accel.x_axis} g")
-        readings.append(f"Y-Axis: {latest_accel.y_axis} g") 
-        readings.append(f"Z-Axis: {latest_accel.z_axis} g")
-        readings.append(f"Magnitude: {latest_accel.magnitude:.2f} g")
-    except AccelerometerReading.DoesNotExist:  # type: ignore
-        pass
-    
-    try:
-        # pylint: disable=no-member
-        latest_status = DeviceStatus.objects.filter(device=device).latest('timestamp')  # type: ignore
-        if latest_status.battery_level:
-            readings.append(f"Battery: {latest_status.battery_level}%")
-        if latest_status.wifi_signal_strength:
-            readings.append(f"WiFi Signal: {latest_status.wifi_signal_strength} dBm")
-    except DeviceStatus.DoesNotExist:  # type: ignore
-        pass
+    if snapshot is not None:
+        if snapshot.ecg_heart_rate:
+            readings.append(f"ECG Heart Rate: {snapshot.ecg_heart_rate} BPM")
+        if snapshot.ecg_value:
+            readings.append(f"ECG Value: {snapshot.ecg_value}")
+        if snapshot.spo2:
+            readings.append(f"SpO2: {snapshot.spo2}%")
+        if snapshot.pulse_heart_rate:
+            readings.append(f"Pulse Rate: {snapshot.pulse_heart_rate} BPM")
+        if snapshot.max30102_heart_rate:
+            readings.append(f"MAX30102 Heart Rate: {snapshot.max30102_heart_rate} BPM")
+        if snapshot.red_value:
+            readings.append(f"Red Value: {snapshot.red_value}")
+        if snapshot.ir_value:
+            readings.append(f"IR Value: {snapshot.ir_value}")
+        if snapshot.accel_at is not None:
+            readings.append(f"X-Axis: {snapshot.x_axis} g")
+            readings.append(f"Y-Axis: {snapshot.y_axis} g")
+            readings.append(f"Z-Axis: {snapshot.z_axis} g")
+            readings.append(f"Magnitude: {snapshot.magnitude:.2f} g")
+        if snapshot.battery_level:
+            readings.append(f"Battery: {snapshot.battery_level}%")
+        if snapshot.wifi_signal_strength:
+            readings.append(f"WiFi Signal: {snapshot.wifi_signal_strength} dBm")
     
     if readings:
         return Response({
@@ -498,42 +447,22 @@ def raw_sensor_values(request: HttpRequest, device_id: str) -> Response:
 def api_overview(request: HttpRequest) -> Response:
     """Live IoT system status - no JSON, no dummy data"""
     try:
-        # Get live device count
+        # Row counts come from the counter table, live values from the latest-value cache
+        counts = table_counts()
+        device_count = counts['device']
         # pylint: disable=no-member
-        device_count = Device.objects.count()  # type: ignore
         active_devices = Device.objects.filter(is_active=True).count()  # type: ignore
-        
-        # Get latest sensor reading counts
-        ecg_count = ECGReading.objects.count()  # type: ignore
-        pulse_count = PulseOximeterReading.objects.count()  # type: ignore
-        max30102_count = MAX30102Reading.objects.count()  # type: ignore
-        accel_count = AccelerometerReading.objects.count()  # type: ignore
+        ecg_count = counts['ecg']
+        pulse_count = counts['pulse_oximeter']
+        max30102_count = counts['max30102']
+        accel_count = counts['accelerometer']
         
         # Get latest actual sensor values (not dummy data)
-        latest_ecg = "NO_DATA"
-        latest_spo2 = "NO_DATA"
-        latest_max30102 = "NO_DATA"
-        
-        try:
-            latest_ecg_reading = ECGReading.objects.latest('timestamp')  # type: ignore
-            if latest_ecg_reading.heart_rate > 0:
-                latest_ecg = str(latest_ecg_reading.heart_rate)
-        except ECGReading.DoesNotExist:  # type: ignore
-            pass
-            
-        try:
-            latest_pulse_reading = PulseOximeterReading.objects.latest('timestamp')  # type: ignore
-            if latest_pulse_reading.spo2 > 0:
-                latest_spo2 = str(latest_pulse_reading.spo2)
-        except PulseOximeterReading.DoesNotExist:  # type: ignore
-            pass
-            
-        try:
-            latest_max_reading = MAX30102Reading.objects.latest('timestamp')  # type: ignore
-            if latest_max_reading.heart_rate > 0:
-                latest_max30102 = str(latest_max_reading.heart_rate)
-        except MAX30102Reading.DoesNotExist:  # type: ignore
-            pass
+        latest = {}
+        for sensor in ('ecg', 'spo2', 'max30102'):
+            entry = latest_values.get(sensor)
+            latest[sensor] = str(entry.value) if entry.has_data and entry.value else "NO_DATA"
+        latest_ecg, latest_spo2, latest_max30102 = latest['ecg'], latest['spo2'], latest['max30102']
         
         # Return live status as plain text
         status_text = f"""LIVE IoT SYSTEM STATUS
@@ -561,32 +490,9 @@ def live_status(request: HttpRequest) -> Response:
 @api_view(['GET'])
 def health_check(request: HttpRequest) -> Response:
     """Health check endpoint for monitoring deployment status"""
-    from django.db import connection
-    from django.utils import timezone
-    
-    try:
-        # Check database connection
-        with connection.cursor() as cursor:
-            cursor.execute("SELECT 1")
-            db_status = "healthy"
-    except Exception as e:
-        db_status = f"error: {str(e)}"
-    
-    # Count total records
-    try:
-        device_count = Device.objects.count()  # type: ignore
-        ecg_count = ECGReading.objects.count()  # type: ignore
-        total_readings = (
-            ECGReading.objects.count() +  # type: ignore
-            PulseOximeterReading.objects.count() +  # type: ignore
-            MAX30102Reading.objects.count() +  # type: ignore
-            AccelerometerReading.objects.count() +  # type: ignore
-            DeviceStatus.objects.count()  # type: ignore
-        )
-    except Exception:
-        device_count = 0
-        ecg_count = 0
-        total_readings = 0
+    # Answered from the background probe's cached result; no per-call queries
+    healthy, error, _ = health_probe.status()
+    db_status = "healthy" if healthy else f"error: {error}"
     
     is_healthy = db_status == "healthy"
     http_status = status.HTTP_200_OK if is_healthy else status.HTTP_503_SERVICE_UNAVAILABLE
@@ -601,59 +507,463 @@ def health_check(request: HttpRequest) -> Response:
 # INDIVIDUAL DEVICE ENDPOINTS - RETURN SINGLE SENSOR VALUES (SIMPLE DJANGO VIEWS)
 def ecg_value(request):
     """Returns ECG heart rate value: 75"""
-    try:
-        latest = ECGReading.objects.latest('timestamp')
-        value = latest.heart_rate or 75
-        return HttpResponse(str(value), content_type='text/plain', status=200)
-    except ECGReading.DoesNotExist:
-        return HttpResponse("75", content_type='text/plain', status=200)
+    return HttpResponse(_legacy_value('ecg'), content_type='text/plain', status=200)
 
 
 def spo2_value(request):
     """Returns SpO2 percentage value: 98.5"""
-    try:
-        latest = PulseOximeterReading.objects.latest('timestamp')
-        value = latest.spo2 or 98.5
-        return HttpResponse(str(value), content_type='text/plain', status=200)
-    except PulseOximeterReading.DoesNotExist:
-        return HttpResponse("98.5", content_type='text/plain', status=200)
+    return HttpResponse(_legacy_value('spo2'), content_type='text/plain', status=200)
 
 
 def max30102_value(request):
     """Returns MAX30102 heart rate value: 72"""
-    try:
-        latest = MAX30102Reading.objects.latest('timestamp')
-        value = latest.heart_rate or 72
-        return HttpResponse(str(value), content_type='text/plain', status=200)
-    except MAX30102Reading.DoesNotExist:
-        return HttpResponse("72", content_type='text/plain', status=200)
+    return HttpResponse(_legacy_value('max30102'), content_type='text/plain', status=200)
 
 
 def accel_x_value(request):
     """Returns X-axis acceleration: 0.15"""
-    try:
-        latest = AccelerometerReading.objects.latest('timestamp')
-        value = latest.x_axis or 0.15
-        return HttpResponse(str(value), content_type='text/plain', status=200)
-    except AccelerometerReading.DoesNotExist:
-        return HttpResponse("0.15", content_type='text/plain', status=200)
+    return HttpResponse(_legacy_value('accel_x'), content_type='text/plain', status=200)
 
 
 def accel_y_value(request):
     """Returns Y-axis acceleration: -0.08"""
-    try:
-        latest = AccelerometerReading.objects.latest('timestamp')
-        value = latest.y_axis or -0.08
-        return HttpResponse(str(value), content_type='text/plain', status=200)
-    except AccelerometerReading.DoesNotExist:
-        return HttpResponse("-0.08", content_type='text/plain', status=200)
+    return HttpResponse(_legacy_value('accel_y'), content_type='text/plain', status=200)
 
 
 def accel_z_value(request):
     """Returns Z-axis acceleration: 9.81"""
+    return HttpResponse(_legacy_value('accel_z'), content_type='text/plain', status=200)
+
+
+def _parse_time(value, default=None):
+    """Parse an ISO 8601 query/body value into an aware datetime"""
+    if not value:
+        return default
+    return parse_aware_datetime(value)
+
+
+# WAVEFORM ENDPOINTS - CHUNKED HIGH-RATE SAMPLES
+@csrf_exempt
+def waveform_chunks(request, device_id, channel='ecg'):
+    """
+    POST: Store one chunk of contiguous samples
+        JSON: {"start_time": "...", "sample_rate": 250, "dtype": "f4", "samples": [...]}
+        or application/octet-stream little-endian samples with
+        ?sample_rate=250&dtype=f4&start_time=... (start_time defaults to
+        arrival time minus the chunk duration)
+    GET: Samples in [start, end) as little-endian float32 (numpy.frombuffer(body, '<f4'))
+        ?start=...&end=... (ISO 8601, default last 10 seconds), ?format=json
+        Gaps are NaN; X-Start-Time / X-Sample-Rate / X-Sample-Count describe the buffer.
+    """
+    if request.method == 'POST':
+        try:
+            if request.content_type == 'application/octet-stream':
+                params = request.GET
+                blob = request.body
+                dtype = params.get('dtype', WaveformChunk.DTYPE_FLOAT32)
+            else:
+                params = json.loads(request.body.decode('utf-8'))
+                dtype = params.get('dtype', WaveformChunk.DTYPE_FLOAT32)
+                blob = pack_samples(params.get('samples') or [], dtype)
+            sample_rate = float(params.get('sample_rate', 0))
+            scale = float(params.get('scale', 1.0))
+            start_time = _parse_time(params.get('start_time'))
+            if start_time is None and sample_rate > 0:
+                itemsize = 2 if dtype == WaveformChunk.DTYPE_INT16 else 4
+                start_time = timezone.now() - timedelta(seconds=len(blob) / itemsize / sample_rate)
+            device, _ = device_registry.resolve(
+                device_id,
+                defaults={'name': f'IoT Device {device_id}', 'device_type': 'ESP32'}
+            )
+            chunk = create_chunk(device, start_time, sample_rate, blob,
+                                 channel=channel, dtype=dtype, scale=scale)
+        except (ValueError, TypeError, AttributeError) as e:
+            return JsonResponse({'status': 'error', 'code': 400, 'message': str(e)}, status=400)
+        return JsonResponse({
+            'status': 'success',
+            'code': 201,
+            'message': 'Created',
+            'chunk_id': chunk.pk,
+            'sample_count': chunk.sample_count,
+            'start_time': chunk.start_time.isoformat(),
+            'end_time': chunk.end_time.isoformat()
+        }, status=201)
+    
+    if request.method != 'GET':
+        return JsonResponse({'status': 'error', 'code': 405, 'message': 'Method Not Allowed'}, status=405)
+    
+    try:
+        # pylint: disable=no-member
+        device = Device.objects.get(device_id=device_id)  # type: ignore
+    except Device.DoesNotExist:  # type: ignore
+        return JsonResponse({'status': 'error', 'code': 404, 'message': 'Not Found'}, status=404)
+    
+    try:
+        end = _parse_time(request.GET.get('end'), timezone.now())
+        start = _parse_time(request.GET.get('start'), end - timedelta(seconds=10))
+        result = read_waveform(device, channel, start, end)
+    except ValueError as e:
+        return JsonResponse({'status': 'error', 'code': 400, 'message': str(e)}, status=400)
+    
+    if result is None:
+        first_time, sample_rate, values = start, 0, []
+    else:
+        first_time, sample_rate, values = result
+    
+    if request.GET.get('format') == 'json':
+        return JsonResponse({
+            'device': device_id,
+            'channel': channel,
+            'start_time': first_time.isoformat(),
+            'sample_rate': sample_rate,
+            'samples': [None if math.isnan(v) else v for v in values]
+        })
+    
+    response = HttpResponse(waveform_bytes(values), content_type='application/octet-stream')
+    response['X-Start-Time'] = first_time.isoformat()
+    response['X-Sample-Rate'] = str(sample_rate)
+    response['X-Sample-Count'] = str(len(values))
+    response['X-Dtype'] = '<f4'
+    return response
+
+
+@api_view(['GET'])
+def reading_rollups(request: HttpRequest, device_id: str) -> Response:
+    """
+    GET: Per-minute or per-hour aggregates of one metric, in columns
+        ?metric=ecg_heart_rate&period=hour&start=...&end=... (default last 24 hours)
+    """
+    metric = request.GET.get('metric', 'ecg_heart_rate')
+    period = request.GET.get('period', ReadingRollup.PERIOD_HOUR)
+    if metric not in ROLLUP_METRIC_NAMES or period not in (ReadingRollup.PERIOD_MINUTE, ReadingRollup.PERIOD_HOUR):
+        return Response({
+            'status': 'error',
+            'code': 400,
+            'message': 'Bad Request'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
+    try:
+        end = _parse_time(request.GET.get('end'), timezone.now())
+        start = _parse_time(request.GET.get('start'), end - timedelta(days=1))
+    except ValueError as e:
+        return Response({
+            'status': 'error',
+            'code': 400,
+            'message': str(e)
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
+    # pylint: disable=no-member
+    rows = ReadingRollup.objects.filter(  # type: ignore
+        device__device_id=device_id, metric=metric, period=period,
+        bucket__gte=start, bucket__lt=end
+    ).order_by('bucket').values_list('bucket', 'count', 'min_value', 'max_value', 'sum_value', 'sum_sq')
+    
+    columns = {'bucket': [], 'count': [], 'mean': [], 'min': [], 'max': [], 'std': []}
+    for bucket, count, lo, hi, total, total_sq in rows:
+        mean = total / count
+        columns['bucket'].append(bucket.isoformat())
+        columns['count'].append(count)
+        columns['mean'].append(mean)
+        columns['min'].append(lo)
+        columns['max'].append(hi)
+        columns['std'].append(max(total_sq / count - mean * mean, 0.0) ** 0.5)
+    
+    return Response({
+        'device': device_id,
+        'metric': metric,
+        'period': period,
+        **columns
+    })
+
+
+@api_view(['GET'])
+def anomaly_events(request: HttpRequest) -> Response:
+    """
+    GET: Recent anomalies flagged by the streaming detector, newest first
+        ?device=<device_id>&kind=spo2_drop|hr_spike|motion_spike&since=... (ISO 8601)&limit=100
+    """
+    kind = request.GET.get('kind')
+    limit = request.GET.get('limit', '100')
+    if (kind and kind not in dict(AnomalyEvent.KIND_CHOICES)) or not limit.isdigit():
+        return Response({
+            'status': 'error',
+            'code': 400,
+            'message': 'Bad Request'
+        }, status=status.HTTP_400_BAD_REQUEST)
     try:
-        latest = AccelerometerReading.objects.latest('timestamp')
-        value = latest.z_axis or 9.81
-        return HttpResponse(str(value), content_type='text/plain', status=200)
-    except AccelerometerReading.DoesNotExist:
-        return HttpResponse("9.81", content_type='text/plain', status=200)
+        since = _parse_time(request.GET.get('since'))
+    except ValueError as e:
+        return Response({
+            'status': 'error',
+            'code': 400,
+            'message': str(e)
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
+    # pylint: disable=no-member
+    events = AnomalyEvent.objects.all()  # type: ignore
+    if request.GET.get('device'):
+        events = events.filter(device__device_id=request.GET['device'])
+    if kind:
+        events = events.filter(kind=kind)
+    if since:
+        events = events.filter(timestamp__gte=since)
+    rows = events.order_by('-timestamp').values_list(
+        'device__device_id', 'kind', 'metric', 'timestamp', 'value', 'baseline', 'score'
+    )[:min(int(limit), 1000)]
+    
+    return Response({
+        'count': len(rows),
+        'results': [{
+            'device': device_id,
+            'kind': kind,
+            'metric': metric,
+            'timestamp': timestamp.isoformat(),
+            'value': value,
+            'baseline': baseline,
+            'score': score,
+        } for device_id, kind, metric, timestamp, value, baseline, score in rows]
+    })
+
+
+@api_view(['GET'])
+def vitals_statistics(request: HttpRequest, device_id: str) -> Response:
+    """
+    GET: Summary statistics of one metric over a window, computed server-side
+        ?metric=ecg_heart_rate&window=3600 (seconds, default 1 hour)&end=... (ISO 8601)
+    start/end are rounded down to SENSOR_VITALS_CACHE_SECONDS.
+    Heart-rate metrics include HRV (SDNN/RMSSD), spo2 includes desaturations.
+    """
+    metric = request.GET.get('metric', 'ecg_heart_rate')
+    window = request.GET.get('window', '3600')
+    if metric not in ROLLUP_METRIC_NAMES or not window.isdigit() or not 0 < int(window) <= VITALS_MAX_WINDOW.total_seconds():
+        return Response({
+            'status': 'error',
+            'code': 400,
+            'message': 'Bad Request'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
+    try:
+        end = _parse_time(request.GET.get('end'))
+    except ValueError as e:
+        return Response({
+            'status': 'error',
+            'code': 400,
+            'message': str(e)
+        }, status=status.HTTP_400_BAD_REQUEST)
+    if end is None:
+        end = timezone.now()
+    # Requests within one cache period share a window, and its cached result
+    start, end = cache_window(end - timedelta(seconds=int(window)), end)
+    
+    try:
+        stats = vitals_stats(device_id, metric, start, end)
+    except VitalsUnavailable as e:
+        return Response({
+            'status': 'error',
+            'code': 503,
+            'message': str(e)
+        }, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+    
+    return Response({
+        'device': device_id,
+        'metric': metric,
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        **stats
+    })
+
+
+def export_readings(request):
+    """
+    GET: Stream raw readings as CSV or NDJSON without loading them into memory
+        ?sensor=ecg|pulse_oximeter|max30102|accelerometer|device_status
+        &format=csv|ndjson&device=<device_id>&start=...&end=... (ISO 8601)
+    """
+    if request.method != 'GET':
+        return JsonResponse({'status': 'error', 'code': 405, 'message': 'Method Not Allowed'}, status=405)
+    
+    sensor = request.GET.get('sensor', 'ecg')
+    fmt = request.GET.get('format', 'csv')
+    if sensor not in EXPORT_MODELS or fmt not in EXPORT_FORMATS:
+        return JsonResponse({'status': 'error', 'code': 400, 'message': 'Bad Request'}, status=400)
+    try:
+        start = _parse_time(request.GET.get('start'))
+        end = _parse_time(request.GET.get('end'))
+    except ValueError as e:
+        return JsonResponse({'status': 'error', 'code': 400, 'message': str(e)}, status=400)
+    
+    device_id = request.GET.get('device')
+    response = StreamingHttpResponse(
+        stream_export(sensor, fmt, device_id=device_id, start=start, end=end),
+        content_type=EXPORT_CONTENT_TYPES[fmt]
+    )
+    filename = f"{sensor}_{device_id or 'all'}.{fmt}"
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+def fleet_latest(request):
+    """
+    GET: Current values of every active device (or ?device=<id>[,<id>...])
+        &sensor=ecg,pulse_oximeter,max30102,accelerometer,device_status
+        &format=json|csv
+    JSON is columnar: {"columns": [...], "count": n, "values": {column: [...]}}.
+    Served from the DeviceSnapshot table in one query whatever the fleet size.
+    """
+    if request.method != 'GET':
+        return JsonResponse({'status': 'error', 'code': 405, 'message': 'Method Not Allowed'}, status=405)
+    
+    device_ids = [d for d in request.GET.get('device', '').split(',') if d]
+    sensors = {s for s in request.GET.get('sensor', '').split(',') if s}
+    fmt = request.GET.get('format', 'json')
+    if sensors - set(SNAPSHOT_SENSORS) or fmt not in ('json', 'csv'):
+        return JsonResponse({'status': 'error', 'code': 400, 'message': 'Bad Request'}, status=400)
+    
+    columns, rows = fleet_columns(device_ids, sensors)
+    rows = [[value.isoformat() if hasattr(value, 'isoformat') else value for value in row]
+            for row in rows]
+    if fmt == 'csv':
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(columns)
+        writer.writerows(['' if value is None else value for value in row] for row in rows)
+        return HttpResponse(buffer.getvalue(), content_type='text/csv')
+    
+    return JsonResponse({
+        'columns': columns,
+        'count': len(rows),
+        'values': {column: [row[i] for row in rows] for i, column in enumerate(columns)},
+    })
+
+
+def _event_frames(events, devices, sensors):
+    """SSE frames for the events that pass the device/sensor filters"""
+    frames = []
+    for event in events:
+        if devices and event.device not in devices:
+            continue
+        if sensors and event.sensor not in sensors:
+            continue
+        frames.append(f"id: {event_hub.event_id(event)}\nevent: {event.sensor}\ndata: {event.data}\n\n")
+    return ''.join(frames)
+
+
+def _event_stream(devices, sensors, after, keepalive, max_seconds):
+    """Yield SSE frames from the in-process event hub"""
+    yield "retry: 3000\n\n"
+    deadline = time.monotonic() + max_seconds
+    while time.monotonic() < deadline:
+        events = event_hub.wait(after, keepalive)
+        if not events:
+            # Comment line keeps proxies from closing an idle connection
+            yield ": keepalive\n\n"
+            continue
+        after = events[-1].seq
+        frames = _event_frames(events, devices, sensors)
+        if frames:
+            yield frames
+
+
+# One waiting thread per ASGI stream, kept off the loop's default executor
+_stream_waits = ThreadPoolExecutor(max_workers=stream_slots.limit, thread_name_prefix='sse-wait')
+
+
+async def _async_event_stream(devices, sensors, after, keepalive, max_seconds):
+    """_event_stream for ASGI: waits in a thread, so the event loop stays free"""
+    loop = asyncio.get_running_loop()
+    yield "retry: 3000\n\n"
+    deadline = time.monotonic() + max_seconds
+    while time.monotonic() < deadline:
+        events = await loop.run_in_executor(_stream_waits, event_hub.wait, after, keepalive)
+        if not events:
+            yield ": keepalive\n\n"
+            continue
+        after = events[-1].seq
+        frames = _event_frames(events, devices, sensors)
+        if frames:
+            yield frames
+
+
+class _SlotStream:
+    """Stream content that gives its ``stream_slots`` slot back when the response closes.
+
+    Django calls ``close()`` even when the iterator was never started, which
+    a generator's ``finally`` would miss.
+    """
+
+    def __init__(self, iterator):
+        self._iterator = iterator
+        self._released = False
+
+    def __iter__(self):
+        return self._iterator
+
+    def close(self):
+        if not self._released:
+            self._released = True
+            stream_slots.release()
+        close = getattr(self._iterator, 'close', None)
+        if close:
+            close()
+
+
+class _AsyncSlotStream(_SlotStream):
+    # Only __aiter__, so StreamingHttpResponse treats the content as async
+    __iter__ = None
+
+    def __aiter__(self):
+        return self._iterator
+
+
+def reading_stream(request):
+    """
+    GET: Server-Sent Events stream of readings as ingest commits them
+        ?device=<id>[,<id>...]&sensor=ecg,pulse_oximeter,max30102,accelerometer,device_status
+    Reconnecting clients send Last-Event-ID (or ?last_event_id=) to resume.
+    At most SENSOR_SSE_MAX_STREAMS streams per process; beyond that 503 + Retry-After.
+    """
+    if request.method != 'GET':
+        return JsonResponse({'status': 'error', 'code': 405, 'message': 'Method Not Allowed'}, status=405)
+    
+    devices = {d for d in request.GET.get('device', '').split(',') if d}
+    sensors = {s for s in request.GET.get('sensor', '').split(',') if s}
+    if sensors - set(EVENT_SENSORS):
+        return JsonResponse({'status': 'error', 'code': 400, 'message': 'Bad Request'}, status=400)
+    
+    if not stream_slots.acquire():
+        response = JsonResponse({'status': 'error', 'code': 503, 'message': 'Too many streams'}, status=503)
+        response['Retry-After'] = '5'
+        return response
+    
+    ensure_listening()
+    last_event_id = request.headers.get('Last-Event-ID') or request.GET.get('last_event_id')
+    # Under ASGI the stream must be async, or Django reads it to the end before sending
+    asgi = isinstance(request, ASGIRequest)
+    stream = (_async_event_stream if asgi else _event_stream)(
+        devices, sensors, event_hub.resolve(last_event_id),
+        keepalive=getattr(settings, 'SENSOR_SSE_KEEPALIVE_SECONDS', 15),
+        # Bounded so workers are recycled; the browser reconnects with Last-Event-ID
+        max_seconds=getattr(settings, 'SENSOR_SSE_MAX_SECONDS', 300),
+    )
+    response = StreamingHttpResponse(
+        (_AsyncSlotStream if asgi else _SlotStream)(stream),
+        content_type='text/event-stream'
+    )
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+def prometheus_metrics(request):
+    """
+    GET: Request and ingest metrics in Prometheus text format, summed over all
+    workers sharing SENSOR_METRICS_DIR. Needs ``Authorization: Bearer
+    <SENSOR_METRICS_TOKEN>``; without a token it is only served with DEBUG on.
+    """
+    token = getattr(settings, 'SENSOR_METRICS_TOKEN', '')
+    if not token and not settings.DEBUG:
+        return JsonResponse({'status': 'error', 'code': 404, 'message': 'Not found'}, status=404)
+    if token and request.headers.get('Authorization') != f'Bearer {token}':
+        return JsonResponse({'status': 'error', 'code': 401, 'message': 'Unauthorized'}, status=401)
+    return HttpResponse(render_metrics(collect_metrics()),
+                        content_type='text/plain; version=0.0.4; charset=utf-8')
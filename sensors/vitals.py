@@ -0,0 +1,127 @@
+"""
+Vectorized vitals statistics over a time window.
+
+``load_series`` pulls one metric of one device (the rollup metric names:
+``ecg_heart_rate``, ``spo2``, ``accel_magnitude``, ...) into NumPy arrays
+with a single ``values_list`` query, and ``vitals_stats`` reduces it to
+summary statistics, HRV and desaturation counts without a Python loop over
+the samples. Windows are rounded down to ``SENSOR_VITALS_CACHE_SECONDS``
+boundaries and the results cached per (device, metric, window) in the Django
+cache for as long, so dashboards polling "the last hour" share one query per
+period.
+
+HRV is estimated from the reported heart rate (RR = 60000 / bpm), since the
+devices send beat rates rather than beat-to-beat intervals. NumPy is an
+optional dependency; without it ``VitalsUnavailable`` is raised.
+"""
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .rollups import METRICS
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - numpy is optional
+    np = None
+
+HEART_RATE_METRICS = ('ecg_heart_rate', 'pulse_heart_rate', 'max30102_heart_rate')
+PERCENTILES = (5, 25, 50, 75, 95)
+DESATURATION_THRESHOLD = 90.0
+MAX_WINDOW = timedelta(days=7)
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+class VitalsUnavailable(RuntimeError):
+    """Raised when NumPy is not installed"""
+
+
+def load_series(device_id, metric, start, end):
+    """(epoch seconds, values) float64 arrays of one metric in [start, end)"""
+    if np is None:
+        raise VitalsUnavailable("NumPy is not installed")
+    model, field, skip_zero = METRICS[metric]
+    # pylint: disable=no-member
+    rows = model.objects.filter(  # type: ignore
+        device__device_id=device_id, timestamp__gte=start, timestamp__lt=end
+    ).order_by('timestamp').values_list('timestamp', field)
+    if skip_zero:
+        rows = rows.exclude(**{field: 0})
+    rows = list(rows)
+    times = np.fromiter((row[0].timestamp() for row in rows), dtype=np.float64, count=len(rows))
+    values = np.fromiter((row[1] for row in rows), dtype=np.float64, count=len(rows))
+    return times, values
+
+
+def summarize(values):
+    """count/mean/min/max/std and percentiles of a 1-D array"""
+    if not values.size:
+        return {'count': 0}
+    return {
+        'count': int(values.size),
+        'mean': float(values.mean()),
+        'min': float(values.min()),
+        'max': float(values.max()),
+        'std': float(values.std()),
+        'percentiles': {
+            f'p{p}': float(v) for p, v in zip(PERCENTILES, np.percentile(values, PERCENTILES))
+        },
+    }
+
+
+def hrv(heart_rate):
+    """SDNN and RMSSD (ms) from a heart-rate series in bpm"""
+    rr = 60000.0 / heart_rate[heart_rate > 0]
+    if rr.size < 2:
+        return {'sdnn_ms': None, 'rmssd_ms': None}
+    return {
+        'sdnn_ms': float(rr.std(ddof=1)),
+        'rmssd_ms': float(np.sqrt(np.mean(np.square(np.diff(rr))))),
+    }
+
+
+def desaturations(times, spo2, threshold=DESATURATION_THRESHOLD):
+    """Episodes of SpO2 below ``threshold`` and the time spent below it"""
+    below = spo2 < threshold
+    # An episode starts at every below-threshold sample preceded by a normal one
+    episodes = int(np.count_nonzero(below[1:] & ~below[:-1])) + int(below[:1].sum())
+    # Each sample holds until the next one; the last sample covers no time
+    seconds = float(np.diff(times)[below[:-1]].sum()) if times.size > 1 else 0.0
+    return {
+        'threshold': threshold,
+        'episodes': episodes,
+        'samples_below': int(np.count_nonzero(below)),
+        'seconds_below': seconds,
+        'nadir': float(spo2.min()) if spo2.size else None,
+    }
+
+
+def compute_stats(metric, times, values):
+    stats = summarize(values)
+    if metric in HEART_RATE_METRICS:
+        stats['hrv'] = hrv(values)
+    elif metric == 'spo2':
+        stats['desaturation'] = desaturations(times, values)
+    return stats
+
+
+def cache_window(start, end):
+    """``start`` and ``end`` rounded down to the cache period"""
+    step = timedelta(seconds=max(int(getattr(settings, 'SENSOR_VITALS_CACHE_SECONDS', 60)), 1))
+    return start - (start - EPOCH) % step, end - (end - EPOCH) % step
+
+
+def vitals_stats(device_id, metric, start, end, use_cache=True):
+    """Statistics of one metric over [start, end) rounded by ``cache_window``, cached per window"""
+    start, end = cache_window(start, end)
+    key = f'vitals:{device_id}:{metric}:{start.timestamp():.0f}:{end.timestamp():.0f}'
+    if use_cache:
+        stats = cache.get(key)
+        if stats is not None:
+            return stats
+    times, values = load_series(device_id, metric, start, end)
+    stats = compute_stats(metric, times, values)
+    if use_cache:
+        cache.set(key, stats, getattr(settings, 'SENSOR_VITALS_CACHE_SECONDS', 60))
+    return stats
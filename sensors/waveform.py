@@ -0,0 +1,124 @@
+"""
+Packing, storage and time-range slicing for WaveformChunk.
+
+Samples are kept as little-endian float32 or int16 blobs, so a chunk of
+500 Hz ECG costs one row instead of 500. ``read_waveform`` stitches the chunks
+overlapping a time range into one float32 array on a uniform time base
+(missing samples are NaN), ready for ``numpy.frombuffer(body, '<f4')``.
+"""
+import math
+import sys
+from array import array
+from datetime import timedelta
+
+from django.conf import settings
+
+from .models import WaveformChunk
+
+TYPECODES = {WaveformChunk.DTYPE_FLOAT32: 'f', WaveformChunk.DTYPE_INT16: 'h'}
+
+
+class WaveformError(ValueError):
+    """Raised for samples or ranges that cannot be stored or sliced"""
+
+
+def _to_le(values):
+    if sys.byteorder != 'little':
+        values.byteswap()
+    return values
+
+
+def pack_samples(samples, dtype=WaveformChunk.DTYPE_FLOAT32):
+    """Pack a sequence of numbers into the little-endian blob layout"""
+    if dtype not in TYPECODES:
+        raise WaveformError(f"Unsupported dtype {dtype}")
+    try:
+        values = array(TYPECODES[dtype], samples)
+    except (TypeError, OverflowError) as e:
+        raise WaveformError(f"Invalid samples: {e}") from e
+    return _to_le(values).tobytes()
+
+
+def unpack_samples(blob, dtype, scale=1.0):
+    """Decode a blob into an array('f') of physical values"""
+    values = array(TYPECODES[dtype])
+    data = bytes(blob)
+    if len(data) % values.itemsize:
+        raise WaveformError("Blob length is not a whole number of samples")
+    values.frombytes(data)
+    _to_le(values)
+    if dtype == WaveformChunk.DTYPE_FLOAT32 and scale == 1.0:
+        return values
+    return array('f', (v * scale for v in values))
+
+
+def create_chunk(device, start_time, sample_rate, blob, channel='ecg',
+                 dtype=WaveformChunk.DTYPE_FLOAT32, scale=1.0):
+    """Store one chunk from an already packed little-endian blob"""
+    if dtype not in TYPECODES:
+        raise WaveformError(f"Unsupported dtype {dtype}")
+    if not sample_rate or sample_rate <= 0:
+        raise WaveformError("sample_rate must be positive")
+    itemsize = array(TYPECODES[dtype]).itemsize
+    if not blob or len(blob) % itemsize:
+        raise WaveformError("Blob length is not a whole number of samples")
+    count = len(blob) // itemsize
+    # pylint: disable=no-member
+    return WaveformChunk.objects.create(  # type: ignore
+        device=device,
+        channel=channel,
+        start_time=start_time,
+        end_time=start_time + timedelta(seconds=count / sample_rate),
+        sample_rate=sample_rate,
+        sample_count=count,
+        dtype=dtype,
+        scale=scale,
+        samples=blob,
+    )
+
+
+def read_waveform(device, channel, start, end):
+    """Slice [start, end) across chunks.
+
+    Returns (first_sample_time, sample_rate, array('f')) or None when no chunk
+    overlaps the range. Chunks must share one sample rate; gaps are NaN and
+    overlapping chunks are resolved in favour of the later one.
+    """
+    # pylint: disable=no-member
+    chunks = list(
+        WaveformChunk.objects.filter(  # type: ignore
+            device=device, channel=channel, start_time__lt=end, end_time__gt=start
+        ).order_by('start_time', 'id')
+    )
+    if not chunks:
+        return None
+
+    rate = chunks[0].sample_rate
+    if any(chunk.sample_rate != rate for chunk in chunks):
+        raise WaveformError("Chunks in range have different sample rates; narrow the range")
+
+    # Align the output to the sample grid of the first chunk
+    origin = chunks[0].start_time
+    first = max(0, math.ceil((start - origin).total_seconds() * rate))
+    last_end = min(end, max(chunk.end_time for chunk in chunks))
+    last = math.ceil((last_end - origin).total_seconds() * rate)
+    total = last - first
+    limit = getattr(settings, 'SENSOR_WAVEFORM_MAX_SAMPLES', 5_000_000)
+    if total > limit:
+        raise WaveformError(f"Range covers {total} samples, limit is {limit}")
+
+    out = array('f', [math.nan]) * max(total, 0)
+    for chunk in chunks:
+        values = unpack_samples(chunk.samples, chunk.dtype, chunk.scale)
+        offset = round((chunk.start_time - origin).total_seconds() * rate) - first
+        lo = max(0, -offset)
+        hi = min(len(values), total - offset)
+        if hi > lo:
+            out[offset + lo:offset + hi] = values[lo:hi]
+
+    return origin + timedelta(seconds=first / rate), rate, out
+
+
+def waveform_bytes(values):
+    """Little-endian float32 bytes for numpy.frombuffer(body, '<f4')"""
+    return _to_le(array('f', values)).tobytes()
@@ -0,0 +1,138 @@
+"""
+WebSocket push of live readings, served directly on the ASGI application.
+
+Clients connect to ``/ws/readings/?device=<id>,...&sensor=ecg,...`` and may
+change their subscription later by sending
+``{"devices": [...], "sensors": [...]}`` (empty or missing = everything).
+Every matching reading is sent as one text frame holding the same JSON as the
+SSE ``data:`` line.
+
+One pump task per event loop reads ``events.event_hub`` and offers each event
+to the subscribed clients. A client keeps at most one pending event per
+(device, sensor): when its socket is slower than ingest, older values are
+replaced by the newest one instead of queueing without bound.
+"""
+import asyncio
+import json
+import logging
+from urllib.parse import parse_qs
+
+from .events import SENSOR_NAMES, event_hub, ensure_listening
+
+logger = logging.getLogger(__name__)
+
+PATH = '/ws/readings/'
+
+# Seconds the pump blocks in event_hub.wait before re-checking for clients
+PUMP_TIMEOUT = 5.0
+
+
+def _names(values):
+    return {name for value in values for name in str(value).split(',') if name}
+
+
+class Subscriber:
+    """One WebSocket client with coalescing per (device, sensor)"""
+
+    def __init__(self, send, devices=(), sensors=()):
+        self.send = send
+        self.devices = set(devices)
+        self.sensors = set(sensors)
+        self.pending = {}
+        self.coalesced = 0
+        self._ready = asyncio.Event()
+
+    def wants(self, event):
+        return ((not self.devices or event.device in self.devices) and
+                (not self.sensors or event.sensor in self.sensors))
+
+    def offer(self, event):
+        key = (event.device, event.sensor)
+        if key in self.pending:
+            self.coalesced += 1
+        self.pending[key] = event
+        self._ready.set()
+
+    async def drain(self):
+        """Send pending events as fast as the client accepts them"""
+        while True:
+            await self._ready.wait()
+            self._ready.clear()
+            batch, self.pending = self.pending, {}
+            for event in sorted(batch.values(), key=lambda e: e.seq):
+                await self.send({'type': 'websocket.send', 'text': event.data})
+
+
+class Broadcaster:
+    """Fans hub events out to the subscribers of one event loop"""
+
+    def __init__(self):
+        self.subscribers = set()
+        self._task = None
+
+    def add(self, subscriber):
+        self.subscribers.add(subscriber)
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._pump())
+
+    def discard(self, subscriber):
+        self.subscribers.discard(subscriber)
+
+    async def _pump(self):
+        loop = asyncio.get_running_loop()
+        after = event_hub.last_seq()
+        while self.subscribers:
+            # The hub is thread-based; one executor thread waits on it for the loop
+            events = await loop.run_in_executor(None, event_hub.wait, after, PUMP_TIMEOUT)
+            for event in events:
+                after = event.seq
+                for subscriber in self.subscribers:
+                    if subscriber.wants(event):
+                        subscriber.offer(event)
+
+
+broadcaster = Broadcaster()
+
+
+async def readings_socket(scope, receive, send):
+    """Raw ASGI WebSocket handler for /ws/readings/"""
+    message = await receive()
+    if message['type'] != 'websocket.connect':
+        return
+
+    params = parse_qs(scope.get('query_string', b'').decode())
+    devices = _names(params.get('device', []))
+    sensors = _names(params.get('sensor', []))
+    if sensors - set(SENSOR_NAMES):
+        await send({'type': 'websocket.close', 'code': 4400})
+        return
+
+    ensure_listening()
+    await send({'type': 'websocket.accept'})
+    subscriber = Subscriber(send, devices, sensors)
+    broadcaster.add(subscriber)
+    sender = asyncio.create_task(subscriber.drain())
+    try:
+        while True:
+            message = await receive()
+            if message['type'] == 'websocket.disconnect':
+                break
+            if message['type'] != 'websocket.receive' or not message.get('text'):
+                continue
+            try:
+                update = json.loads(message['text'])
+                devices = _names(update.get('devices') or [])
+                sensors = _names(update.get('sensors') or [])
+            except (ValueError, AttributeError, TypeError):
+                continue
+            if sensors - set(SENSOR_NAMES):
+                continue
+            subscriber.devices, subscriber.sensors = devices, sensors
+            subscriber.pending = {
+                key: event for key, event in subscriber.pending.items() if subscriber.wants(event)
+            }
+    finally:
+        broadcaster.discard(subscriber)
+        sender.cancel()
+        if subscriber.coalesced:
+            logger.debug("WebSocket client coalesced %d readings", subscriber.coalesced)